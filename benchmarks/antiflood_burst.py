@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: AntiFlood rule engine under synthetic burst traffic
+
+Atkuria 10k msg/s srautą (daug userių + keli flooderiai) ir matuoja,
+kiek kainuoja vienos žinutės įvertinimas. Palyginimui – senas deque algoritmas.
+
+Paleidimas (iš repo šaknies):
+    python -m benchmarks.antiflood_burst [seconds_of_traffic]
+"""
+
+import random
+import sys
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from handlers.antiflood import DEFAULT_RULES, FloodEngine, FloodRule
+
+RATE = 10_000  # msgs/s
+CHATS = 3
+USERS = 5_000
+FLOODERS = 50
+
+
+def make_traffic(seconds: int, seed: int = 1) -> List[Tuple[Tuple[int, int], float]]:
+    rnd = random.Random(seed)
+    t0 = 1_700_000_000.0
+    out = []
+    for i in range(seconds * RATE):
+        now = t0 + i / RATE
+        if rnd.random() < 0.3:
+            uid = rnd.randrange(FLOODERS)  # flooderiai rašo be perstojo
+        else:
+            uid = FLOODERS + rnd.randrange(USERS)
+        out.append(((-100 - uid % CHATS, uid), now))
+    return out
+
+
+class LegacyFlood:
+    """Senas AntiFlood.handle_text algoritmas (rūšiavimas + deque kiekvienai žinutei)"""
+
+    def __init__(self, rules: List[FloodRule]):
+        self.rules = rules
+        self._bucket: Dict[int, Dict[int, deque]] = {}
+
+    def hit(self, key: Tuple[int, int], now: float) -> Optional[FloodRule]:
+        q = self._bucket.setdefault(key[0], {}).setdefault(key[1], deque(maxlen=50))
+        q.append(now)
+        for rule in sorted(self.rules, key=lambda r: (r.mute_minutes, r.messages), reverse=True):
+            while q and (now - q[0]) > rule.window_sec:
+                q.popleft()
+            if len(q) >= rule.messages:
+                return rule
+        return None
+
+
+def run(engine, traffic) -> Tuple[float, int]:
+    hit = engine.hit
+    triggered = 0
+    start = time.perf_counter()
+    for key, now in traffic:
+        if hit(key, now) is not None:
+            triggered += 1
+    return time.perf_counter() - start, triggered
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    traffic = make_traffic(seconds)
+    n = len(traffic)
+
+    new_t, new_hits = run(FloodEngine(DEFAULT_RULES), traffic)
+    old_t, old_hits = run(LegacyFlood(DEFAULT_RULES), traffic)
+    assert new_hits == old_hits, (new_hits, old_hits)
+
+    print(f"messages:  {n:,} ({seconds}s @ {RATE:,} msg/s), triggered: {new_hits:,}")
+    print(f"legacy:    {old_t * 1e6 / n:6.2f} µs/msg  ({n / old_t:,.0f} msg/s)")
+    print(f"engine:    {new_t * 1e6 / n:6.2f} µs/msg  ({n / new_t:,.0f} msg/s)")
+    print(f"speedup:   {old_t / new_t:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Local Bot API stand-in for benchmarks and load tests
+
+FakeBotApi atsako į tuos metodus, kuriuos bot'as realiai kviečia, skaičiuoja call'us
+ir pagal Faults prideda vėlinimą, 429 (retry_after) ir klaidas. Du transportai:
+FakeRequest – tame pačiame procese be tinklo; FakeBotApiServer – tikras HTTP
+(asyncio), į kurį bot'as nukreipiamas per build_app(base_url=...) arba BOT_API_URL.
+
+Atskiras serveris (iš repo šaknies):
+    python -m benchmarks.fake_api --port 8081 --latency 0.05 --retry-after-rate 0.01
+    BOT_API_URL=http://127.0.0.1:8081 python bot.py
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from telegram.request import BaseRequest, RequestData
+
+from utils.httpd import Request, Server, serve
+
+BOT_ID = 42
+
+
+def _user(user_id: int, is_bot: bool = False) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": is_bot, "first_name": f"user{user_id}"}
+
+
+def _admin(user_id: int, creator: bool = False, is_bot: bool = False) -> Dict[str, Any]:
+    if creator:
+        return {"status": "creator", "user": _user(user_id, is_bot), "is_anonymous": False}
+    rights = ("can_be_edited", "can_manage_chat", "can_delete_messages", "can_manage_video_chats",
+              "can_restrict_members", "can_promote_members", "can_change_info", "can_invite_users")
+    return {"status": "administrator", "user": _user(user_id, is_bot), "is_anonymous": False,
+            **{r: True for r in rights}}
+
+
+SETUP_METHODS = frozenset({"getMe", "setWebhook", "deleteWebhook", "getWebhookInfo"})
+
+
+@dataclass(frozen=True)
+class Faults:
+    """Kas injektuojama; methods tuščias = visi, išskyrus SETUP_METHODS"""
+    latency: float = 0.0            # s, prieš kiekvieną atsakymą
+    jitter: float = 0.0             # s, + atsitiktinai [0, jitter)
+    retry_after_rate: float = 0.0   # 429 dalis
+    retry_after: int = 1            # s, retry_after 429 atsakyme
+    error_rate: float = 0.0         # 400 dalis
+    methods: FrozenSet[str] = frozenset()
+    seed: int = 0
+
+    def applies(self, method: str) -> bool:
+        return method in self.methods if self.methods else method not in SETUP_METHODS
+
+
+class FakeBotApi:
+    """
+    Minimalus Telegram'as atmintyje. admins: chat_id -> admin id'ai (pirmas – creator);
+    bot'as visuose chatuose adminas su restrict teisėmis.
+    """
+
+    def __init__(self, admins: Optional[Dict[int, Iterable[int]]] = None, faults: Faults = Faults()):
+        self.admins = {chat_id: list(ids) for chat_id, ids in (admins or {}).items()}
+        self.faults = faults
+        self.calls: Counter = Counter()
+        self.throttled = 0
+        self.errors = 0
+        self.deleted = 0
+        self.restricted: Dict[Tuple[int, int], Any] = {}
+        self.banned = set()
+        self._message_ids = itertools.count(1_000_000)
+        self._rnd = random.Random(faults.seed)
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    async def handle(self, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """(HTTP status, Bot API atsakymas) – su Faults"""
+        self.calls[method] += 1
+        faults = self.faults
+        if faults.applies(method):
+            delay = faults.latency + (self._rnd.random() * faults.jitter if faults.jitter else 0)
+            if delay:
+                await asyncio.sleep(delay)
+            roll = self._rnd.random()
+            if roll < faults.retry_after_rate:
+                self.throttled += 1
+                return 429, {"ok": False, "error_code": 429,
+                             "description": f"Too Many Requests: retry after {faults.retry_after}",
+                             "parameters": {"retry_after": faults.retry_after}}
+            if roll < faults.retry_after_rate + faults.error_rate:
+                self.errors += 1
+                return 400, {"ok": False, "error_code": 400, "description": "Bad Request: injected error"}
+        return self.respond(method, params)
+
+    def respond(self, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        handler = getattr(self, f"_{method}", None)
+        if handler is None:
+            return 200, {"ok": True, "result": True}
+        try:
+            return 200, {"ok": True, "result": handler(params)}
+        except (KeyError, ValueError) as e:
+            return 400, {"ok": False, "error_code": 400, "description": f"Bad Request: {e}"}
+
+    # ---------- Metodai ----------
+    def _getMe(self, params):
+        return {**_user(BOT_ID, True), "username": "tvarkdarys_bench_bot", "can_join_groups": True,
+                "can_read_all_group_messages": True, "supports_inline_queries": False}
+
+    def _getChatAdministrators(self, params):
+        ids = self.admins.get(int(params["chat_id"]), [])
+        return [_admin(uid, creator=i == 0) for i, uid in enumerate(ids)] + [_admin(BOT_ID, is_bot=True)]
+
+    def _getChatMember(self, params):
+        chat_id, user_id = int(params["chat_id"]), int(params["user_id"])
+        ids = self.admins.get(chat_id, [])
+        if user_id == BOT_ID:
+            return _admin(BOT_ID, is_bot=True)
+        if user_id in ids:
+            return _admin(user_id, creator=ids[0] == user_id)
+        if (chat_id, user_id) in self.banned:
+            return {"status": "kicked", "user": _user(user_id), "until_date": 0}
+        return {"status": "member", "user": _user(user_id)}
+
+    def _sendMessage(self, params):
+        chat_id = int(params["chat_id"])
+        return {"message_id": next(self._message_ids), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+                "from": _user(BOT_ID, True), "text": params.get("text", "")}
+
+    def _deleteMessage(self, params):
+        self.deleted += 1
+        return True
+
+    def _deleteMessages(self, params):
+        ids = params.get("message_ids") or []
+        self.deleted += len(json.loads(ids) if isinstance(ids, str) else ids)
+        return True
+
+    def _restrictChatMember(self, params):
+        self.restricted[(int(params["chat_id"]), int(params["user_id"]))] = params.get("permissions")
+        return True
+
+    def _banChatMember(self, params):
+        self.banned.add((int(params["chat_id"]), int(params["user_id"])))
+        return True
+
+    def _unbanChatMember(self, params):
+        self.banned.discard((int(params["chat_id"]), int(params["user_id"])))
+        return True
+
+
+class FakeRequest(BaseRequest):
+    """BaseRequest be tinklo: kiekvienas call'as atsakomas FakeBotApi tame pačiame procese"""
+
+    def __init__(self, api: FakeBotApi):
+        self.api = api
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         *args, **kwargs) -> Tuple[int, bytes]:
+        params = request_data.parameters if request_data else {}
+        status, body = await self.api.handle(url.rsplit("/", 1)[-1], params)
+        return status, json.dumps(body).encode()
+
+
+class FakeBotApiServer:
+    """
+    HTTP stand-in: /bot<token>/<method>, parametrai JSON arba form-urlencoded
+    (HTTPXRequest siunčia form'ą, reikšmės – JSON eilutės).
+    """
+
+    def __init__(self, api: FakeBotApi):
+        self.api = api
+        self.server: Optional[Server] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Grąžina base URL build_app(base_url=...) / BOT_API_URL"""
+        self.server = await serve({}, host, port, fallback=self._route)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _route(self, request: Request):
+        prefix, _, method = request.path.rpartition("/")
+        if not prefix.startswith("/bot") or not method:
+            return 404, "application/json", b'{"ok":false,"error_code":404,"description":"Not Found"}'
+        params: Dict[str, Any] = dict(parse_qsl(request.query))
+        content_type = request.headers.get("content-type", "")
+        if request.body:
+            if content_type.startswith("application/json"):
+                params.update(json.loads(request.body))
+            elif content_type.startswith("application/x-www-form-urlencoded"):
+                params.update(parse_qsl(request.body.decode()))
+            else:
+                return 400, "application/json", b'{"ok":false,"error_code":400,"description":"Bad Request: unsupported body"}'
+        status, body = await self.api.handle(method, params)
+        return status, "application/json", json.dumps(body).encode()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local Bot API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="s per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="s, atsitiktinis priedas")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="429 dalis (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="s 429 atsakyme")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="400 dalis (0..1)")
+    parser.add_argument("--admin", action="append", default=[], metavar="CHAT:USER",
+                        help="chato adminas (pirmas chate – creator)")
+    args = parser.parse_args()
+
+    admins: Dict[int, list] = {}
+    for pair in args.admin:
+        chat_id, user_id = pair.split(":")
+        admins.setdefault(int(chat_id), []).append(int(user_id))
+    api = FakeBotApi(admins, Faults(args.latency, args.jitter, args.retry_after_rate, args.retry_after, args.error_rate))
+    server = FakeBotApiServer(api)
+    url = await server.start(args.host, args.port)
+    print(f"Bot API stand-in: {url}  (BOT_API_URL={url})")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"calls {api.total_calls()}  429 {api.throttled}  errors {api.errors}  {dict(api.calls.most_common(5))}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,277 @@
+"""
+Benchmark: full bot.build_app() stack under replayed update streams
+
+Kiekvienas scenarijus gauna švarų appą, prijungtą prie FakeBotApi (be tinklo),
+update'ai dedami į update pool'ą (kaip webhook'as) tiek greitai, kiek leidžia --rate,
+ir praeina visą tikrą handlerių grandinę (pipeline, filtras, antiflood, XP, ...).
+
+Ataskaita: updates/s, p50/p99 per update'ą ir per handlerį, Bot API call'ai
+per update'ą, RSS prieaugis.
+
+Paleidimas (iš repo šaknies):
+    python -m benchmarks.replay [chat|flood|joins|moderation|commands|all] [updates] [--rate N]
+        [--http] [--latency S] [--retry-after-rate P] [--error-rate P]
+
+--http – per tikrą HTTP (FakeBotApiServer + build_app(base_url=...)), ne tame pačiame procese.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import warnings
+from typing import Callable, Dict, List
+
+CHATS = [-1001, -1002, -1003]
+ADMIN_ID = 7
+USERS = 2_000
+
+# bot.py ir config skaito env importo metu
+os.environ.setdefault("BOT_TOKEN", "1:bench")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", os.environ["BOT_TOKEN"])
+os.environ.setdefault("BASE_URL", "http://127.0.0.1")
+os.environ.setdefault("ALLOWED_CHATS", ",".join(str(c) for c in CHATS))
+
+from telegram import Update  # noqa: E402
+
+import bot  # noqa: E402
+from benchmarks.fake_api import FakeBotApi, FakeBotApiServer, FakeRequest, Faults  # noqa: E402
+from utils.cleanup import get_cleanup  # noqa: E402
+from utils.outbox import get_outbox  # noqa: E402
+
+# post_init kuria task'us prieš start() – kaip ir run_webhook(); įspėjimas čia tik triukšmas
+warnings.filterwarnings("ignore", message="Tasks created via `Application.create_task`")
+
+SYLLABLES = "la bas kai p se ka si šian dien o ras ge ras ei nam pa žiū rė ti fil mą va ka re dr au gai".split()
+
+
+def vocabulary(size: int = 3_000, seed: int = 0) -> List[str]:
+    """Sintetinis žodynas – su keliom dešimtim žodžių visi tekstai būtų dirbtinai panašūs"""
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(1, 4))) for _ in range(size)]
+
+
+WORDS = vocabulary()
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ---------- Update'ų generatoriai ----------
+class Stream:
+    def __init__(self, seed: int = 1):
+        self.rnd = random.Random(seed)
+        self.update_id = 0
+        self.message_ids: Dict[int, int] = {c: 0 for c in CHATS}
+
+    def _next(self, chat_id: int) -> int:
+        self.update_id += 1
+        self.message_ids[chat_id] += 1
+        return self.message_ids[chat_id]
+
+    def message(self, chat_id: int, user_id: int, text: str, reply_to: int = 0) -> dict:
+        message_id = self._next(chat_id)
+        msg = {"message_id": message_id, "date": int(time.time()),
+               "chat": {"id": chat_id, "type": "supergroup", "title": f"chat{chat_id}"},
+               "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+               "text": text}
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        if reply_to:
+            msg["reply_to_message"] = {"message_id": reply_to, "date": msg["date"], "chat": msg["chat"],
+                                       "from": {"id": user_id + 1, "is_bot": False, "first_name": "target"},
+                                       "text": "…"}
+        return {"update_id": self.update_id, "message": msg}
+
+    def join(self, chat_id: int, user_id: int) -> dict:
+        self.update_id += 1
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"u{user_id}"}
+        return {"update_id": self.update_id, "chat_member": {
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"chat{chat_id}"},
+            "from": user, "date": int(time.time()),
+            "old_chat_member": {"status": "left", "user": user},
+            "new_chat_member": {"status": "member", "user": user}}}
+
+    def text(self) -> str:
+        return " ".join(self.rnd.choice(WORDS) for _ in range(self.rnd.randint(2, 14)))
+
+
+def chat(n: int) -> List[dict]:
+    """Įprastas pokalbis: daug userių, keli chatai (XP, filtras, dublikatai)"""
+    s = Stream()
+    return [s.message(s.rnd.choice(CHATS), 1000 + s.rnd.randrange(USERS), s.text()) for _ in range(n)]
+
+
+def flood(n: int) -> List[dict]:
+    """30% žinučių – 20 flooderių, likusios – įprastas fonas (AntiFlood)"""
+    s = Stream(2)
+    out = []
+    for _ in range(n):
+        if s.rnd.random() < 0.3:
+            uid = 100 + s.rnd.randrange(20)
+            out.append(s.message(CHATS[uid % len(CHATS)], uid, s.rnd.choice(WORDS)))
+        else:
+            out.append(s.message(s.rnd.choice(CHATS), 1000 + s.rnd.randrange(USERS), s.text()))
+    return out
+
+
+def joins(n: int) -> List[dict]:
+    """Join banga su pasisveikinimais (InviteTracker, join raid detektorius)"""
+    s = Stream(3)
+    out = []
+    for i in range(n):
+        uid = 50_000 + i
+        chat_id = CHATS[i % len(CHATS)]
+        out.append(s.join(chat_id, uid) if i % 2 == 0 else s.message(chat_id, uid - 1, s.text()))
+    return out
+
+
+def moderation(n: int) -> List[dict]:
+    """
+    Spam'eriai + adminų /warn, /mute, /ban atsakant į spam'ą; kas 1000 update'ų –
+    /massban per paskutines ~50 žinučių (run_batch ribojamas MASS_RATE – tai irgi matuojam)
+    """
+    s = Stream(4)
+    out = []
+    for i in range(n):
+        chat_id = CHATS[i % len(CHATS)]
+        last = s.message_ids[chat_id]
+        roll = s.rnd.random()
+        if i % 1000 == 999:
+            out.append(s.message(chat_id, ADMIN_ID, "/massban", reply_to=max(1, last - 50)))
+        elif roll < 0.04 and last:
+            cmd = ("/warn spam", "/mute 10", "/ban")[int(roll / 0.04 * 3)]
+            out.append(s.message(chat_id, ADMIN_ID, cmd, reply_to=last))
+        else:
+            out.append(s.message(chat_id, 20_000 + s.rnd.randrange(500), s.text()))
+    return out
+
+
+def commands(n: int) -> List[dict]:
+    """Userių komandos (/xp, /lyderiai, /pagalba, /taisykles) su rate_limit"""
+    s = Stream(5)
+    cmds = ("/xp", "/lyderiai", "/pagalba", "/taisykles", "/xpinfo")
+    return [s.message(s.rnd.choice(CHATS), 1000 + s.rnd.randrange(USERS), s.rnd.choice(cmds)) for _ in range(n)]
+
+
+SCENARIOS: Dict[str, Callable[[int], List[dict]]] = {
+    "chat": chat, "flood": flood, "joins": joins, "moderation": moderation, "commands": commands,
+}
+
+
+# ---------- Paleidimas ----------
+def quantile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+async def replay(name: str, n: int, rate: float, faults: Faults = Faults(), http: bool = False) -> dict:
+    rss_before = rss_mb()
+    api = FakeBotApi({chat_id: [ADMIN_ID] for chat_id in CHATS}, faults)
+    server = None
+    if http:
+        server = FakeBotApiServer(api)
+        application = bot.build_app(base_url=await server.start())
+    else:
+        application = bot.build_app(request=FakeRequest(api))
+    pool = application.bot_data["update_pool"]
+    metrics = application.bot_data["metrics"]
+
+    # žalios reikšmės percentiliams (histogramos bucket'ai per grubūs)
+    update_samples: List[float] = []
+    handler_samples: Dict[str, List[float]] = {}
+    observe_update = pool.observer
+
+    def on_update(key: int, seconds: float):
+        update_samples.append(seconds)
+        observe_update(key, seconds)
+
+    observe = metrics.observe
+
+    def on_observe(metric: str, labels, value: float):
+        if metric == "handler_seconds":
+            handler_samples.setdefault(labels[0], []).append(value)
+        observe(metric, labels, value)
+
+    pool.observer = on_update
+    metrics.observe = on_observe
+
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    await asyncio.sleep(0.05)  # admin roster'iai (post_init) – ne į matavimą
+    updates = [Update.de_json(u, application.bot) for u in SCENARIOS[name](n)]
+    calls_before = api.total_calls()
+    rss_start = rss_mb()
+
+    start = time.perf_counter()
+    for i, update in enumerate(updates):
+        if rate and i % 50 == 0:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await pool.submit(update)
+    while pool.processed < len(updates):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    # išsiunčiam, kas liko outbox'e / cleanup buferyje – tai irgi šio srauto API call'ai
+    await get_outbox(application).drain()
+    await get_cleanup(application).drain()
+    calls = api.total_calls() - calls_before
+    rss_end = rss_mb()
+
+    await application.stop()
+    await application.post_stop(application)
+    await application.shutdown()
+    await application.post_shutdown(application)
+    if server:
+        await server.stop()
+
+    slowest = sorted(handler_samples.items(), key=lambda kv: -quantile(kv[1], 0.99))[:5]
+    return {
+        "name": name, "updates": len(updates), "elapsed": elapsed,
+        "p50": quantile(update_samples, 0.5), "p99": quantile(update_samples, 0.99),
+        "calls": calls, "api": dict(api.calls.most_common(4)), "throttled": api.throttled, "errors": api.errors,
+        "rss_build": rss_start - rss_before, "rss_run": rss_end - rss_start,
+        "handlers": [(h, len(s), quantile(s, 0.5), quantile(s, 0.99)) for h, s in slowest],
+    }
+
+
+def report(r: dict):
+    print(f"== {r['name']}: {r['updates']:,} updates")
+    print(f"throughput:   {r['updates'] / r['elapsed']:,.0f} updates/s")
+    print(f"update:       p50 {r['p50'] * 1e6:7.1f} µs   p99 {r['p99'] * 1e6:7.1f} µs")
+    for handler, count, p50, p99 in r["handlers"]:
+        print(f"  {handler:36s} {count:7,}   p50 {p50 * 1e6:7.1f} µs   p99 {p99 * 1e6:7.1f} µs")
+    print(f"api calls:    {r['calls'] / r['updates']:.3f} per update  {r['api']}")
+    if r["throttled"] or r["errors"]:
+        print(f"injected:     {r['throttled']} × 429, {r['errors']} × 400")
+    print(f"rss:          +{r['rss_build']:.1f} MB build, +{r['rss_run']:.1f} MB run")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scenario", nargs="?", default="all", choices=["all", *SCENARIOS])
+    parser.add_argument("updates", nargs="?", type=int, default=20_000)
+    parser.add_argument("--rate", type=float, default=0, help="updates/s (0 – kiek leidžia)")
+    parser.add_argument("--http", action="store_true", help="Bot API per lokalų HTTP serverį")
+    parser.add_argument("--latency", type=float, default=0.0, help="s per Bot API call'ą")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="429 dalis (0..1)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="400 dalis (0..1)")
+    args = parser.parse_args()
+    faults = Faults(latency=args.latency, retry_after_rate=args.retry_after_rate, error_rate=args.error_rate)
+    for name in SCENARIOS if args.scenario == "all" else [args.scenario]:
+        report(await replay(name, args.updates, args.rate, faults, args.http))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""
+Micro-benchmark: per-update permission checks
+
+Lygina senus sukrautus dekoratorius (rate_limit → group_only → group_allowed →
+admin_required; BotConfig() kiekvienam kvietimui) su Pipeline + vienu wrapper'iu.
+
+Paleidimas (iš repo šaknies, reikia TELEGRAM_BOT_TOKEN):
+    python -m benchmarks.update_gate [updates] [repeat]
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import time
+from functools import wraps
+from types import SimpleNamespace
+
+from config import get_config
+from utils.admin_roster import ensure_admins
+from utils.permissions import admin_required, group_allowed, group_only, rate_limit
+from utils.pipeline import Pipeline
+from utils.storage import BotStorage
+
+CHAT_ID = next(iter(get_config().allowed_chats))
+ADMIN_ID = 1
+
+
+# ---------- Senas kelias (kaip buvo prieš pipeline) ----------
+class LegacyConfig:
+    """Senas BotConfig: env skaitomas ir sąrašai statomi kiekvieną kartą"""
+
+    def __init__(self):
+        self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
+        if not self.bot_token:
+            raise ValueError("TELEGRAM_BOT_TOKEN environment variable is required")
+        self.owner_id = 1173493108
+        self.allowed_chats = [CHAT_ID]
+        self.xp_per_message = 1
+        self.xp_cooldown = 60
+        self.max_xp_per_hour = 50
+        self.command_cooldown = 3
+        self.max_warnings = 3
+        self.default_rules = ["1", "2", "3", "4", "5"]
+        self.default_welcome = "Sveiki atvykę, {user}!"
+
+
+def legacy_admin_required(func):
+    @wraps(func)
+    async def wrapper(self, update, context):
+        settings = await ensure_admins(context.bot, context.application.bot_data["storage"], update.effective_chat.id)
+        if update.effective_user.id not in settings.admins:
+            return
+        return await func(self, update, context)
+    return wrapper
+
+
+def legacy_group_only(func):
+    @wraps(func)
+    async def wrapper(self, update, context):
+        if update.effective_chat.type == "private":
+            return
+        return await func(self, update, context)
+    return wrapper
+
+
+def legacy_group_allowed(func):
+    @wraps(func)
+    async def wrapper(self, update, context):
+        cfg = LegacyConfig()
+        chat = update.effective_chat
+        if not chat or chat.id not in cfg.allowed_chats:
+            return
+        return await func(self, update, context)
+    return wrapper
+
+
+def legacy_rate_limit(cooldown_seconds: int = 3):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, update, context):
+            storage = getattr(self, "storage", None)
+            if storage and not storage.check_command_cooldown(update.effective_user.id, cooldown_seconds):
+                return
+            return await func(self, update, context)
+        return wrapper
+    return decorator
+
+
+class Handlers:
+    def __init__(self, storage: BotStorage):
+        self.storage = storage
+        self.calls = 0
+
+    @legacy_rate_limit(0)
+    @legacy_group_only
+    @legacy_group_allowed
+    @legacy_admin_required
+    async def legacy(self, update, context):
+        self.calls += 1
+
+    @rate_limit(0)
+    @group_only
+    @group_allowed
+    @admin_required
+    async def gated(self, update, context):
+        self.calls += 1
+
+
+def make_updates(n: int):
+    chat = SimpleNamespace(id=CHAT_ID, type="supergroup")
+    user = SimpleNamespace(id=ADMIN_ID)
+    msg = SimpleNamespace(text="/komanda")
+    return [SimpleNamespace(update_id=i, effective_chat=chat, effective_user=user, effective_message=msg)
+            for i in range(n)]
+
+
+async def run_legacy(h: Handlers, updates, application) -> float:
+    start = time.perf_counter()
+    for update in updates:
+        await h.legacy(update, SimpleNamespace(application=application, bot=None))
+    return time.perf_counter() - start
+
+
+async def run_gated(h: Handlers, pipeline: Pipeline, updates, application) -> float:
+    start = time.perf_counter()
+    for update in updates:
+        context = SimpleNamespace(application=application, bot=None)
+        await pipeline.process(update, context)
+        await h.gated(update, context)
+    return time.perf_counter() - start
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    storage = BotStorage()
+    storage.set_admins(CHAT_ID, {ADMIN_ID}, ADMIN_ID, {ADMIN_ID})
+    application = SimpleNamespace(bot_data={"storage": storage})
+    pipeline = Pipeline(get_config().allowed_chats, storage)
+    h = Handlers(storage)
+    updates = make_updates(n)
+
+    # apšilimas + pakaitomis kartojami bėgimai be GC, imamas geriausias – vienas bėgimas
+    # per triukšmingas (eilės tvarka, GC pauzės, CPU dažnis)
+    await run_legacy(h, updates[:1000], application)
+    await run_gated(h, pipeline, updates[:1000], application)
+    legacy_runs, gated_runs = [], []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            legacy_runs.append(await run_legacy(h, updates, application))
+            gated_runs.append(await run_gated(h, pipeline, updates, application))
+    finally:
+        gc.enable()
+    legacy_t, gated_t = min(legacy_runs), min(gated_runs)
+
+    assert h.calls == 2 * (n * repeat + 1000), h.calls
+    print(f"updates:   {n:,} × {repeat} (best)")
+    print(f"legacy:    {legacy_t * 1e6 / n:6.2f} µs/update")
+    print(f"pipeline:  {gated_t * 1e6 / n:6.2f} µs/update")
+    print(f"speedup:   {legacy_t / gated_t:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
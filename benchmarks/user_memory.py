@@ -0,0 +1,89 @@
+"""
+Memory benchmark: bytes per user in BotStorage.users
+
+Paleidimas (iš repo šaknies):
+    python -m benchmarks.user_memory [users]
+"""
+
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from utils.storage import BotStorage, UserData
+
+FIRST_NAMES = ["Jonas", "Tomas", "Lukas", "Mantas", "Greta", "Ieva", "Austėja", "Emilija", "Paulius", "Rūta"]
+ROLES = ["", "mergina", "vaikinas"]
+
+
+@dataclass
+class LegacyUserData:
+    """Senasis UserData (be slots, be intern) – palyginimui"""
+    chat_id: int
+    user_id: int
+    username: str
+    first_name: str
+    xp: int = 0
+    last_xp_time: float = 0
+    warnings: int = 0
+    invites_count: int = 0
+    join_date: float = None
+    role: str = ""
+
+    def __post_init__(self):
+        if self.join_date is None:
+            self.join_date = time.time()
+
+
+def _fresh(s: str) -> str:
+    """Nauja string kopija (kaip po JSON dekodavimo), ne literalo nuoroda"""
+    return (s + " ")[:-1]
+
+
+def _fill(table: dict, factory, n: int):
+    for uid in range(n):
+        # stringus kuriam dinamiškai, kaip jie ateina iš Telegram update'ų
+        table[uid] = factory(
+            chat_id=-100,
+            user_id=1_000_000 + uid,
+            username=f"user_{uid}",
+            first_name=_fresh(FIRST_NAMES[uid % len(FIRST_NAMES)]),
+            role=_fresh(ROLES[uid % len(ROLES)]),
+        )
+
+
+def measure(factory, n: int) -> float:
+    tracemalloc.start()
+    table: dict = {}
+    before = tracemalloc.get_traced_memory()[0]
+    _fill(table, factory, n)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n
+
+
+def measure_storage(n: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    storage = BotStorage()
+    for uid in range(n):
+        storage.get_user(-100, 1_000_000 + uid, f"user_{uid}", _fresh(FIRST_NAMES[uid % len(FIRST_NAMES)]))
+        storage.set_user_role(-100, 1_000_000 + uid, _fresh(ROLES[uid % len(ROLES)]))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    legacy = measure(LegacyUserData, n)
+    compact = measure(UserData, n)
+    full = measure_storage(n)
+    print(f"users:                      {n:,}")
+    print(f"legacy dataclass:           {legacy:8.1f} B/user")
+    print(f"slots + interned strings:   {compact:8.1f} B/user  ({100 * (1 - compact / legacy):.0f}% less)")
+    print(f"BotStorage (incl. indexes): {full:8.1f} B/user")
+
+
+if __name__ == "__main__":
+    main()
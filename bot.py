@@ -1,5 +1,11 @@
+import asyncio
+import json
 import os
+import signal
+from typing import Optional
+from telegram import Update
 from telegram.ext import Application
+from telegram.request import BaseRequest, HTTPXRequest
 
 # ====== Handlerių importai ======
 from handlers.commands import register_commands
@@ -9,18 +15,121 @@ from handlers.antiflood import register_antiflood
 from handlers.report import register_report
 from handlers.roles import register_roles
 from handlers.xp_system import register_xp_system
+from handlers.content_filter import register_content_filter
+from handlers.duplicates import register_duplicates
+from utils.pipeline import register_pipeline
+from config import ConfigWatcher, get_config, watch_sighup
+from utils.admin_roster import refresh_admins
+from utils.housekeeping import get_sweeper
+from utils.httpd import Request, serve
+from utils.metrics import MetricsRequest, instrument_handlers, labelled, new_metrics, observe_update
+from utils.outbox import get_outbox
+from utils.modlog import ModLog
+from utils.persistence import SQLiteBackend
+from utils.scheduler import Scheduler, get_scheduler
+from utils.cleanup import get_cleanup
+from utils.update_pool import KeyedUpdateProcessor
+from utils.storage import BotStorage
 
 
 # ====== Config ======
 TOKEN = os.environ["BOT_TOKEN"]
 BASE_URL = os.environ["BASE_URL"]  # Pvz.: https://tvarkdarys-xxxx.a.run.app
 PORT = int(os.environ.get("PORT", "8080"))
+# /metrics – atskiras listener'is, numatytai tik localhost (label'iuose chatų id); 0 = išjungta
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9091"))
 WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "slaptas_zodis")
+DB_PATH = os.environ.get("DB_PATH", "")  # tuščias = tik atmintyje
+DB_FLUSH_MS = int(os.environ.get("DB_FLUSH_MS", "500"))
+MODLOG_DIR = os.environ.get("MODLOG_DIR", "")  # tuščias = moderavimo log'as tik atmintyje
+CONFIG_FILE = os.environ.get("CONFIG_FILE", "")  # JSON su BotConfig laukais; perkraunamas pasikeitus
+UPDATE_WORKERS = int(os.environ.get("UPDATE_WORKERS", "8"))  # lygiagrečiai apdorojami chatai
+UPDATE_QUEUE = int(os.environ.get("UPDATE_QUEUE", "1000"))   # max laukiančių update'ų (backpressure)
+BOT_API_URL = os.environ.get("BOT_API_URL", "")  # tuščias = api.telegram.org; kitaip – pvz. benchmarks.fake_api
 
 
-def build_app() -> Application:
-    """Sukuriam ir surišam visus handlerius į vieną appą."""
-    application = Application.builder().token(TOKEN).build()
+async def _post_init(application: Application):
+    watch_sighup(asyncio.get_running_loop())
+    await application.bot_data["update_pool"].initialize()
+    # useriai kraunami fone – webhook'as priima update'us iškart, o pool'as ir
+    # scheduler'is juos apdoroja tik po warm-up (storage.ready)
+    storage = application.bot_data["storage"]
+    application.create_task(storage.warm_up())
+    application.create_task(get_sweeper(application).run())
+    application.create_task(_run_scheduler(application))
+    # admin roster'į pasiimam iš anksto, kad pirmas update'as nelauktų
+    for chat_id in get_config().allowed_chats:
+        application.create_task(refresh_admins(application.bot, storage, chat_id))
+
+
+async def _run_scheduler(application: Application):
+    await application.bot_data["storage"].ready.wait()
+    await get_scheduler(application).run()
+
+
+async def _post_stop(application: Application):
+    # apdorojam jau priimtus update'us ir išsiunčiam, kas dar liko eilėje, kol bot'as dar gyvas
+    pool = application.bot_data["update_pool"]
+    await pool.drain()
+    await pool.shutdown()
+    await get_outbox(application).drain()
+    await get_cleanup(application).drain()
+
+
+async def _post_shutdown(application: Application):
+    application.bot_data["storage"].close()
+    application.bot_data["modlog"].close()
+
+
+def build_app(request: Optional[BaseRequest] = None, base_url: Optional[str] = None) -> Application:
+    """
+    Sukuriam ir surišam visus handlerius į vieną appą.
+    request – kitas Bot API transportas (benchmark'ams); numatytasis HTTPXRequest.
+    base_url – kitas Bot API serveris (pvz. http://127.0.0.1:8081); numatytasis BOT_API_URL.
+    """
+    base_url = base_url or BOT_API_URL
+    # kiekvienas Bot API call'as matuojamas per metodą / HTTP kodą / chatą
+    metrics = new_metrics()
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(f"{base_url.rstrip('/')}/bot" if base_url else "https://api.telegram.org/bot")
+        .request(MetricsRequest(request or HTTPXRequest(connection_pool_size=256), metrics))
+        .updater(None)  # webhook'ą priimam patys (žr. main)
+        .post_init(_post_init)
+        .post_stop(_post_stop)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
+
+    backend = SQLiteBackend(DB_PATH, flush_interval_ms=DB_FLUSH_MS) if DB_PATH else None
+    storage = application.bot_data["storage"] = BotStorage(backend=backend)
+
+    sweeper = get_sweeper(application)
+    sweeper.add("command_cooldowns", storage.sweep_cooldowns, lambda: len(storage.user_last_command))
+    sweeper.add("muted_users", storage.sweep_mutes, storage.muted_count)
+
+    modlog = application.bot_data["modlog"] = ModLog(MODLOG_DIR or None)
+    sweeper.add("modlog_events", modlog.compact, lambda: len(modlog))
+
+    # laikini veiksmai (unmute, įspėjimų galiojimas, notice trynimas) – tame pačiame DB
+    scheduler = application.bot_data["scheduler"] = Scheduler(application.bot, backend)
+    scheduler.on("delete", get_cleanup(application).delete_many)
+    sweeper.add("timers", lambda now: 0, lambda: len(scheduler))
+    # webhook'as tik įdeda update'ą į pool'ą ir iškart atsako; worker'iai kviečia
+    # application.process_update(), to paties chato update'ai – eilės tvarka
+    pool = application.bot_data["update_pool"] = KeyedUpdateProcessor(
+        application.process_update, workers=UPDATE_WORKERS, max_pending=UPDATE_QUEUE, ready=storage.ready)
+    sweeper.add("pending_updates", lambda now: 0, lambda: pool.pending)
+
+    if CONFIG_FILE:
+        watcher = ConfigWatcher(CONFIG_FILE)
+        sweeper.add("config_reloads", watcher.check, lambda: watcher.reloads)
+        sweeper.add("config_reload_failures", lambda now: 0, lambda: watcher.failures)
+
+    # leidimų faktai suskaičiuojami vieną kartą per update'ą (group -1), handleriai juos skaito
+    register_pipeline(application)
 
     # registruojam tavo handlerių funkcijas
     register_commands(application)
@@ -30,21 +139,83 @@ def build_app() -> Application:
     register_report(application)
     register_roles(application)
     register_xp_system(application)
+    register_content_filter(application)
+    register_duplicates(application)
+
+    # metrikos: handleriai apgaubiami paskutiniai, kai visi jau užregistruoti
+    application.bot_data["metrics"] = metrics
+    pool.observer = observe_update(metrics)
+    instrument_handlers(application, metrics)
+    metrics.gauge("storage_rows", "BotStorage table sizes", ("table",), lambda: labelled(storage.table_sizes()))
+    metrics.gauge("tracked_entries", "Entries in swept in-memory maps", ("map",), lambda: labelled(sweeper.gauges()))
+    metrics.gauge("update_pool", "Update worker pool state", ("stat",), lambda: labelled(pool.metrics()))
+    metrics.gauge("outbox_pending", "Messages waiting in the outbox", (), lambda: {(): get_outbox(application).pending()})
 
     return application
 
 
-def main():
-    app = build_app()
-
-    # PTB startuoja savo aiohttp serverį webhook'ui
-    app.run_webhook(
-        listen="0.0.0.0",
-        port=PORT,
-        url_path="webhook",
-        webhook_url=f"{BASE_URL}/webhook",
+def http_routes(application: Application):
+    """/webhook – Telegram update'ai į eilę (viešas PORT)"""
+
+    async def webhook(request: Request):
+        if request.method != "POST":
+            return 405, "text/plain", b""
+        if request.headers.get("x-telegram-bot-api-secret-token") != WEBHOOK_SECRET:
+            return 403, "text/plain", b""
+        try:
+            update = Update.de_json(json.loads(request.body), application.bot)
+        except ValueError:
+            return 400, "text/plain", b""
+        # pilna eilė = atsakymas vėluoja, Telegram pats sulėtina siuntimą
+        await application.bot_data["update_pool"].submit(update)
+        return 200, "text/plain", b""
+
+    return {"/webhook": webhook}
+
+
+def metrics_routes(application: Application):
+    """/metrics – Prometheus scrape (METRICS_HOST:METRICS_PORT, ne viešas port'as)"""
+
+    async def metrics(request: Request):
+        body = application.bot_data["metrics"].render().encode()
+        return 200, "text/plain; version=0.0.4; charset=utf-8", body
+
+    return {"/metrics": metrics}
+
+
+async def run(application: Application):
+    """Tas pats gyvavimo ciklas kaip run_webhook(), bet su savo HTTP serveriu"""
+    await application.initialize()
+    await application.post_init(application)
+    await application.bot.set_webhook(
+        url=f"{BASE_URL}/webhook",
         secret_token=WEBHOOK_SECRET,
+        allowed_updates=Update.ALL_TYPES,  # chat_member update'ai InviteTracker'iui
     )
+    await application.start()
+    servers = [await serve(http_routes(application), "0.0.0.0", PORT)]
+    if METRICS_PORT:
+        servers.append(await serve(metrics_routes(application), METRICS_HOST, METRICS_PORT))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for server in servers:
+            server.close()
+        for server in servers:
+            await server.wait_closed()
+        await application.stop()
+        await application.post_stop(application)
+        await application.shutdown()
+        await application.post_shutdown(application)
+
+
+def main():
+    asyncio.run(run(build_app()))
 
 
 if __name__ == "__main__":
@@ -1,46 +1,168 @@
 """
 Configuration settings for Tvarkdarys bot
+Vienas nekintamas BotConfig: kraunamas vieną kartą (env + nebūtinas JSON failas iš CONFIG_FILE),
+perkraunamas per SIGHUP arba pasikeitus failui – be bot'o restarto
 """
 
+import json
+import logging
 import os
+import signal
+from dataclasses import dataclass, fields
+from typing import Callable, FrozenSet, List, Optional, Tuple
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
 class BotConfig:
-    """Bot configuration class"""
+    """Bot configuration (frozen – keičiama tik pakeičiant visą objektą per reload_config())"""
+
+    # Bot token iš environment
+    bot_token: str
+
+    # 👑 Owner/Elite ID
+    owner_id: int = 1173493108
+
+    # ✅ LEIDŽIAMI CHAT’AI (įrašyk savo grupės chat_id)
+    # Pvz. supergrupės ID: -100xxxxxxxxxx
+    allowed_chats: FrozenSet[int] = frozenset({
+        -1002737420624  # <-- pakeisk į SAVO grupės chat_id
+    })
+
+    # XP System settings
+    xp_per_message: int = 1
+    xp_cooldown: int = 60  # seconds tarp XP gavimų
+    max_xp_per_hour: int = 50
+    xp_level_base: int = 100        # level n = base * n ** exponent XP
+    xp_level_exponent: float = 1.0
+    xp_max_level: int = 100
+
+    # Rate limiting
+    command_cooldown: int = 3  # seconds tarp komandų
+    max_warnings: int = 3      # warnings iki auto-ban
 
-    def __init__(self):
-        # Bot token iš environment
-        self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
-        if not self.bot_token:
+    # Antiflood: (messages, window_sec, action, mute_minutes); tuščia = handlers.antiflood.DEFAULT_RULES
+    flood_rules: Tuple[Tuple[int, int, str, int], ...] = ()
+
+    # Dublikatų/spam'o klasteriai: (min_users, window_sec, similarity, mute_minutes); tuščia = handlers.duplicates.DEFAULT_RULE
+    duplicate_rule: Tuple[int, int, float, int] = ()
+
+    # Turinio filtras visiems chatams: (žodis arba domenas, delete|warn|ban); chatai papildo per /filtras
+    content_filter: Tuple[Tuple[str, str], ...] = (
+        ("t.me", "warn"),
+        ("telegram.me", "warn"),
+        ("telegram.dog", "warn"),
+    )
+
+    # Default messages in Lithuanian
+    default_rules: Tuple[str, ...] = (
+        "1. Gerbkite visus narius",
+        "2. Draudžiamas šlamštas ir per didelis savireklama",
+        "3. Laikykitės temos diskusijose",
+        "4. Draudžiamos neapykantos kalbos ir diskriminacija",
+        "5. Laikykitės Telegram naudojimo taisyklių"
+    )
+
+    default_welcome: str = (
+        "Sveiki atvykę į mūsų bendruomenę, {user}! 🎉\n\n"
+        "Prašome perskaityti taisykles naudojant /taisykles"
+    )
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "BotConfig":
+        """Env + JSON failas (laukų vardai kaip čia); ALLOWED_CHATS env – kableliais atskirti id"""
+        bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
+        if not bot_token:
             raise ValueError("TELEGRAM_BOT_TOKEN environment variable is required")
 
-        # 👑 Owner/Elite ID
-        self.owner_id = 1173493108
-
-        # ✅ LEIDŽIAMI CHAT’AI (įrašyk savo grupės chat_id)
-        # Pvz. supergrupės ID: -100xxxxxxxxxx
-        self.allowed_chats = [
-            -1002737420624  # <-- pakeisk į SAVO grupės chat_id
-        ]
-
-        # XP System settings
-        self.xp_per_message = 1
-        self.xp_cooldown = 60  # seconds tarp XP gavimų
-        self.max_xp_per_hour = 50
-
-        # Rate limiting
-        self.command_cooldown = 3  # seconds tarp komandų
-        self.max_warnings = 3      # warnings iki auto-ban
-
-        # Default messages in Lithuanian
-        self.default_rules = [
-            "1. Gerbkite visus narius",
-            "2. Draudžiamas šlamštas ir per didelis savireklama",
-            "3. Laikykitės temos diskusijose",
-            "4. Draudžiamos neapykantos kalbos ir diskriminacija",
-            "5. Laikykitės Telegram naudojimo taisyklių"
-        ]
-
-        self.default_welcome = (
-            "Sveiki atvykę į mūsų bendruomenę, {user}! 🎉\n\n"
-            "Prašome perskaityti taisykles naudojant /taisykles"
-        )
+        values = {}
+        path = path or os.getenv("CONFIG_FILE", "")
+        if path:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            names = {f.name for f in fields(cls)} - {"bot_token"}
+            values = {k: v for k, v in data.items() if k in names}
+        if os.getenv("ALLOWED_CHATS"):
+            values["allowed_chats"] = [c for c in os.environ["ALLOWED_CHATS"].split(",") if c.strip()]
+
+        if "allowed_chats" in values:
+            values["allowed_chats"] = frozenset(int(c) for c in values["allowed_chats"])
+        for name in ("flood_rules", "content_filter"):
+            if name in values:
+                values[name] = tuple(tuple(r) for r in values[name])
+        for name in ("default_rules", "duplicate_rule"):
+            if name in values:
+                values[name] = tuple(values[name])
+        return cls(bot_token=bot_token, **values)
+
+
+_current: Optional[BotConfig] = None
+_listeners: List[Callable[[BotConfig], None]] = []
+
+
+def get_config() -> BotConfig:
+    """Vienas bendras BotConfig – kraunamas pirmo kvietimo metu"""
+    global _current
+    if _current is None:
+        _current = BotConfig.load()
+    return _current
+
+
+def on_reload(callback: Callable[[BotConfig], None]):
+    """callback(new_config) – kai komponentas laiko iš config'o išvestą būseną"""
+    _listeners.append(callback)
+
+
+def reload_config() -> BotConfig:
+    """Perkrauna config'ą; jei naujas blogas – paliekam seną"""
+    global _current
+    try:
+        new = BotConfig.load()
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"Config reload failed, keeping old config: {e}")
+        return get_config()
+    _current = new
+    for callback in _listeners:
+        try:
+            callback(new)
+        except Exception as e:
+            logger.error(f"Config reload listener failed: {e}")
+    logger.info(f"Config reloaded: {len(new.allowed_chats)} allowed chats")
+    return new
+
+
+class ConfigWatcher:
+    """CONFIG_FILE mtime tikrinimas – housekeeping job'as (sweep(now) signatūra)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.reloads = 0   # naujas config'as tikrai įdiegtas
+        self.failures = 0  # failas pasikeitė, bet blogas – paliktas senas
+        self._mtime = self._stat()
+
+    def _stat(self) -> float:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return 0.0
+
+    def check(self, now: float) -> int:
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return 0
+        self._mtime = mtime
+        old = _current
+        if reload_config() is old:  # nepavyko – reload_config() grąžino seną
+            self.failures += 1
+            return 0
+        self.reloads += 1
+        return 1
+
+
+def watch_sighup(loop):
+    """`kill -HUP <pid>` → reload_config() (tik Unix)"""
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload_config)
+    except (AttributeError, NotImplementedError, RuntimeError) as e:
+        logger.debug(f"SIGHUP reload unavailable: {e}")
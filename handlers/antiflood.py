@@ -3,12 +3,21 @@ Antiflood handler: gaudo daug trumpų žinučių per trumpą laiką ir automati
 """
 
 import time
-from collections import deque
+from array import array
 from dataclasses import dataclass
-from typing import Dict, Deque
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from telegram import Update, ChatPermissions
-from telegram.ext import ContextTypes
+from telegram.ext import Application, ContextTypes, MessageHandler, filters
+
+from config import BotConfig, get_config, on_reload
+from utils.housekeeping import get_sweeper
+from utils.pipeline import get_gate
+from utils.outbox import get_outbox
+from utils.modlog import get_modlog
+from utils.scheduler import get_scheduler
+from utils.cleanup import NOTICE_TTL, get_cleanup
+from utils.storage import get_storage
 
 
 @dataclass
@@ -26,11 +35,78 @@ DEFAULT_RULES = [
 ]
 
 
+class _Track:
+    """Paskutinių N žinučių laikai žiedo buferyje (N = didžiausias rule.messages)"""
+    __slots__ = ("times", "pos")
+
+    def __init__(self, size: int):
+        self.times = array("d", bytes(8 * size))
+        self.pos = 0
+
+
+class FloodEngine:
+    """
+    Precompiled rule set. Taisyklė (m žinučių per w s) suveikia, kai m-ta
+    naujausia žinutė yra lange – tad užtenka žiedo buferio su paskutiniais
+    max(m) laikais ir vieno palyginimo per taisyklę, be deque popinimo.
+    """
+
+    def __init__(self, rules: Sequence[FloodRule]):
+        # griežčiausia taisyklė tikrinama pirma – surūšiuojam vieną kartą
+        ordered = sorted(rules, key=lambda r: (r.mute_minutes, r.messages), reverse=True)
+        self.size = max((r.messages for r in ordered), default=1)
+        self.max_window = max((r.window_sec for r in ordered), default=0)
+        self._checks: List[Tuple[int, float, FloodRule]] = [(r.messages, r.window_sec, r) for r in ordered]
+        self.tracks: Dict[Tuple[int, int], _Track] = {}
+
+    def hit(self, key: Tuple[int, int], now: float) -> Optional[FloodRule]:
+        """Record one message and return the triggered rule, if any"""
+        track = self.tracks.get(key)
+        if track is None:
+            track = self.tracks[key] = _Track(self.size)
+        times = track.times
+        size = self.size
+        pos = track.pos
+        times[pos] = now
+        pos += 1
+        track.pos = pos if pos < size else 0
+        for messages, window, rule in self._checks:
+            if now - times[(pos - messages) % size] <= window:
+                return rule
+        return None
+
+    def reset(self, key: Tuple[int, int]):
+        self.tracks.pop(key, None)
+
+    def sweep(self, now: float) -> int:
+        """Drop tracks whose newest message is older than every rule window"""
+        cutoff = now - self.max_window
+        size = self.size
+        idle = [k for k, t in self.tracks.items() if t.times[(t.pos - 1) % size] < cutoff]
+        for k in idle:
+            del self.tracks[k]
+        return len(idle)
+
+
+def flood_rules(config: BotConfig) -> List[FloodRule]:
+    if not config.flood_rules:
+        return DEFAULT_RULES
+    return [FloodRule(*r) for r in config.flood_rules]
+
+
 class AntiFlood:
     def __init__(self, owner_id: int, rules=DEFAULT_RULES):
         self.owner_id = owner_id
         self.rules = rules
-        self._bucket: Dict[int, Dict[int, Deque[float]]] = {}
+        self.engine = FloodEngine(rules)
+
+    def reconfigure(self, config: BotConfig):
+        self.owner_id = config.owner_id
+        rules = flood_rules(config)
+        if rules != self.rules:
+            # nauji slenksčiai – seni langai nebetinka, pradedam iš naujo
+            self.rules = rules
+            self.engine = FloodEngine(rules)
 
     def _now(self) -> float:
         return time.time()
@@ -45,41 +121,29 @@ class AntiFlood:
         if user.id == self.owner_id:
             return
 
-        try:
-            member = await context.bot.get_chat_member(chat.id, user.id)
-            if member.status in ("administrator", "creator"):
-                return
-        except Exception:
-            pass
-
-        chat_map = self._bucket.setdefault(chat.id, {})
-        q = chat_map.setdefault(user.id, deque(maxlen=50))
+        if (await get_gate(update, context)).is_admin:
+            return
 
         now = self._now()
-        q.append(now)
-
-        triggered = None
-        for rule in sorted(self.rules, key=lambda r: (r.mute_minutes, r.messages), reverse=True):
-            while q and (now - q[0]) > rule.window_sec:
-                q.popleft()
-            if len(q) >= rule.messages:
-                triggered = rule
-                break
+        triggered = self.engine.hit((chat.id, user.id), now)
 
         if not triggered:
             return
 
-        try:
-            await msg.delete()
-        except Exception:
-            pass
+        # per floodą trinama partijomis (deleteMessages), ne po vieną
+        get_cleanup(context.application).track(chat.id, msg.message_id)
 
+        modlog = get_modlog(context.application)
         if triggered.action == "warn":
-            await context.bot.send_message(
+            modlog.append(chat.id, context.bot.id, user.id, "warn", "antiflood")
+            # per floodą įspėjimai sulipinami į vieną žinutę
+            sent = get_outbox(context.application).send(
                 chat_id=chat.id,
                 text=f"⚠️ {user.mention_html()}, ne floodink. Susirink žodžius į vieną žinutę.",
+                coalesce_key="flood_warn",
                 parse_mode="HTML"
             )
+            get_scheduler(context.application).delete_later(sent, NOTICE_TTL)
             return
 
         if triggered.action == "mute":
@@ -88,7 +152,22 @@ class AntiFlood:
             perms = ChatPermissions(can_send_messages=False)
             try:
                 await context.bot.restrict_chat_member(chat_id=chat.id, user_id=user.id, permissions=perms, until_date=until_date)
-                await context.bot.send_message(chat_id=chat.id, text=f"🔇 {user.mention_html()} užfloodino. Mute {duration_min} min.", parse_mode="HTML")
-                chat_map[user.id] = deque(maxlen=50)
+                unmute_time = get_storage(context.application).mute_user(chat.id, user.id, duration_min)
+                get_scheduler(context.application).schedule_at("unmute", chat.id, user.id, unmute_time)
+                modlog.append(chat.id, context.bot.id, user.id, "mute", f"antiflood {duration_min} min")
+                get_outbox(context.application).send(chat_id=chat.id, text=f"🔇 {user.mention_html()} užfloodino. Mute {duration_min} min.", coalesce_key="flood_mute", parse_mode="HTML")
+                self.engine.reset((chat.id, user.id))
             except Exception as e:
-                await context.bot.send_message(chat_id=chat.id, text=f"⚠️ Nepavyko pritaikyti mute: {e}")
+                get_outbox(context.application).send(chat_id=chat.id, text=f"⚠️ Nepavyko pritaikyti mute: {e}")
+
+
+def register_antiflood(application: Application):
+    config = get_config()
+    af = AntiFlood(owner_id=config.owner_id, rules=flood_rules(config))
+    on_reload(af.reconfigure)
+    get_sweeper(application).add("antiflood_tracks", lambda now: af.engine.sweep(now), lambda: len(af.engine.tracks))
+    # atskira grupė, kad XP handleris irgi gautų tą pačią žinutę
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS, af.handle_text),
+        group=1,
+    )
@@ -4,24 +4,25 @@ Basic command handlers for Tvarkdarys bot
 
 import logging
 from telegram import Update
-from telegram.ext import ContextTypes
+from telegram.ext import Application, CommandHandler, ContextTypes
 from utils.permissions import admin_required, group_only, rate_limit, group_allowed
-from utils.storage import BotStorage
-from config import BotConfig
+from utils.storage import BotStorage, get_storage
+from config import get_config
+from utils.xp_curve import LevelCurve
+from utils.outbox import get_outbox
 
 logger = logging.getLogger(__name__)
 
 class CommandHandlers:
     def __init__(self, storage: BotStorage):
         self.storage = storage
-        self.owner_id = BotConfig().owner_id
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         text = (
             "Kas driso mane pažadinti? 😈 \n"
             "🔥 Pragaras tavęs laukia."
         )
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=text, parse_mode='Markdown')
+        get_outbox(context.application).send(chat_id=update.effective_chat.id, text=text, parse_mode='Markdown')
 
     @rate_limit(3)
     @group_only
@@ -38,13 +39,22 @@ class CommandHandlers:
             "<b>👮 Moderacija:</b>\n"
             "• <code>/ban</code>, <code>/kick</code>, <code>/unban</code>\n"
             "• <code>/mute</code>, <code>/unmute</code>, <code>/warn</code>\n"
-            "• <code>/ispejimai</code> – Vartotojo įspėjimai\n\n"
+            "• <code>/ispejimai</code> – Vartotojo įspėjimai\n"
+            "• <code>/istorija</code> – Vartotojo moderavimo istorija\n"
+            "• <code>/banlist</code>, <code>/importbans</code> – Ban sąrašo eksportas/importas\n"
+            "• <code>/massban</code>, <code>/masskick</code>, <code>/massmute</code> – daug taikinių vienu kartu\n"
+            "• <code>/atrakinti</code> – Nuimti raid lockdown'ą\n"
+            "• <code>/filtras</code> – Draudžiami žodžiai/domenai (delete, warn, ban)\n\n"
 
             "<b>🎭 Rolės:</b>\n"
             "• <code>/mergina</code> – Pasirinkti 👩 Mergina\n"
             "• <code>/vaikinas</code> – Pasirinkti 🧑 Vaikinas\n"
             "• <code>/kas</code> [reply | user_id] – Parodo pasirinktą rolę\n\n"
 
+            "<b>🔗 Kvietimai:</b>\n"
+            "• <code>/kvietimai</code> – Tavo asmeninis linkas ir pakviestųjų skaičius\n"
+            "• <code>/topkvietimai</code> – Daugiausiai pakvietę\n\n"
+
             "<b>🚩 Report:</b>\n"
             "• <code>/report</code> [reply | <i>user_id</i>] [priežastis] – Pranešti adminams\n\n"
 
@@ -52,7 +62,7 @@ class CommandHandlers:
             "• <code>/taisykles</code> – Pragaro įsakymai\n"
             "• <code>/pagalba</code> – Na va, radai ją 😈\n"
         )
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=text, parse_mode="HTML")
+        get_outbox(context.application).send(chat_id=update.effective_chat.id, text=text, parse_mode="HTML")
 
     @group_only
     @group_allowed
@@ -68,7 +78,7 @@ class CommandHandlers:
             "7. 🎭 Rolė: /mergina, /vaikinas, /kas.\n"
             "8. 👑 Demonas – paskutinis žodis."
         )
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=text, parse_mode='HTML')
+        get_outbox(context.application).send(chat_id=update.effective_chat.id, text=text, parse_mode='HTML')
 
     @rate_limit(3)
     @group_only
@@ -78,12 +88,12 @@ class CommandHandlers:
         chat_id = update.effective_chat.id
         user = update.effective_user
 
-        if not user or user.id != self.owner_id:
-            await context.bot.send_message(chat_id=chat_id, text="❌ Čia tik šeimininkui, bičiuk.")
+        if not user or user.id != get_config().owner_id:
+            get_outbox(context.application).send(chat_id=chat_id, text="❌ Čia tik šeimininkui, bičiuk.")
             return
 
         if not context.args:
-            await context.bot.send_message(
+            get_outbox(context.application).send(
                 chat_id=chat_id,
                 text=(
                     "❌ Įrašyk pasisveikinimo žinutę.\n\n"
@@ -98,7 +108,7 @@ class CommandHandlers:
         self.storage.set_welcome_message(chat_id, welcome_msg)
 
         preview = welcome_msg.replace("{user}", user.mention_html())
-        await context.bot.send_message(
+        get_outbox(context.application).send(
             chat_id=chat_id,
             text=f"✅ Nustatyta pasisveikinimo žinutė:\n\n{preview}",
             parse_mode='HTML'
@@ -107,12 +117,24 @@ class CommandHandlers:
     @group_only
     @group_allowed
     async def xpinfo_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        cfg = get_config()
+        curve = LevelCurve.from_config(cfg)
+        milestones = [n for n in (1, 5, 10, 25, 50) if n < curve.max_level]
         text = (
             "<b>📈 XP sistema:</b>\n\n"
-            "• Kiekviena žinutė duoda <b>3 XP</b>\n"
-            "• <b>1 Level = 1000 XP</b>\n"
-            "• Maks. Level – 25 (2,500,000 XP)\n"
-            "• XP skirstomi tolygiai tarp lygių\n"
+            f"• Kiekviena žinutė duoda <b>{cfg.xp_per_message} XP</b> (ne dažniau nei kas {cfg.xp_cooldown} s)\n"
+            f"• Maks. <b>{cfg.max_xp_per_hour} XP</b> per valandą\n"
+            "• Lygiai: " + ", ".join(f"{n} – {curve.thresholds[n]:,} XP" for n in milestones) + "\n"
+            f"• Maks. Level – {curve.max_level} ({curve.thresholds[-1]:,} XP)\n"
             "• TOP – <code>/lyderiai</code>"
         )
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=text, parse_mode='HTML')
+        get_outbox(context.application).send(chat_id=update.effective_chat.id, text=text, parse_mode='HTML')
+
+
+def register_commands(application: Application):
+    h = CommandHandlers(get_storage(application))
+    application.add_handler(CommandHandler("start", h.start_command))
+    application.add_handler(CommandHandler("pagalba", h.pagalba_command))
+    application.add_handler(CommandHandler("taisykles", h.rules_command))
+    application.add_handler(CommandHandler("setwelcome", h.set_welcome_command))
+    application.add_handler(CommandHandler("xpinfo", h.xpinfo_command))
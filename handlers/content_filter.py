@@ -0,0 +1,213 @@
+"""
+Content filter for Tvarkdarys bot
+Raktažodžiai ir domenai (numatytieji iš config + kiekvieno chato) – vienas Aho-Corasick
+automatas per chatą; URL'ai imami iš Telegram entity'ų, ne regex'u.
+Raktažodžiai atitinka tik ištisus žodžius ("lsd" neatitinka "palsdintas").
+Pakeitus chato sąrašą, jo automatas perstatomas visas (ne inkrementiškai) – pirmos
+žinutės metu; tai pigu, nes sąrašai maži, o keičiami retai.
+"""
+
+import html
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from telegram import MessageEntity, Update
+from telegram.ext import Application, ApplicationHandlerStop, CommandHandler, ContextTypes, MessageHandler, filters
+
+from config import BotConfig, get_config, on_reload
+from handlers.moderation import WARN_DECAY_DAYS
+from utils.aho_corasick import Automaton
+from utils.cleanup import NOTICE_TTL, get_cleanup
+from utils.modlog import get_modlog
+from utils.outbox import get_outbox
+from utils.permissions import admin_required, group_allowed, group_only
+from utils.pipeline import get_gate
+from utils.scheduler import get_scheduler
+from utils.storage import BotStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+FILTER_GROUP = 0  # prieš antiflood/XP – sugautas spam'as toliau nekeliauja
+ACTIONS = ("delete", "warn", "ban")
+SEVERITY = {action: i for i, action in enumerate(ACTIONS)}
+URL_TYPES = [MessageEntity.URL, MessageEntity.TEXT_LINK]
+
+
+def is_domain(pattern: str) -> bool:
+    return "." in pattern and not any(c in pattern for c in " /:")
+
+
+WORD_SEP = "\x01"
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def _words(text: str) -> str:
+    """Ne raidžių/skaitmenų sekos -> vienas WORD_SEP; rezultatas apgaubtas WORD_SEP"""
+    return f"{WORD_SEP}{NON_WORD.sub(WORD_SEP, text)}{WORD_SEP}".replace(WORD_SEP * 2, WORD_SEP)
+
+
+def _key(pattern: str) -> str:
+    # domenas lyginamas tik su hostų dalimi: "\x00.sub.t.me\x00" atitinka ".t.me\x00";
+    # raktažodis – su žodžių ribomis: "\x01lsd\x01" ("" – be raidžių, automatas praleidžia)
+    if is_domain(pattern):
+        return f".{pattern}\x00"
+    key = _words(pattern)
+    return key if key != WORD_SEP else ""
+
+
+def extract_hosts(message) -> List[str]:
+    """Hostai iš url / text_link entity'ų (Telegram juos jau išparsino)"""
+    if message.text:
+        entities = message.parse_entities(URL_TYPES)
+    elif message.caption:
+        entities = message.parse_caption_entities(URL_TYPES)
+    else:
+        return []
+    hosts = []
+    for entity, value in entities.items():
+        url = entity.url if entity.type == MessageEntity.TEXT_LINK else value
+        try:
+            host = urlsplit(url if "://" in url else "http://" + url).hostname
+        except ValueError:
+            continue
+        if host:
+            hosts.append(host)
+    return hosts
+
+
+class ContentFilter:
+    def __init__(self, storage: BotStorage):
+        self.storage = storage
+        self._compiled: Dict[int, Automaton] = {}
+        self.reconfigure(get_config())
+
+    def reconfigure(self, config: BotConfig):
+        self.defaults = {p.lower(): a for p, a in config.content_filter}
+        self._compiled.clear()
+
+    # ---------- Automatai ----------
+    def patterns(self, chat_id: int) -> Dict[str, str]:
+        merged = dict(self.defaults)
+        merged.update(self.storage.get_filters(chat_id))
+        return merged
+
+    def automaton(self, chat_id: int) -> Automaton:
+        """Perstatomas visas (ne inkrementiškai), tik pakeitus to chato sąrašą ir tik kai jo prireikia"""
+        automaton = self._compiled.get(chat_id)
+        if automaton is None:
+            automaton = self._compiled[chat_id] = Automaton(
+                {_key(p): (p, a) for p, a in self.patterns(chat_id).items()}
+            )
+        return automaton
+
+    def scan(self, chat_id: int, text: str, hosts: List[str]) -> Optional[Tuple[str, str]]:
+        """Griežčiausias radinys: (pattern, action) arba None"""
+        haystack = _words(text.lower())
+        if hosts:
+            haystack += "".join(f"\x00.{h}\x00" for h in hosts)
+        worst = None
+        for _, hit in self.automaton(chat_id).findall(haystack):
+            if worst is None or SEVERITY[hit[1]] > SEVERITY[worst[1]]:
+                worst = hit
+        return worst
+
+    # ---------- Hot path ----------
+    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        msg = update.effective_message
+        chat = update.effective_chat
+        user = update.effective_user
+        if not msg or not chat or not user or user.is_bot:
+            return
+        gate = await get_gate(update, context)
+        if not gate.allowed or gate.is_admin or user.id == get_config().owner_id:
+            return
+
+        hit = self.scan(chat.id, msg.text or msg.caption or "", extract_hosts(msg))
+        if hit is None:
+            return
+        pattern, action = hit
+        get_cleanup(context.application).track(chat.id, msg.message_id)
+        modlog = get_modlog(context.application)
+        reason = f"filter: {pattern}"
+        text = None
+
+        if action == "warn":
+            total = self.storage.add_warning(chat.id, user.id)
+            get_scheduler(context.application).schedule("warn", chat.id, user.id, WARN_DECAY_DAYS * 86400)
+            modlog.append(chat.id, context.bot.id, user.id, "warn", reason)
+            if total >= get_config().max_warnings:
+                action = "ban"
+            else:
+                text = f"⚠️ {user.mention_html()}, tokių dalykų čia nededam. Įspėjimas {total}/{get_config().max_warnings}."
+
+        if action == "ban":
+            try:
+                await context.bot.ban_chat_member(chat.id, user.id)
+                self.storage.ban_user(chat.id, user.id)
+                modlog.append(chat.id, context.bot.id, user.id, "ban", reason)
+                text = f"🔨 {user.mention_html()} išskrido: <code>{html.escape(pattern)}</code>"
+            except Exception as e:
+                logger.warning(f"Filter ban in {chat.id} failed: {e}")
+
+        if text:
+            sent = get_outbox(context.application).send(chat_id=chat.id, text=text, parse_mode="HTML")
+            get_scheduler(context.application).delete_later(sent, NOTICE_TTL)
+        # sugautos žinutės XP/antiflood nebeapdoroja
+        raise ApplicationHandlerStop
+
+    # ---------- Admin komandos ----------
+    @group_only
+    @group_allowed
+    @admin_required
+    async def filter_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /filtras – sąrašas
+        /filtras add <delete|warn|ban> <žodis arba domenas>[, ...]
+        /filtras del <žodis arba domenas>[, ...]
+        """
+        chat_id = update.effective_chat.id
+        args = context.args or []
+        outbox = get_outbox(context.application)
+        usage = ("❌ <b>Naudojimas:</b>\n<code>/filtras add &lt;delete|warn|ban&gt; žodis, domenas.lt</code>\n"
+                 "<code>/filtras del žodis</code>")
+
+        if not args:
+            own = self.storage.get_filters(chat_id)
+            lines = [f"🧹 <b>Filtras</b> – {len(self.defaults)} numatytųjų, {len(own)} šio chato\n"]
+            for pattern, action in sorted(own.items())[:50]:
+                lines.append(f"• <code>{html.escape(pattern)}</code> → {action}")
+            if len(own) > 50:
+                lines.append(f"… ir dar {len(own) - 50}")
+            outbox.send(chat_id=chat_id, text="\n".join(lines), parse_mode="HTML")
+            return
+
+        op = args[0].lower()
+        if op == "add" and len(args) >= 3 and args[1].lower() in ACTIONS:
+            action, rest = args[1].lower(), " ".join(args[2:])
+        elif op == "del" and len(args) >= 2:
+            action, rest = None, " ".join(args[1:])
+        else:
+            outbox.send(chat_id=chat_id, text=usage, parse_mode="HTML")
+            return
+
+        # be nė vienos raidės/skaitmens raktažodis niekada nesuveiktų – tokių nepriimam
+        patterns = [p.strip().lower() for p in rest.split(",") if _key(p.strip().lower())]
+        if action:
+            self.storage.set_filters(chat_id, {p: action for p in patterns})
+        else:
+            self.storage.remove_filters(chat_id, patterns)
+        self._compiled.pop(chat_id, None)
+        done = "pridėta" if action else "išimta"
+        outbox.send(chat_id=chat_id, text=f"✅ Filtras: {done} {len(patterns)}.")
+
+
+def register_content_filter(application: Application):
+    cf = ContentFilter(get_storage(application))
+    on_reload(cf.reconfigure)
+    application.add_handler(
+        MessageHandler((filters.TEXT | filters.CAPTION) & ~filters.COMMAND & filters.ChatType.GROUPS, cf.handle_message),
+        group=FILTER_GROUP,
+    )
+    application.add_handler(CommandHandler("filtras", cf.filter_command))
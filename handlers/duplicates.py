@@ -0,0 +1,131 @@
+"""
+Duplicate/spam detection for Tvarkdarys bot
+Tas pats (šiek tiek pakeistas) tekstas iš kelių skirtingų accountų per trumpą laiką –
+visos klasterio žinutės trinamos partija, autoriai mutinami.
+Join'ų raid'ai – utils/raid_detector.py + handlers/invite_tracker.py
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+from telegram import ChatPermissions, Update
+from telegram.ext import Application, ApplicationHandlerStop, ContextTypes, MessageHandler, filters
+
+from config import BotConfig, get_config, on_reload
+from utils.batch import run_batch
+from utils.cleanup import get_cleanup
+from utils.housekeeping import get_sweeper
+from utils.modlog import get_modlog
+from utils.near_dup import DuplicateDetector, Entry
+from utils.outbox import TokenBucket, get_outbox
+from utils.pipeline import get_gate
+from utils.scheduler import get_scheduler
+from utils.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_GROUP = 2     # po antiflood, prieš XP – spam'o žinutės XP negauna
+DUP_RATE = 20           # restrict'ų per sekundę
+DUP_CONCURRENCY = 8
+
+
+@dataclass
+class DuplicateRule:
+    min_users: int = 5        # tiek skirtingų userių su beveik tuo pačiu tekstu = spam'as
+    window_sec: int = 120
+    similarity: float = 0.55  # MinHash bin'ų dalis; perrašyti tekstai ~0.6, copy-paste ~1.0
+    mute_minutes: int = 60
+
+
+# bendri sveikinimai ("su gimtadieniu ...") iš 3-4 žmonių dar nėra spam'as
+DEFAULT_RULE = DuplicateRule()
+
+
+def duplicate_rule(config: BotConfig) -> DuplicateRule:
+    if not config.duplicate_rule:
+        return DEFAULT_RULE
+    return DuplicateRule(*config.duplicate_rule)
+
+
+class DuplicateGuard:
+    def __init__(self, application: Application, rule: DuplicateRule = DEFAULT_RULE):
+        self.application = application
+        self.rule = rule
+        self.detector = self._detector(rule)
+        self._api_bucket = TokenBucket(DUP_RATE, DUP_RATE)
+        self.flagged = 0
+
+    @staticmethod
+    def _detector(rule: DuplicateRule) -> DuplicateDetector:
+        return DuplicateDetector(window=rule.window_sec, min_users=rule.min_users, threshold=rule.similarity)
+
+    def reconfigure(self, config: BotConfig):
+        rule = duplicate_rule(config)
+        if rule != self.rule:
+            # nauji slenksčiai – seni langai nebetinka, pradedam iš naujo
+            self.rule = rule
+            self.detector = self._detector(rule)
+
+    def _now(self) -> float:
+        return time.time()
+
+    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        msg = update.effective_message
+        chat = update.effective_chat
+        user = update.effective_user
+        if not msg or not chat or not user or user.is_bot:
+            return
+        gate = await get_gate(update, context)
+        if not gate.allowed or gate.is_admin or user.id == get_config().owner_id:
+            return
+
+        cluster = self.detector.observe(chat.id, self._now(), user.id, msg.message_id, msg.text or msg.caption or "")
+        if not cluster:
+            return
+        self.flagged += len(cluster)
+        await self.punish(chat.id, cluster)
+        raise ApplicationHandlerStop
+
+    async def punish(self, chat_id: int, cluster: List[Entry]):
+        cleanup = get_cleanup(self.application)
+        for entry in cluster:
+            cleanup.track(chat_id, entry.message_id)
+
+        storage = get_storage(self.application)
+        scheduler = get_scheduler(self.application)
+        modlog = get_modlog(self.application)
+        bot = self.application.bot
+        perms = ChatPermissions(can_send_messages=False)
+        minutes = self.rule.mute_minutes
+        until = int(self._now() + minutes * 60)
+        # tas pats useris klasteryje gali būti kelis kartus
+        users: Dict[int, None] = dict.fromkeys(e.user_id for e in cluster if not storage.is_muted(chat_id, e.user_id))
+        if not users:
+            return
+        ok, _ = await run_batch(
+            list(users),
+            lambda uid: bot.restrict_chat_member(chat_id=chat_id, user_id=uid, permissions=perms, until_date=until),
+            self._api_bucket, DUP_CONCURRENCY,
+        )
+        for uid in ok:
+            scheduler.schedule_at("unmute", chat_id, uid, storage.mute_user(chat_id, uid, minutes))
+            modlog.append(chat_id, bot.id, uid, "mute", f"duplicate text, {minutes} min")
+        if ok:
+            get_outbox(self.application).send(
+                chat_id=chat_id,
+                text=f"🚨 Spam'as: {len(ok)} accountai siuntė tą patį tekstą. Žinutės ištrintos, mute {minutes} min.",
+                coalesce_key="duplicates",
+            )
+
+
+def register_duplicates(application: Application):
+    guard = DuplicateGuard(application, duplicate_rule(get_config()))
+    on_reload(guard.reconfigure)
+    # detector'ius keičiasi per reconfigure() – per lambda, ne bound metodai
+    get_sweeper(application).add("duplicate_windows", lambda now: guard.detector.sweep(now), lambda: guard.detector.size())
+    application.add_handler(
+        MessageHandler((filters.TEXT | filters.CAPTION) & ~filters.COMMAND & filters.ChatType.GROUPS, guard.handle_message),
+        group=DUPLICATE_GROUP,
+    )
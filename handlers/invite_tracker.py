@@ -3,21 +3,88 @@
 Invite tracking / member join handler for Tvarkdarys bot
 """
 
+import asyncio
+import html
 import logging
-from telegram import Update
-from telegram.ext import ContextTypes
-from utils.storage import BotStorage
-from utils.permissions import rate_limit, group_only, group_allowed
-from config import BotConfig
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Tuple
+
+from telegram import ChatPermissions, Update
+from telegram.ext import Application, ChatMemberHandler, CommandHandler, ContextTypes
+from utils.storage import BotStorage, get_storage
+from utils.permissions import admin_required, rate_limit, group_only, group_allowed
+from config import get_config
+from utils.outbox import TokenBucket, get_outbox
+from utils.batch import run_batch
+from utils.raid_detector import RaidDetector, is_suspicious
+from utils.modlog import get_modlog
+from utils.scheduler import get_scheduler
 
 logger = logging.getLogger(__name__)
 
+RAID_RESTRICT_MINUTES = 60  # kiek laiko lieka užtildyti per lockdown'ą įėję
+RECENT_JOINERS = 200        # kiek paskutinių join'ų prisimenam retroaktyviam užtildymui
+
 
 class InviteTracker:
     def __init__(self, storage: BotStorage):
         self.storage = storage
-        cfg = BotConfig()
-        self.allowed_chats = set(cfg.allowed_chats)
+        self.raids = RaidDetector()
+        self._recent_joiners: Dict[int, Deque[Tuple[float, int, bool]]] = {}  # (laikas, user_id, įtartinas)
+        self._restrict_queue: Dict[int, List[int]] = {}
+        self._restrict_tasks: Dict[int, asyncio.Task] = {}
+        self._api_bucket = TokenBucket(20, 20)
+
+    # ---------- Raid lockdown ----------
+    def _on_join(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, user) -> None:
+        now = time.time()
+        recent = self._recent_joiners.get(chat_id)
+        if recent is None:
+            recent = self._recent_joiners[chat_id] = deque(maxlen=RECENT_JOINERS)
+        suspicious = is_suspicious(user.username, user.first_name)
+        recent.append((now, user.id, suspicious))
+
+        started = self.raids.observe(chat_id, now, suspicious)
+        if started:
+            logger.warning(f"[RAID] lockdown chat {chat_id}")
+            get_outbox(context.application).send(
+                chat_id=chat_id,
+                text="🚨 <b>Raid aptiktas.</b> Nauji nariai automatiškai užtildomi. Adminai: <code>/atrakinti</code>",
+                parse_mode="HTML",
+            )
+            # retroaktyviai – tik įtartini, įėję per patį aptikimo langą; vėlesni join'ai – visi (žemiau)
+            cutoff = now - self.raids.window
+            self._queue_restrict(context, chat_id, [uid for ts, uid, sus in recent if sus and ts >= cutoff])
+        elif self.raids.in_lockdown(chat_id, now):
+            self._queue_restrict(context, chat_id, [user.id])
+
+    def _queue_restrict(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_ids: List[int]):
+        self._restrict_queue.setdefault(chat_id, []).extend(user_ids)
+        task = self._restrict_tasks.get(chat_id)
+        if task is None or task.done():
+            self._restrict_tasks[chat_id] = asyncio.create_task(self._flush_restricts(context, chat_id))
+
+    async def _flush_restricts(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+        """Surenkam join'ų partiją ir užtildom visus vienu batch'u"""
+        bot = context.bot
+        scheduler = get_scheduler(context.application)
+        perms = ChatPermissions(can_send_messages=False)
+        while self._restrict_queue.get(chat_id):
+            await asyncio.sleep(1)
+            batch = list(dict.fromkeys(self._restrict_queue.pop(chat_id, [])))
+            settings = self.storage.get_group_settings(chat_id)
+            batch = [uid for uid in batch if uid not in settings.admins]
+            until = datetime.utcnow() + timedelta(minutes=RAID_RESTRICT_MINUTES)
+            ok, failed = await run_batch(
+                batch,
+                lambda uid: bot.restrict_chat_member(chat_id=chat_id, user_id=uid, permissions=perms, until_date=until),
+                self._api_bucket,
+            )
+            for uid in ok:
+                scheduler.schedule_at("unmute", chat_id, uid, self.storage.mute_user(chat_id, uid, RAID_RESTRICT_MINUTES))
+            logger.info(f"[RAID] chat {chat_id}: restricted {len(ok)}, failed {len(failed)}")
 
     async def handle_member_join(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -26,18 +93,41 @@ class InviteTracker:
         """
         chat = update.effective_chat
         cmu = update.chat_member
-        if not chat or chat.id not in self.allowed_chats:
+        if not chat or not cmu or not cmu.new_chat_member:
             return
-        if not cmu or not cmu.new_chat_member:
+        new_member = cmu.new_chat_member
+        if chat.id not in get_config().allowed_chats:
             return
+        self.storage.update_admin(
+            chat.id, new_member.user.id, new_member.status,
+            getattr(new_member, "can_restrict_members", False),
+        )
 
         try:
+            old_status = cmu.old_chat_member.status if cmu.old_chat_member else "left"
+            if old_status in ("left", "kicked") and new_member.status in ("member", "restricted"):
+                # ban sąrašas (chato + bendras) – O(1) patikrinimas kiekvienam join'ui
+                if self.storage.is_banned(chat.id, new_member.user.id):
+                    await context.bot.ban_chat_member(chat.id, new_member.user.id)
+                    get_modlog(context.application).append(chat.id, context.bot.id, new_member.user.id, "ban", "ban list")
+                    return
+                self._on_join(context, chat.id, new_member.user)
+                if cmu.invite_link:
+                    creator = cmu.invite_link.creator
+                    inviter = self.storage.attribute_join(
+                        chat.id, new_member.user.id, cmu.invite_link.invite_link,
+                        creator.id if creator and not creator.is_bot else 0,
+                    )
+                    if inviter:
+                        logger.info(f"[INVITE] {new_member.user.id} pakviestas {inviter} chat {chat.id}")
+
             if cmu.new_chat_member.status != "member":
                 return
 
             new_user = cmu.new_chat_member.user
             # užregistruojam / atnaujinam user info storage'e
             self.storage.get_user(
+                chat_id=chat.id,
                 user_id=new_user.id,
                 username=new_user.username or "",
                 first_name=new_user.first_name or ""
@@ -47,24 +137,68 @@ class InviteTracker:
         except Exception as e:
             logger.error(f"InviteTracker.handle_member_join error: {e}")
 
-    # --- OPTIONAL: paprasta komanda pasitikrinti kvietimų statistiką (mock) ---
-    # jei nenori — gali neregistruot bot.py
-    @rate_limit(5)  # <- SVARBU: naudok funkcijos parametrą be self; storage viduje per lambda dekoratoriuje NENAUDOTAS
+    @group_only
+    @group_allowed
+    @admin_required
+    async def unlock_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/atrakinti – nuimti raid lockdown'ą"""
+        self.raids.lift(update.effective_chat.id)
+        get_outbox(context.application).send(chat_id=update.effective_chat.id, text="🔓 Lockdown'as nuimtas.")
+
+    @rate_limit(5)
     @group_only
     @group_allowed
     async def check_invites_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
-        /kvietimai  (demo)
-        Dabar netrakinam realių INVITE linkų – tik placeholderis su user->invites_count iš storage.
-        Jei nori realaus tracking per unikalų linką – darysim vėliau.
+        /kvietimai
+        Sukuria (vieną kartą) asmeninį invite linką; per jį įėję nariai įskaitomi tau.
         """
         user = update.effective_user
         if not user:
             return
+        chat_id = update.effective_chat.id
 
-        u = self.storage.get_user(user.id)
-        count = getattr(u, "invites_count", 0)
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text=f"🔗 {u.first_name} turi {count} kvietimų."
+        link = self.storage.get_user_invite_link(chat_id, user.id)
+        if not link:
+            try:
+                created = await context.bot.create_chat_invite_link(chat_id, name=f"u{user.id}"[:32])
+                link = created.invite_link
+                self.storage.track_invite_link(chat_id, link, user.id)
+            except Exception as e:
+                logger.warning(f"create_chat_invite_link failed: {e}")
+
+        u = self.storage.get_user(chat_id, user.id, user.username or "", user.first_name or "")
+        rank = self.storage.get_invite_rank(chat_id, user.id)
+        text = f"🔗 <b>{html.escape(u.first_name)}</b> pakvietė: <b>{u.invites_count}</b> (#{rank})"
+        if link:
+            text += f"\n<b>Tavo linkas:</b> {link}"
+        else:
+            text += "\n❌ Nepavyko sukurti linko (ar turiu teisę kviesti narius?)"
+        get_outbox(context.application).send(
+            chat_id=chat_id, text=text, parse_mode="HTML", disable_web_page_preview=True
         )
+
+    @rate_limit(10)
+    @group_only
+    @group_allowed
+    async def invite_leaderboard_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/topkvietimai – daugiausiai pakvietę nariai"""
+        chat_id = update.effective_chat.id
+        top = self.storage.get_invite_leaderboard(chat_id, 10)
+        if not top:
+            get_outbox(context.application).send(chat_id=chat_id, text="🔗 Kol kas niekas nieko nepakvietė. <code>/kvietimai</code>", parse_mode="HTML")
+            return
+        lines = ["🔗 <b>Kvietimų lyderiai – Top 10</b>\n"]
+        for i, u in enumerate(top, 1):
+            name = html.escape(u.first_name or str(u.user_id))
+            if u.username:
+                name += f" (@{u.username})"
+            lines.append(f"{i}. <b>{name}</b> – {u.invites_count}")
+        get_outbox(context.application).send(chat_id=chat_id, text="\n".join(lines), parse_mode="HTML")
+
+def register_invite_tracker(application: Application):
+    tracker = InviteTracker(get_storage(application))
+    application.add_handler(ChatMemberHandler(tracker.handle_member_join, ChatMemberHandler.CHAT_MEMBER))
+    application.add_handler(CommandHandler("kvietimai", tracker.check_invites_command))
+    application.add_handler(CommandHandler("atrakinti", tracker.unlock_command))
+    application.add_handler(CommandHandler("topkvietimai", tracker.invite_leaderboard_command))
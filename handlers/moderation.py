@@ -2,22 +2,55 @@
 Moderation command handlers for Tvarkdarys bot
 """
 
+import html
 import logging
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Tuple, Optional
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple, Optional
 
 from telegram import Update, ChatPermissions
-from telegram.ext import ContextTypes
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 from telegram.error import BadRequest, Forbidden
 
-from utils.permissions import admin_required, group_only, can_restrict_user, group_allowed
-from utils.storage import BotStorage
+from utils.permissions import admin_required, group_only, can_restrict_user, group_allowed, restrictable_targets
+from utils.storage import SHARED_BANS, BotStorage, get_storage
+from config import get_config
+from utils.outbox import TokenBucket, get_outbox
+from utils.batch import run_batch
+from utils.modlog import get_modlog
+from utils.scheduler import get_scheduler
 
 logger = logging.getLogger(__name__)
 
+MASS_LIMIT = 500        # max taikinių vienoje komandoje
+MASS_CONCURRENCY = 8    # vienu metu vykdomi API call'ai
+MASS_RATE = 20          # API call'ų per sekundę
+RECENT_PER_CHAT = 2000  # kiek paskutinių žinučių autorių prisimenam reply range'ui
+WARN_DECAY_DAYS = 30    # po tiek dienų be naujo /warn įspėjimai nurašomi
+MOD_NOTICE_TTL = 300    # s – moderavimo pranešimai ištrinami (veiksmai lieka modlog'e)
+
+
 class ModerationHandlers:
-    def __init__(self, storage: BotStorage):
+    def __init__(self, storage: BotStorage, application: Optional[Application] = None):
         self.storage = storage
+        self.application = application  # scheduler'io callback'ams (be update/context)
+        self._recent: Dict[int, Deque[Tuple[int, int]]] = {}  # chat_id -> (message_id, user_id)
+        self._api_bucket = TokenBucket(MASS_RATE, MASS_RATE)
+
+    async def track_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Prisimenam paskutinių žinučių (ir join'ų) autorius – /massban reply range'ui"""
+        msg = update.effective_message
+        chat = update.effective_chat
+        if not msg or not chat:
+            return
+        recent = self._recent.get(chat.id)
+        if recent is None:
+            recent = self._recent[chat.id] = deque(maxlen=RECENT_PER_CHAT)
+        if msg.new_chat_members:
+            for u in msg.new_chat_members:
+                recent.append((msg.message_id, u.id))
+        elif msg.from_user:
+            recent.append((msg.message_id, msg.from_user.id))
 
     def _extract_user_from_message(self, update: Update) -> Tuple[Optional[object], str]:
         target_user = None
@@ -53,13 +86,19 @@ class ModerationHandlers:
 
         return None, "Negaliu rasti pagal @username. Atsakyk į žinutę arba naudok skaitinį user_id."
 
+    def _log(self, update: Update, context: ContextTypes.DEFAULT_TYPE, target_id: int, action: str, reason: str = ""):
+        get_modlog(context.application).append(
+            update.effective_chat.id, update.effective_user.id, target_id, action, reason
+        )
+
     async def _send(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, html: bool = True):
-        await context.bot.send_message(
+        sent = get_outbox(context.application).send(
             chat_id=update.effective_chat.id,
             text=text,
             parse_mode="HTML" if html else None,
             disable_web_page_preview=True,
         )
+        get_scheduler(context.application).delete_later(sent, MOD_NOTICE_TTL)
 
     @group_only
     @group_allowed
@@ -79,6 +118,7 @@ class ModerationHandlers:
         try:
             await context.bot.ban_chat_member(chat_id, target_user.id)
             self.storage.ban_user(chat_id, target_user.id)
+            self._log(update, context, target_user.id, "ban", reason)
             text = f"🔨 <b>User Banned</b>\n\n<b>User:</b> {target_user.first_name}"
             if getattr(target_user, 'username', None):
                 text += f" (@{target_user.username})"
@@ -107,6 +147,7 @@ class ModerationHandlers:
         try:
             await context.bot.ban_chat_member(chat_id, target_user.id)
             await context.bot.unban_chat_member(chat_id, target_user.id)
+            self._log(update, context, target_user.id, "kick", reason)
             text = f"👢 <b>User Kicked</b>\n\n<b>User:</b> {target_user.first_name}"
             if getattr(target_user, 'username', None):
                 text += f" (@{target_user.username})"
@@ -129,6 +170,7 @@ class ModerationHandlers:
         try:
             await context.bot.unban_chat_member(chat_id, user_id)
             self.storage.unban_user(chat_id, user_id)
+            self._log(update, context, user_id, "unban")
             await self._send(update, context, f"✅ <b>User Unbanned</b>\n\n<b>User ID:</b> <code>{user_id}</code>\n<b>Unbanned by:</b> {update.effective_user.mention_html()}")
         except BadRequest as e:
             await self._send(update, context, f"❌ Nepavyko atbaninti: {e}", html=False)
@@ -159,7 +201,10 @@ class ModerationHandlers:
             until = datetime.utcnow() + timedelta(minutes=duration)
             perms = ChatPermissions(can_send_messages=False)
             await context.bot.restrict_chat_member(chat_id=chat_id, user_id=target_user.id, permissions=perms, until_date=until)
-            self.storage.mute_user(chat_id, target_user.id, duration)
+            get_scheduler(context.application).schedule_at(
+                "unmute", chat_id, target_user.id, self.storage.mute_user(chat_id, target_user.id, duration)
+            )
+            self._log(update, context, target_user.id, "mute", f"{duration} min; {reason}")
             text = f"🔇 <b>User Muted</b>\n\n<b>User:</b> {target_user.first_name}"
             if getattr(target_user, 'username', None):
                 text += f" (@{target_user.username})"
@@ -183,6 +228,8 @@ class ModerationHandlers:
             restore = ChatPermissions(can_send_messages=True)
             await context.bot.restrict_chat_member(chat_id=chat_id, user_id=target_user.id, permissions=restore, until_date=0)
             self.storage.unmute_user(chat_id, target_user.id)
+            get_scheduler(context.application).cancel("unmute", chat_id, target_user.id)
+            self._log(update, context, target_user.id, "unmute")
             await self._send(update, context, f"🔊 <b>User Unmuted</b>\n\n<b>User:</b> {target_user.first_name}\n<b>Unmuted by:</b> {update.effective_user.mention_html()}")
         except BadRequest as e:
             await self._send(update, context, f"❌ Nepavyko nuimti mute: {e}", html=False)
@@ -201,18 +248,242 @@ class ModerationHandlers:
             await self._send(update, context, "❌ NOPE!")
             return
         chat_id = update.effective_chat.id
-        total = self.storage.add_warning(chat_id, target_user.id)
-        text = f"⚠️ <b>User Warned</b>\n\n<b>User:</b> {target_user.first_name}"
-        if getattr(target_user, 'username', None):
-            text += f" (@{target_user.username})"
-        text += f"\n<b>ID:</b> <code>{target_user.id}</code>\n<b>Reason:</b> {reason}\n<b>Warnings:</b> {total}/3\n<b>Warned by:</b> {update.effective_user.mention_html()}"
-        if total >= 3:
-            text += "\n\n🔨 <b>Auto-ban:</b> 3 įspėjimai."
+        # per-chat lock: du vienu metu /warn neturi abu pasiekti auto-ban
+        async with self.storage.shard(chat_id).lock:
+            total = self.storage.add_warning(chat_id, target_user.id)
+            get_scheduler(context.application).schedule("warn", chat_id, target_user.id, WARN_DECAY_DAYS * 86400)
+            self._log(update, context, target_user.id, "warn", reason)
+            text = f"⚠️ <b>User Warned</b>\n\n<b>User:</b> {target_user.first_name}"
+            if getattr(target_user, 'username', None):
+                text += f" (@{target_user.username})"
+            text += f"\n<b>ID:</b> <code>{target_user.id}</code>\n<b>Reason:</b> {reason}\n<b>Warnings:</b> {total}/3\n<b>Warned by:</b> {update.effective_user.mention_html()}"
+            if total >= 3 and not self.storage.is_banned(chat_id, target_user.id):
+                text += "\n\n🔨 <b>Auto-ban:</b> 3 įspėjimai."
+                try:
+                    await context.bot.ban_chat_member(chat_id, target_user.id)
+                    self.storage.ban_user(chat_id, target_user.id)
+                    self._log(update, context, target_user.id, "ban", "auto-ban: 3 įspėjimai")
+                except Exception as e:
+                    text += f"\n❌ Nepavyko auto-ban: {e}"
+        await self._send(update, context, text)
+
+    # ---------- Mass moderation ----------
+    def _collect_targets(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> List[int]:
+        """user_id'ai iš argumentų + (reply atveju) visi autoriai nuo tos žinutės iki dabar"""
+        msg = update.message
+        ids: Dict[int, None] = {}
+        for a in context.args or []:
+            if a.isdigit():
+                ids[int(a)] = None
+        if msg and msg.reply_to_message:
+            start = msg.reply_to_message.message_id
+            for message_id, user_id in self._recent.get(update.effective_chat.id, ()):
+                if message_id >= start:
+                    ids[user_id] = None
+        ids.pop(update.effective_user.id, None)
+        ids.pop(context.bot.id, None)
+        return list(ids)[:MASS_LIMIT]
+
+    async def _mass(self, update: Update, context: ContextTypes.DEFAULT_TYPE, usage: str, log_action: str,
+                    title: str, action: Callable[[int], Awaitable], on_success: Callable[[int], None]):
+        targets = self._collect_targets(update, context)
+        if not targets:
+            await self._send(update, context, usage)
+            return
+        allowed = await restrictable_targets(update, context, targets)
+        if allowed is None:
+            await self._send(update, context, "❌ Negaliu. Tu arba aš neturim teisių restrict'inti.")
+            return
+        skipped = len(targets) - len(allowed)
+        ok, failed = await run_batch(allowed, action, self._api_bucket, MASS_CONCURRENCY)
+        for uid in ok:
+            on_success(uid)
+            self._log(update, context, uid, log_action, "mass")
+        text = f"{title}\n\n<b>Pavyko:</b> {len(ok)}\n<b>Nepavyko:</b> {len(failed)}"
+        if skipped:
+            text += f"\n<b>Praleista (adminai):</b> {skipped}"
+        if failed:
+            text += "\n<b>Klaidos:</b> " + ", ".join(f"<code>{uid}</code>" for uid in failed[:20])
+        text += f"\n<b>By:</b> {update.effective_user.mention_html()}"
+        await self._send(update, context, text)
+
+    @group_only
+    @group_allowed
+    @admin_required
+    async def massban_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = update.effective_chat.id
+        await self._mass(
+            update, context,
+            "❌ Nurodyk naudotojus.\n<b>Naudojimas:</b> <code>/massban &lt;id&gt; &lt;id&gt; ...</code> arba reply – visi nuo tos žinutės",
+            "ban",
+            "🔨 <b>Mass Ban</b>",
+            lambda uid: context.bot.ban_chat_member(chat_id, uid),
+            lambda uid: self.storage.ban_user(chat_id, uid),
+        )
+
+    @group_only
+    @group_allowed
+    @admin_required
+    async def masskick_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = update.effective_chat.id
+
+        async def kick(uid: int):
+            await context.bot.ban_chat_member(chat_id, uid)
+            await context.bot.unban_chat_member(chat_id, uid)
+
+        await self._mass(
+            update, context,
+            "❌ Nurodyk naudotojus.\n<b>Naudojimas:</b> <code>/masskick &lt;id&gt; &lt;id&gt; ...</code> arba reply – visi nuo tos žinutės",
+            "kick",
+            "👢 <b>Mass Kick</b>",
+            kick,
+            lambda uid: None,
+        )
+
+    @group_only
+    @group_allowed
+    @admin_required
+    async def massmute_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = update.effective_chat.id
+        duration = 60
+        for a in context.args or []:
+            if a.endswith("m") and a[:-1].isdigit():
+                duration = int(a[:-1]); break
+        until = datetime.utcnow() + timedelta(minutes=duration)
+        perms = ChatPermissions(can_send_messages=False)
+        scheduler = get_scheduler(context.application)
+        await self._mass(
+            update, context,
+            "❌ Nurodyk naudotojus.\n<b>Naudojimas:</b> <code>/massmute [30m] &lt;id&gt; &lt;id&gt; ...</code> arba reply – visi nuo tos žinutės",
+            "mute",
+            f"🔇 <b>Mass Mute</b> ({duration} min)",
+            lambda uid: context.bot.restrict_chat_member(chat_id=chat_id, user_id=uid, permissions=perms, until_date=until),
+            lambda uid: scheduler.schedule_at("unmute", chat_id, uid, self.storage.mute_user(chat_id, uid, duration)),
+        )
+
+    # ---------- Timed actions ----------
+    async def expire_mutes(self, items: List[Tuple[int, int]]):
+        """
+        Scheduler 'unmute': Telegram pats nuima apribojimą ties until_date (visi mute
+        keliai jį nustato), tad čia tik išvalom vietinę būseną ir įrašom į modlog'ą
+        """
+        modlog = get_modlog(self.application)
+        for chat_id, user_id in items:
+            self.storage.unmute_user(chat_id, user_id)
+            modlog.append(chat_id, self.application.bot.id, user_id, "unmute", "expired")
+
+    async def expire_warnings(self, items: List[Tuple[int, int]]):
+        """Scheduler 'warn': WARN_DECAY_DAYS be naujo įspėjimo – nurašom"""
+        for chat_id, user_id in items:
+            if self.storage.get_warnings(chat_id, user_id):
+                self.storage.clear_warnings(chat_id, user_id)
+                get_modlog(self.application).append(chat_id, self.application.bot.id, user_id, "unwarn", "expired")
+
+    # ---------- Ban lists ----------
+    @group_only
+    @group_allowed
+    @admin_required
+    async def banlist_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/banlist [global] – eksportuoja ban sąrašą kaip .txt (vienas user_id eilutėje)"""
+        shared = bool(context.args) and context.args[0].lower() == "global"
+        ids = self.storage.export_bans(SHARED_BANS if shared else update.effective_chat.id)
+        if not ids:
+            await self._send(update, context, "📭 Ban sąrašas tuščias.")
+            return
+        name = "global_bans.txt" if shared else f"bans_{update.effective_chat.id}.txt"
+        await context.bot.send_document(
+            chat_id=update.effective_chat.id,
+            document="\n".join(map(str, ids)).encode(),
+            filename=name,
+            caption=f"🔨 {len(ids)} ban'ų",
+        )
+
+    @group_only
+    @group_allowed
+    @admin_required
+    async def importbans_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/importbans [global] [id ...] arba reply į .txt failą su user_id'ais"""
+        args = list(context.args or [])
+        shared = bool(args) and args[0].lower() == "global"
+        if shared and update.effective_user.id != get_config().owner_id:
+            await self._send(update, context, "❌ Bendrą sąrašą keičia tik šeimininkas.")
+            return
+        ids = [int(a) for a in args if a.isdigit()]
+        reply = update.message.reply_to_message if update.message else None
+        if reply and reply.document:
             try:
-                await context.bot.ban_chat_member(chat_id, target_user.id)
-                self.storage.ban_user(chat_id, target_user.id)
+                tg_file = await context.bot.get_file(reply.document.file_id)
+                data = await tg_file.download_as_bytearray()
+                ids.extend(int(tok) for tok in data.decode("utf-8", "ignore").split() if tok.isdigit())
             except Exception as e:
-                text += f"\n❌ Nepavyko auto-ban: {e}"
+                await self._send(update, context, f"❌ Nepavyko nuskaityti failo: {e}", html=False)
+                return
+        if not ids:
+            await self._send(update, context, "❌ Nėra ką importuoti.\n<b>Naudojimas:</b> <code>/importbans [global] &lt;id&gt; ...</code> arba reply į .txt failą")
+            return
+        added = self.storage.import_bans(SHARED_BANS if shared else update.effective_chat.id, ids)
+        where = "bendrą" if shared else "šio chato"
+        await self._send(update, context, f"✅ Importuota į {where} sąrašą: <b>{added}</b> naujų (iš {len(ids)}).\nJie bus išmesti vos bandys įeiti.")
+
+    @group_only
+    @group_allowed
+    async def globalban_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/globalban <user_id> – ban visuose allowed chatuose (tik owner)"""
+        if update.effective_user.id != get_config().owner_id:
+            await self._send(update, context, "❌ Čia tik šeimininkui, bičiuk.")
+            return
+        target_user, reason = self._extract_user_from_message(update)
+        if not target_user:
+            await self._send(update, context, "❌ Nurodyk naudotoją.\n<b>Naudojimas:</b> <code>/globalban &lt;user_id&gt; [priežastis]</code>")
+            return
+        self.storage.shared_ban(target_user.id)
+        done = 0
+        for chat_id in get_config().allowed_chats:
+            try:
+                await context.bot.ban_chat_member(chat_id, target_user.id)
+                get_modlog(context.application).append(chat_id, update.effective_user.id, target_user.id, "ban", f"global; {reason}")
+                done += 1
+            except (BadRequest, Forbidden) as e:
+                logger.warning(f"Global ban in {chat_id} failed: {e}")
+        await self._send(update, context, f"🌍 <b>Global Ban</b>\n\n<b>ID:</b> <code>{target_user.id}</code>\n<b>Chatai:</b> {done}/{len(get_config().allowed_chats)}\n<b>Reason:</b> {reason}")
+
+    @group_only
+    @group_allowed
+    async def globalunban_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/globalunban <user_id> – išimti iš bendro sąrašo (tik owner)"""
+        if update.effective_user.id != get_config().owner_id:
+            await self._send(update, context, "❌ Čia tik šeimininkui, bičiuk.")
+            return
+        if not context.args or not context.args[0].isdigit():
+            await self._send(update, context, "❌ Paduok skaitinį user_id.\n<b>Naudojimas:</b> <code>/globalunban &lt;user_id&gt;</code>")
+            return
+        user_id = int(context.args[0])
+        self.storage.shared_unban(user_id)
+        for chat_id in get_config().allowed_chats:
+            try:
+                await context.bot.unban_chat_member(chat_id, user_id, only_if_banned=True)
+            except (BadRequest, Forbidden) as e:
+                logger.warning(f"Global unban in {chat_id} failed: {e}")
+        await self._send(update, context, f"✅ <code>{user_id}</code> išimtas iš bendro ban sąrašo.")
+
+    @group_only
+    @group_allowed
+    @admin_required
+    async def history_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/istorija <user_id> arba reply – paskutiniai moderavimo veiksmai prieš narį"""
+        target_user, _ = self._extract_user_from_message(update)
+        if not target_user:
+            await self._send(update, context, "❌ Nurodyk naudotoją.\n<b>Naudojimas:</b> <code>/istorija &lt;user_id&gt;</code> arba reply su <code>/istorija</code>")
+            return
+        events = get_modlog(context.application).history(update.effective_chat.id, target_user.id, 15)
+        text = f"📜 <b>Moderavimo istorija</b>\n\n<b>User:</b> {html.escape(target_user.first_name or '')} (<code>{target_user.id}</code>)\n"
+        if not events:
+            text += "\n🟢 <b>Švaru.</b>"
+        for e in events:
+            when = datetime.utcfromtimestamp(e.ts).strftime("%Y-%m-%d %H:%M")
+            text += f"\n<code>{when}</code> <b>{e.action}</b> by <code>{e.actor_id}</code>"
+            if e.reason:
+                text += f" – {html.escape(e.reason)}"
         await self._send(update, context, text)
 
     @group_only
@@ -221,7 +492,7 @@ class ModerationHandlers:
         target_user, _ = self._extract_user_from_message(update)
         if not target_user:
             target_user = update.effective_user
-        count = self.storage.get_warnings(target_user.id)
+        count = self.storage.get_warnings(update.effective_chat.id, target_user.id)
         text = f"⚠️ <b>Warning Status</b>\n\n<b>User:</b> {target_user.first_name}"
         if getattr(target_user, 'username', None):
             text += f" (@{target_user.username})"
@@ -231,3 +502,26 @@ class ModerationHandlers:
         elif count == 1: text += "\n🟠 <b>Atsargiau.</b>"
         else: text += "\n🟢 <b>Švaru.</b>"
         await self._send(update, context, text)
+
+
+def register_moderation(application: Application):
+    h = ModerationHandlers(get_storage(application), application)
+    scheduler = get_scheduler(application)
+    scheduler.on("unmute", h.expire_mutes)
+    scheduler.on("warn", h.expire_warnings)
+    application.add_handler(CommandHandler("ban", h.ban_command))
+    application.add_handler(CommandHandler("kick", h.kick_command))
+    application.add_handler(CommandHandler("unban", h.unban_command))
+    application.add_handler(CommandHandler("mute", h.mute_command))
+    application.add_handler(CommandHandler("unmute", h.unmute_command))
+    application.add_handler(CommandHandler("warn", h.warn_command))
+    application.add_handler(CommandHandler("ispejimai", h.check_warnings_command))
+    application.add_handler(CommandHandler("massban", h.massban_command))
+    application.add_handler(CommandHandler("masskick", h.masskick_command))
+    application.add_handler(CommandHandler("massmute", h.massmute_command))
+    application.add_handler(CommandHandler("istorija", h.history_command))
+    application.add_handler(CommandHandler("banlist", h.banlist_command))
+    application.add_handler(CommandHandler("importbans", h.importbans_command))
+    application.add_handler(CommandHandler("globalban", h.globalban_command))
+    application.add_handler(CommandHandler("globalunban", h.globalunban_command))
+    application.add_handler(MessageHandler(filters.ChatType.GROUPS & ~filters.COMMAND, h.track_message), group=4)
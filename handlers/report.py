@@ -7,17 +7,19 @@ import logging
 from typing import Optional, Tuple
 
 from telegram import Update
-from telegram.ext import ContextTypes
-from config import BotConfig
-from utils.storage import BotStorage
+from telegram.ext import Application, CommandHandler, ContextTypes
+from config import get_config
+from utils.storage import BotStorage, get_storage
 from utils.permissions import group_only, group_allowed
+from utils.outbox import get_outbox
+from utils.cleanup import NOTICE_TTL
+from utils.scheduler import get_scheduler
 
 logger = logging.getLogger(__name__)
 
 class ReportHandlers:
     def __init__(self, storage: BotStorage):
         self.storage = storage
-        self.owner_id = BotConfig().owner_id
 
     def _extract_target(self, update: Update) -> Tuple[Optional[int], str]:
         msg = update.message
@@ -68,11 +70,11 @@ class ReportHandlers:
             if link:
                 lines.append(f"<b>Žinutės nuoroda:</b> {html.escape(link)}")
 
-            await context.bot.send_message(chat_id=self.owner_id, text="\n".join(lines), parse_mode="HTML", disable_web_page_preview=True)
+            await context.bot.send_message(chat_id=get_config().owner_id, text="\n".join(lines), parse_mode="HTML", disable_web_page_preview=True)
 
             if reported_text:
                 safe = reported_text if len(reported_text) < 4000 else reported_text[:4000] + "…"
-                await context.bot.send_message(chat_id=self.owner_id, text=f"<b>Raportuota žinutė:</b>\n\n{html.escape(safe)}", parse_mode="HTML")
+                await context.bot.send_message(chat_id=get_config().owner_id, text=f"<b>Raportuota žinutė:</b>\n\n{html.escape(safe)}", parse_mode="HTML")
 
         except Exception as e:
             logger.warning(f"DM owner failed: {e}")
@@ -99,7 +101,8 @@ class ReportHandlers:
             reported_text = msg.reply_to_message.text or msg.reply_to_message.caption or ""
         link = self._message_link(update)
 
-        await context.bot.send_message(chat_id=chat.id, text="✅ Report priimtas. Adminai informuoti.")
+        ack = get_outbox(context.application).send(chat_id=chat.id, text="✅ Report priimtas. Adminai informuoti.")
+        get_scheduler(context.application).delete_later(ack, NOTICE_TTL)
 
         await self._dm_owner(
             context,
@@ -113,3 +116,8 @@ class ReportHandlers:
             link=link,
             reported_text=reported_text,
         )
+
+
+def register_report(application: Application):
+    h = ReportHandlers(get_storage(application))
+    application.add_handler(CommandHandler("report", h.report_command))
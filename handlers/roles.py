@@ -3,9 +3,10 @@ Role selection handlers: /mergina, /vaikinas, /kas
 """
 
 from telegram import Update
-from telegram.ext import ContextTypes
-from utils.storage import BotStorage
+from telegram.ext import Application, CommandHandler, ContextTypes
+from utils.storage import BotStorage, get_storage
 from utils.permissions import group_only, group_allowed
+from utils.outbox import get_outbox
 
 MERGINA = "mergina"
 VAIKINAS = "vaikinas"
@@ -14,16 +15,16 @@ class RoleHandlers:
     def __init__(self, storage: BotStorage):
         self.storage = storage
 
-    async def _announce_role(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, role: str):
+    async def _announce_role(self, update: Update, context: ContextTypes.DEFAULT_TYPE, role: str):
         chat_id = update.effective_chat.id
-        member = await context.bot.get_chat_member(chat_id, user_id)
-        mention = member.user.mention_html()
+        # rolę renkasi pats komandos autorius – jo User jau yra update'e, Bot API nereikia
+        mention = update.effective_user.mention_html()
         role_nice = "👩 Mergina" if role == MERGINA else "🧑 Vaikinas"
-        await context.bot.send_message(chat_id=chat_id, text=f"{mention} pasirinko rolę: <b>{role_nice}</b>.", parse_mode="HTML")
+        get_outbox(context.application).send(chat_id=chat_id, text=f"{mention} pasirinko rolę: <b>{role_nice}</b>.", parse_mode="HTML")
 
     async def _show_role(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
         chat_id = update.effective_chat.id
-        udata = self.storage.get_user(user_id)
+        udata = self.storage.get_user(chat_id, user_id)
         role = (udata.role or "").lower()
         if role == MERGINA:
             txt = f"<b>{udata.first_name}</b> rolė: 👩 <b>Mergina</b>"
@@ -31,23 +32,23 @@ class RoleHandlers:
             txt = f"<b>{udata.first_name}</b> rolė: 🧑 <b>Vaikinas</b>"
         else:
             txt = f"<b>{udata.first_name}</b> dar nepasirinko rolės."
-        await context.bot.send_message(chat_id=chat_id, text=txt, parse_mode="HTML")
+        get_outbox(context.application).send(chat_id=chat_id, text=txt, parse_mode="HTML")
 
     @group_only
     @group_allowed
     async def mergina_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         if not user: return
-        self.storage.set_user_role(user.id, MERGINA)
-        await self._announce_role(update, context, user.id, MERGINA)
+        self.storage.set_user_role(update.effective_chat.id, user.id, MERGINA)
+        await self._announce_role(update, context, MERGINA)
 
     @group_only
     @group_allowed
     async def vaikinas_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         if not user: return
-        self.storage.set_user_role(user.id, VAIKINAS)
-        await self._announce_role(update, context, user.id, VAIKINAS)
+        self.storage.set_user_role(update.effective_chat.id, user.id, VAIKINAS)
+        await self._announce_role(update, context, VAIKINAS)
 
     @group_only
     @group_allowed
@@ -60,3 +61,10 @@ class RoleHandlers:
         elif context.args and context.args[0].isdigit():
             target_id = int(context.args[0])
         await self._show_role(update, context, target_id)
+
+
+def register_roles(application: Application):
+    h = RoleHandlers(get_storage(application))
+    application.add_handler(CommandHandler("mergina", h.mergina_command))
+    application.add_handler(CommandHandler("vaikinas", h.vaikinas_command))
+    application.add_handler(CommandHandler("kas", h.kas_command))
@@ -2,26 +2,59 @@
 XP (Experience Points) system handlers for Tvarkdarys bot
 """
 
+import asyncio
+import html
 import logging
 import time
+from typing import Dict
+
 from telegram import Update
-from telegram.ext import ContextTypes
-from utils.storage import BotStorage
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+from utils.storage import BotStorage, UserData, get_storage
 from utils.permissions import rate_limit, group_only, group_allowed
-from config import BotConfig
+from config import BotConfig, get_config, on_reload
+from utils.outbox import get_outbox
+from utils.housekeeping import get_sweeper
+from utils.xp_curve import HourlyCounter, LevelCurve
 
 logger = logging.getLogger(__name__)
 
+LEVELUP_BATCH_SEC = 10  # per tiek sekundžių pasiekti lygiai paskelbiami viena žinute
+
 class XPSystem:
     def __init__(self, storage: BotStorage):
         self.storage = storage
-        self.owner_id = BotConfig().owner_id
-        self.allowed_chats = BotConfig().allowed_chats
+        self.hourly = HourlyCounter()
+        self._levelups: Dict[int, Dict[int, UserData]] = {}  # chat_id -> {user_id: user}
+        self._announce_tasks: Dict[int, asyncio.Task] = {}
+        self.reconfigure(get_config())
+
+    def reconfigure(self, config: BotConfig):
+        self.curve = LevelCurve.from_config(config)
+
+    # ---------- Level-up announcements ----------
+    def _queue_levelup(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, user: UserData):
+        self._levelups.setdefault(chat_id, {})[user.user_id] = user
+        task = self._announce_tasks.get(chat_id)
+        if task is None or task.done():
+            self._announce_tasks[chat_id] = asyncio.create_task(self._announce(context, chat_id))
+
+    async def _announce(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int):
+        await asyncio.sleep(LEVELUP_BATCH_SEC)
+        users = self._levelups.pop(chat_id, {})
+        if not users:
+            return
+        lines = ["🎉 <b>Naujas lygis!</b>\n"]
+        for u in users.values():
+            lines.append(f"• <b>{html.escape(u.first_name or str(u.user_id))}</b> → Level {self.curve.level(u.xp)}")
+        get_outbox(context.application).send(
+            chat_id=chat_id, text="\n".join(lines), coalesce_key="levelup", parse_mode="HTML"
+        )
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle regular messages for XP gain (tik allowed chatuose)"""
         chat = update.effective_chat
-        if not chat or chat.id not in self.allowed_chats:
+        if not chat or chat.id not in get_config().allowed_chats:
             return
         if not update.effective_user or update.effective_user.is_bot:
             return
@@ -29,25 +62,41 @@ class XPSystem:
             return
 
         user = update.effective_user
+        cfg = get_config()
 
         # Elite – neskaičiuojam XP
-        if user.id == self.owner_id:
+        if user.id == cfg.owner_id:
+            return
+
+        # valandos limitas – slenkantis skaitiklis, O(1)
+        key = (chat.id, user.id)
+        now = time.time()
+        amount = cfg.xp_per_message
+        if self.hourly.count(key, now) + amount > cfg.max_xp_per_hour:
             return
 
         user_data = self.storage.get_user(
+            chat_id=chat.id,
             user_id=user.id,
             username=user.username or "",
             first_name=user.first_name or ""
         )
+        old_xp = user_data.xp
         # Cooldown inside storage
-        xp_gained = self.storage.add_xp(user.id, 1)
-        if xp_gained:
-            logger.debug(f"User {user.id} gained 1 XP. Total now: {user_data.xp}")
+        if not self.storage.add_xp(chat.id, user.id, amount, cfg.xp_cooldown):
+            return
+        self.hourly.add(key, now, amount)
+        logger.debug(f"User {user.id} gained {amount} XP. Total now: {user_data.xp}")
+
+        next_at = self.curve.next_at(old_xp)
+        if next_at is not None and user_data.xp >= next_at:
+            self._queue_levelup(context, chat.id, user_data)
 
     @rate_limit(5)
     @group_only
     @group_allowed
     async def check_xp_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = update.effective_chat.id
         user = update.effective_user
         target_user = user
 
@@ -56,7 +105,7 @@ class XPSystem:
             target_user = update.message.reply_to_message.from_user
         elif context.args and context.args[0].isdigit():
             target_user_id = int(context.args[0])
-            target_user_data = self.storage.get_user(target_user_id)
+            target_user_data = self.storage.get_user(chat_id, target_user_id)
             if target_user_data:
                 class MinimalUser:
                     def __init__(self, user_data):
@@ -65,21 +114,19 @@ class XPSystem:
                         self.username = user_data.username
                 target_user = MinimalUser(target_user_data)
             else:
-                await context.bot.send_message(chat_id=update.effective_chat.id, text="❌ Nu bbz, nėra tokio userio.")
+                get_outbox(context.application).send(chat_id=update.effective_chat.id, text="❌ Nu bbz, nėra tokio userio.")
                 return
 
         user_data = self.storage.get_user(
+            chat_id=chat_id,
             user_id=target_user.id,
             username=getattr(target_user, 'username', '') or "",
             first_name=getattr(target_user, 'first_name', '') or ""
         )
 
-        all_users = sorted(self.storage.users.values(), key=lambda x: x.xp, reverse=True)
-        rank = next((i + 1 for i, u in enumerate(all_users) if u.user_id == target_user.id), len(all_users))
+        rank = self.storage.get_rank(chat_id, target_user.id)
 
-        current_level = user_data.xp // 100
-        xp_for_next_level = (current_level + 1) * 100
-        xp_needed = xp_for_next_level - user_data.xp
+        current_level, xp_in_level, level_span = self.curve.progress(user_data.xp)
 
         last_xp_time = ""
         if user_data.last_xp_time > 0:
@@ -90,11 +137,16 @@ class XPSystem:
         else:
             last_xp_time = "Niekada"
 
-        progress = min(100, int((user_data.xp % 100) * 100 / 100))
+        if level_span is None:
+            next_level = "maksimalus pasiektas"
+        else:
+            next_level = f"reikia {level_span - xp_in_level} XP"
+
+        progress = 100 if level_span is None else min(100, xp_in_level * 100 // level_span)
         progress_bar = "▓" * (progress // 10) + "░" * (10 - progress // 10)
 
         elite_suffix = ""
-        if target_user.id == self.owner_id:
+        if target_user.id == get_config().owner_id:
             elite_suffix = " 👑 Elite ♾️"
 
         xp_text = (
@@ -106,13 +158,13 @@ class XPSystem:
         xp_text += (
             f"\n<b>Lygis:</b> {current_level}"
             f"\n<b>XP:</b> {user_data.xp:,}"
-            f"\n<b>Reitingas:</b> #{rank} iš {len(self.storage.users)}"
-            f"\n<b>Kitas Lygis:</b> reikia {xp_needed} XP"
+            f"\n<b>Reitingas:</b> #{rank} iš {self.storage.user_count(chat_id)}"
+            f"\n<b>Kitas Lygis:</b> {next_level}"
             f"\n<b>Paskutinis XP:</b> {last_xp_time}"
             f"\n<b>Progresas:</b> {progress_bar} {progress}%"
         )
 
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=xp_text, parse_mode="HTML")
+        get_outbox(context.application).send(chat_id=update.effective_chat.id, text=xp_text, parse_mode="HTML")
 
     @rate_limit(10)
     @group_only
@@ -120,7 +172,7 @@ class XPSystem:
     async def leaderboard_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         top_users = self.storage.get_leaderboard(update.effective_chat.id, 10)
         if not top_users:
-            await context.bot.send_message(
+            get_outbox(context.application).send(
                 chat_id=update.effective_chat.id,
                 text="📊 <b>Lyderių sąrašas</b>\n\nKol kas nėra ką rodyti!\nNorint pradėti kelti XP reikia chatint! 💬",
                 parse_mode="HTML"
@@ -131,11 +183,11 @@ class XPSystem:
         medals = ["🥇", "🥈", "🥉"]
 
         # išmetam owner'į iš sąrašo
-        filtered = [u for u in top_users if u.user_id != self.owner_id]
+        filtered = [u for u in top_users if u.user_id != get_config().owner_id]
 
         for i, user_data in enumerate(filtered):
             rank = i + 1
-            level = user_data.xp // 100
+            level = self.curve.level(user_data.xp)
             rank_display = medals[rank - 1] if rank <= 3 else f"{rank}."
             username_display = user_data.first_name
             if user_data.username:
@@ -143,13 +195,24 @@ class XPSystem:
             leaderboard_text += f"{rank_display} <b>{username_display}</b>\n    Level {level} • {user_data.xp:,} XP\n\n"
 
         # user's own position
-        user_data = self.storage.get_user(update.effective_user.id)
-        all_users = sorted(self.storage.users.values(), key=lambda x: x.xp, reverse=True)
-        user_rank = next((i + 1 for i, u in enumerate(all_users) if u.user_id == update.effective_user.id), None)
-        if user_rank and user_rank > 10:
-            user_level = user_data.xp // 100
+        user_data = self.storage.get_user(update.effective_chat.id, update.effective_user.id)
+        user_rank = self.storage.get_rank(update.effective_chat.id, update.effective_user.id)
+        if user_rank > 10:
+            user_level = self.curve.level(user_data.xp)
             leaderboard_text += f"---\n<b>Tavo pozicija:</b> #{user_rank}\nLevelis {user_level} • {user_data.xp:,} XP"
 
-        leaderboard_text += "\n\n💡 <i>Kelk XP bendraudamas! +1 XP per žinutę</i>"
+        leaderboard_text += f"\n\n💡 <i>Kelk XP bendraudamas! +{get_config().xp_per_message} XP per žinutę</i>"
+
+        get_outbox(context.application).send(chat_id=update.effective_chat.id, text=leaderboard_text, parse_mode='HTML')
+
 
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=leaderboard_text, parse_mode='HTML')
+def register_xp_system(application: Application):
+    xp = XPSystem(get_storage(application))
+    on_reload(xp.reconfigure)
+    get_sweeper(application).add("xp_hourly", xp.hourly.sweep, lambda: len(xp.hourly))
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS, xp.handle_message),
+        group=3,
+    )
+    application.add_handler(CommandHandler("xp", xp.check_xp_command))
+    application.add_handler(CommandHandler("lyderiai", xp.leaderboard_command))
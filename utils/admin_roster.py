@@ -0,0 +1,62 @@
+"""
+Admin roster for Tvarkdarys bot
+Vienas getChatAdministrators per chatą; admin patikrinimai atsakomi iš atminties
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from utils.storage import BotStorage, GroupSettings
+
+logger = logging.getLogger(__name__)
+
+ROSTER_MAX_AGE = 600  # seconds – po tiek roster'is atnaujinamas fone
+
+_refreshing: Dict[int, asyncio.Task] = {}
+
+
+async def refresh_admins(bot, storage: BotStorage, chat_id: int) -> GroupSettings:
+    """Fetch the admin list once and store it as frozensets in GroupSettings"""
+    members = await bot.get_chat_administrators(chat_id)
+    admins, can_restrict = set(), set()
+    creator_id = 0
+    for m in members:
+        uid = m.user.id
+        admins.add(uid)
+        if m.status == "creator":
+            creator_id = uid
+            can_restrict.add(uid)
+        elif getattr(m, "can_restrict_members", False):
+            can_restrict.add(uid)
+    storage.set_admins(chat_id, admins, creator_id, can_restrict)
+    logger.debug(f"Admin roster for {chat_id}: {len(admins)} admins")
+    return storage.get_group_settings(chat_id)
+
+
+def _schedule_refresh(bot, storage: BotStorage, chat_id: int) -> asyncio.Task:
+    task = _refreshing.get(chat_id)
+    if task is None or task.done():
+        task = asyncio.create_task(refresh_admins(bot, storage, chat_id))
+        task.add_done_callback(_log_refresh_error)
+        _refreshing[chat_id] = task
+    return task
+
+
+def _log_refresh_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Admin roster refresh failed: {task.exception()}")
+
+
+async def ensure_admins(bot, storage: BotStorage, chat_id: int) -> GroupSettings:
+    """
+    Roster iš atminties. Pirmą kartą laukiam fetch'o; vėliau pasenusį
+    roster'į atnaujinam fone, o hot path'as tinklo nebeliečia.
+    """
+    settings = storage.get_group_settings(chat_id)
+    if not settings.admins_updated:
+        await asyncio.shield(_schedule_refresh(bot, storage, chat_id))
+    elif time.time() - settings.admins_updated > ROSTER_MAX_AGE:
+        _schedule_refresh(bot, storage, chat_id)
+    return settings
@@ -0,0 +1,69 @@
+"""
+Aho-Corasick automaton for Tvarkdarys bot content filter
+Visi raktažodžiai randami vienu teksto perėjimu – kaina priklauso nuo teksto ilgio,
+ne nuo sąrašo dydžio
+"""
+
+from collections import deque
+from typing import Dict, Generic, List, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class Automaton(Generic[V]):
+    """patterns: {pattern: payload}. Patternai lyginami tiksliai – normalizuok (lower()) prieš kurdamas"""
+
+    __slots__ = ("goto", "fail", "out", "size")
+
+    def __init__(self, patterns: Dict[str, V]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[Tuple[str, V], ...]] = [()]
+        for pattern, payload in patterns.items():
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append(())
+                node = nxt
+            out[node] = ((pattern, payload),)
+
+        # BFS: fail nuoroda = ilgiausias tikras sufiksas, kuris yra trie'juje;
+        # out papildomas fail grandinės išvestimis, kad paieškoje jos nereikėtų vaikščioti
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())  # šaknies vaikų fail = 0
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0)
+                out[child] = out[child] + out[fail[child]]
+                queue.append(child)
+
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+        self.size = sum(1 for o in out if o)
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+    def findall(self, text: str) -> List[Tuple[str, V]]:
+        """All (pattern, payload) occurrences (po vieną kartą kiekvienam radiniui)"""
+        goto, fail, out = self.goto, self.fail, self.out
+        found: List[Tuple[str, V]] = []
+        node = 0
+        for ch in text:
+            nxt = goto[node].get(ch)
+            while nxt is None and node:
+                node = fail[node]
+                nxt = goto[node].get(ch)
+            node = nxt or 0
+            if out[node]:
+                found.extend(out[node])
+        return found
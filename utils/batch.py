@@ -0,0 +1,48 @@
+"""
+Bounded concurrent batch runner for Tvarkdarys bot
+Daug restrict/ban call'ų vienu metu: semaphore + token bucket + retry_after
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Tuple
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from utils.outbox import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+async def run_batch(user_ids: List[int], action: Callable[[int], Awaitable], bucket: TokenBucket,
+                    concurrency: int = 8, attempts: int = 3) -> Tuple[List[int], List[int]]:
+    """Run action(uid) for every user concurrently; returns (ok, failed)"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(uid: int) -> bool:
+        async with sem:
+            for _ in range(attempts):
+                await bucket.acquire()
+                try:
+                    await action(uid)
+                    return True
+                except RetryAfter as e:
+                    bucket.block(float(e.retry_after))
+                except (BadRequest, Forbidden) as e:  # BadRequest – NetworkError poklasis, tikrinam pirmiau
+                    logger.warning(f"Batch action on {uid} failed: {e}")
+                    return False
+                except NetworkError as e:  # įskaitant TimedOut – bandom dar kartą
+                    logger.warning(f"Batch action on {uid} failed ({e}), retrying")
+                except TelegramError as e:
+                    logger.warning(f"Batch action on {uid} failed: {e}")
+                    return False
+            return False
+
+    # vieno userio klaida negali numušti visos partijos – kitaip prarastume (ok, failed)
+    results = await asyncio.gather(*(one(uid) for uid in user_ids), return_exceptions=True)
+    for uid, r in zip(user_ids, results):
+        if isinstance(r, BaseException):
+            logger.error(f"Batch action on {uid} crashed: {r!r}")
+    ok = [uid for uid, r in zip(user_ids, results) if r is True]
+    failed = [uid for uid, r in zip(user_ids, results) if r is not True]
+    return ok, failed
@@ -0,0 +1,90 @@
+"""
+Batched message cleanup for Tvarkdarys bot
+Trintinos žinutės (laikini bot'o pranešimai, flood'o žinutės) kaupiamos per chatą
+ir trinamos vienu deleteMessages kvietimu – iki 100 id per request'ą
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = 100    # Bot API deleteMessages riba
+FLUSH_DELAY = 0.5  # s – kiek laukiam, kol susikaups partija
+NOTICE_TTL = 60    # s – laikinų bot'o pranešimų gyvavimas
+
+
+class MessageCleanup:
+    """Per-chat delete buffer flushed through deleteMessages"""
+
+    def __init__(self, bot, delay: float = FLUSH_DELAY):
+        self.bot = bot
+        self.delay = delay
+        self._pending: Dict[int, List[int]] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self.calls = 0
+        self.deleted = 0
+
+    def pending(self) -> int:
+        return sum(len(ids) for ids in self._pending.values())
+
+    def track(self, chat_id: int, message_id: int):
+        """Pažymim žinutę trynimui; ištrinama kartu su kitomis po `delay`"""
+        self._pending.setdefault(chat_id, []).append(message_id)
+        task = self._tasks.get(chat_id)
+        if task is None or task.done():
+            self._tasks[chat_id] = asyncio.create_task(self._flush_later(chat_id))
+
+    async def delete_many(self, items: Sequence[Tuple[int, int]]):
+        """Scheduler 'delete' handleris: (chat_id, message_id) partija – trinam iškart"""
+        chats = set()
+        for chat_id, message_id in items:
+            self._pending.setdefault(chat_id, []).append(message_id)
+            chats.add(chat_id)
+        for chat_id in chats:
+            await self.flush(chat_id)
+
+    async def _flush_later(self, chat_id: int, delay: Optional[float] = None):
+        await asyncio.sleep(self.delay if delay is None else delay)
+        await self.flush(chat_id)
+
+    async def flush(self, chat_id: int):
+        ids = sorted(set(self._pending.pop(chat_id, ())))
+        for i in range(0, len(ids), MAX_BATCH):
+            await self._delete(chat_id, ids[i:i + MAX_BATCH])
+
+    async def _delete(self, chat_id: int, ids: List[int]):
+        for _ in range(2):
+            try:
+                await self.bot.delete_messages(chat_id=chat_id, message_ids=ids)
+                self.calls += 1
+                self.deleted += len(ids)
+                return
+            except RetryAfter as e:
+                retry_after = float(e.retry_after)
+                await asyncio.sleep(retry_after)
+            except Exception as e:
+                logger.warning(f"deleteMessages in {chat_id} failed ({len(ids)} ids): {e}")
+                return
+        # du 429 iš eilės – nemetam, grąžinam į buferį ir bandom po retry_after
+        logger.warning(f"deleteMessages in {chat_id} still throttled, requeueing {len(ids)} ids")
+        self._pending.setdefault(chat_id, []).extend(ids)
+        task = self._tasks.get(chat_id)
+        if task is None or task.done() or task is asyncio.current_task():
+            self._tasks[chat_id] = asyncio.create_task(self._flush_later(chat_id, retry_after))
+
+    async def drain(self):
+        """Ištrinam viską, kas dar laukia (shutdown)"""
+        for chat_id in list(self._pending):
+            await self.flush(chat_id)
+
+
+def get_cleanup(application) -> MessageCleanup:
+    """Vienas bendras MessageCleanup (laikomas application.bot_data)"""
+    cleanup = application.bot_data.get("cleanup")
+    if cleanup is None:
+        cleanup = application.bot_data["cleanup"] = MessageCleanup(application.bot)
+    return cleanup
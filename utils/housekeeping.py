@@ -0,0 +1,55 @@
+"""
+Background housekeeping for Tvarkdarys bot
+Periodiškai išmeta pasenusias būsenas (flood bucket'ai, cooldown'ai, mute'ai)
+ir laiko gyvų įrašų skaičiaus gauge'us
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 60  # seconds
+
+
+class Sweeper:
+    """Runs registered sweep(now) callbacks on a fixed interval"""
+
+    def __init__(self, interval: float = SWEEP_INTERVAL):
+        self.interval = interval
+        self._jobs: Dict[str, Tuple[Callable[[float], int], Callable[[], int]]] = {}
+        self.last_evicted: Dict[str, int] = {}
+
+    def add(self, name: str, sweep: Callable[[float], int], gauge: Callable[[], int]):
+        self._jobs[name] = (sweep, gauge)
+
+    def gauges(self) -> Dict[str, int]:
+        """Live entry count per registered map"""
+        return {name: gauge() for name, (_, gauge) in self._jobs.items()}
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        now = time.time() if now is None else now
+        evicted = {}
+        for name, (sweep, _) in self._jobs.items():
+            try:
+                evicted[name] = sweep(now)
+            except Exception as e:
+                logger.error(f"Sweep '{name}' failed: {e}")
+        self.last_evicted = evicted
+        return evicted
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            evicted = self.run_once()
+            logger.debug(f"Housekeeping evicted={evicted} live={self.gauges()}")
+
+
+def get_sweeper(application) -> Sweeper:
+    """Vienas bendras Sweeper (laikomas application.bot_data)"""
+    sweeper = application.bot_data.get("sweeper")
+    if sweeper is None:
+        sweeper = application.bot_data["sweeper"] = Sweeper()
+    return sweeper
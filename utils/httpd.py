@@ -0,0 +1,148 @@
+"""
+Minimal asyncio HTTP/1.1 server for Tvarkdarys bot
+Tik tiek, kiek reikia webhook'ui ir /metrics: Content-Length body, keep-alive,
+maršrutai pagal path'ą. Be papildomų priklausomybių (tornado/aiohttp)
+Viešas port'as: kiekvienas skaitymas su timeout'u, header'ių skaičius ribotas –
+lėtas klientas (slowloris) negali laikyti jungčių be galo
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 4 * 1024 * 1024
+MAX_HEADERS = 100
+IDLE_TIMEOUT = 60.0    # s – keep-alive jungtis be naujo request'o
+HEADER_TIMEOUT = 10.0  # s – request line + visi header'iai
+BODY_TIMEOUT = 30.0    # s – body
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, path: str, query: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers  # raktai mažosiomis raidėmis
+        self.body = body
+
+
+# route(request) -> (status, content_type, body)
+Response = Tuple[int, str, bytes]
+Route = Callable[[Request], Awaitable[Response]]
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADERS + 1):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise ValueError("too many headers")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """None – klientas užsidarė arba neatsiuntė nieko per IDLE_TIMEOUT"""
+    try:
+        line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    if not line:
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers = await asyncio.wait_for(_read_headers(reader), HEADER_TIMEOUT)
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        raise ValueError("body too large")
+    body = await asyncio.wait_for(reader.readexactly(length), BODY_TIMEOUT) if length else b""
+    path, _, query = target.partition("?")
+    return Request(method, path, query, headers, body)
+
+
+def _response(status: int, content_type: str, body: bytes, keep_alive: bool) -> bytes:
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+class Server:
+    """
+    Listener + atviros jungtys. close() uždaro ir keep-alive jungtis – kitaip
+    wait_closed() (Python 3.12+) lauktų, kol klientai patys atsijungs.
+    """
+
+    def __init__(self, routes: Dict[str, Route], fallback: Optional[Route]):
+        self.routes = routes
+        self.fallback = fallback
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    @property
+    def sockets(self):
+        return self.server.sockets if self.server else ()
+
+    async def start(self, host: str, port: int):
+        self.server = await asyncio.start_server(self._handle, host, port)
+
+    def close(self):
+        if self.server:
+            self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+
+    async def wait_closed(self):
+        if self.server:
+            await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except asyncio.TimeoutError:
+                    writer.write(_response(408, "text/plain", b"request timeout", False))
+                    break
+                except (ValueError, asyncio.IncompleteReadError):
+                    writer.write(_response(400, "text/plain", b"bad request", False))
+                    break
+                if request is None:
+                    break
+                route = self.routes.get(request.path, self.fallback)
+                if route is None:
+                    status, content_type, body = 404, "text/plain", b"not found"
+                else:
+                    try:
+                        status, content_type, body = await route(request)
+                    except Exception as e:
+                        logger.error(f"{request.method} {request.path} failed: {e}")
+                        status, content_type, body = 500, "text/plain", b"error"
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                writer.write(_response(status, content_type, body, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def serve(routes: Dict[str, Route], host: str, port: int, fallback: Optional[Route] = None) -> Server:
+    """
+    Paleidžia serverį; routes: {"/webhook": async fn(Request) -> (status, content_type, body)}.
+    fallback – visiems kitiems path'ams (pvz. /bot<token>/<method>), kitaip 404.
+    """
+    server = Server(routes, fallback)
+    await server.start(host, port)
+    return server
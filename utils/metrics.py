@@ -0,0 +1,222 @@
+"""
+Prometheus-style metrics for Tvarkdarys bot
+Skaitikliai ir histogramos laikomi paprastuose dict'uose – per stebėjimą vienas
+bisect + keli priskyrimai; tekstinis formatas sugeneruojamas tik per /metrics užklausą
+"""
+
+import bisect
+import logging
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram.ext import Application, ApplicationHandlerStop
+from telegram.request import BaseRequest, RequestData
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "tvarkdarys"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_CHATS = 200  # daugiau chatų – "other", kad label'ių skaičius neaugtų be ribų
+
+Labels = Tuple[str, ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # paskutinis – +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._help: Dict[str, Tuple[str, str, Labels]] = {}  # name -> (type, help, label names)
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+        self._chats: Dict[int, str] = {}
+
+    # ---------- Registracija ----------
+    def counter(self, name: str, help: str, labels: Labels = ()):
+        self._help[name] = ("counter", help, labels)
+        self.counters[name] = {}
+
+    def histogram(self, name: str, help: str, labels: Labels = ()):
+        self._help[name] = ("histogram", help, labels)
+        self.histograms[name] = {}
+
+    def gauge(self, name: str, help: str, labels: Labels, collect: Callable[[], Dict[Labels, float]]):
+        """collect() kviečiamas tik scrape metu"""
+        self._help[name] = ("gauge", help, labels)
+        self._gauges[name] = collect
+
+    # ---------- Hot path ----------
+    def inc(self, name: str, labels: Labels, value: float = 1):
+        series = self.counters[name]
+        series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float):
+        series = self.histograms[name]
+        hist = series.get(labels)
+        if hist is None:
+            hist = series[labels] = Histogram()
+        hist.observe(value)
+
+    def chat_label(self, chat_id) -> str:
+        label = self._chats.get(chat_id)
+        if label is None:
+            label = str(chat_id) if len(self._chats) < MAX_CHATS else "other"
+            if label != "other":
+                self._chats[chat_id] = label
+        return label
+
+    # ---------- Eksportas ----------
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines: List[str] = []
+        for name, (kind, help, labelnames) in self._help.items():
+            full = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help}")
+            lines.append(f"# TYPE {full} {kind}")
+            if kind == "counter":
+                for labels, value in self.counters[name].items():
+                    lines.append(f"{full}{_fmt(labelnames, labels)} {value:g}")
+            elif kind == "gauge":
+                try:
+                    values = self._gauges[name]()
+                except Exception as e:
+                    logger.warning(f"Gauge {name} failed: {e}")
+                    continue
+                for labels, value in values.items():
+                    lines.append(f"{full}{_fmt(labelnames, labels)} {value:g}")
+            else:
+                for labels, hist in self.histograms[name].items():
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS + (float("inf"),), hist.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{full}_bucket{_fmt(labelnames + ('le',), labels + (le,))} {cumulative}")
+                    lines.append(f"{full}_sum{_fmt(labelnames, labels)} {hist.sum:.6f}")
+                    lines.append(f"{full}_count{_fmt(labelnames, labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ---------- Handleriai ----------
+def handler_name(callback) -> str:
+    return getattr(callback, "__qualname__", None) or repr(callback)
+
+
+def _timed(metrics: Metrics, name: str, callback):
+    @wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await callback(update, context)
+        except ApplicationHandlerStop:
+            outcome = "stop"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            metrics.observe("handler_seconds", (name,), time.perf_counter() - start)
+            metrics.inc("handler_calls_total", (name, outcome))
+
+    return wrapper
+
+
+def instrument_handlers(application: Application, metrics: Metrics):
+    """Apgaubia visų jau užregistruotų handlerių callback'us – kviesti build_app() pabaigoje"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = _timed(metrics, handler_name(handler.callback), handler.callback)
+
+
+def observe_update(metrics: Metrics) -> Callable[[int, float], None]:
+    """KeyedUpdateProcessor observer'is: viso update'o trukmė per chatą"""
+    def observe(key: int, seconds: float):
+        chat = metrics.chat_label(key)
+        metrics.inc("updates_total", (chat,))
+        metrics.observe("update_seconds", (chat,), seconds)
+    return observe
+
+
+# ---------- Bot API ----------
+class MetricsRequest(BaseRequest):
+    """
+    Wraps the real BaseRequest: each Bot API call is counted per method, HTTP status
+    and chat, and timed per method. 429 matosi kaip code="429".
+    """
+
+    def __init__(self, inner: BaseRequest, metrics: Metrics):
+        self.inner = inner
+        self.metrics = metrics
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.inner.read_timeout
+
+    async def initialize(self) -> None:
+        await self.inner.initialize()
+
+    async def shutdown(self) -> None:
+        await self.inner.shutdown()
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None, *args, **kwargs) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        metrics = self.metrics
+        start = time.perf_counter()
+        code = "error"
+        try:
+            status, payload = await self.inner.do_request(url, method, request_data, *args, **kwargs)
+            code = str(status)
+            return status, payload
+        finally:
+            metrics.observe("api_seconds", (api_method,), time.perf_counter() - start)
+            metrics.inc("api_calls_total", (api_method, code))
+            chat_id = request_data.parameters.get("chat_id") if request_data else None
+            if chat_id is not None:
+                metrics.inc("api_calls_by_chat_total", (metrics.chat_label(chat_id),))
+
+
+def new_metrics() -> Metrics:
+    metrics = Metrics()
+    metrics.counter("updates_total", "Processed updates", ("chat",))
+    metrics.histogram("update_seconds", "Whole update processing time", ("chat",))
+    metrics.counter("handler_calls_total", "Handler invocations", ("handler", "outcome"))
+    metrics.histogram("handler_seconds", "Handler callback latency", ("handler",))
+    metrics.counter("api_calls_total", "Bot API calls", ("method", "code"))
+    metrics.histogram("api_seconds", "Bot API call latency", ("method",))
+    metrics.counter("api_calls_by_chat_total", "Bot API calls per target chat", ("chat",))
+    return metrics
+
+
+def get_metrics(application) -> Metrics:
+    """Vienas bendras Metrics registras (laikomas application.bot_data)"""
+    metrics = application.bot_data.get("metrics")
+    if metrics is None:
+        metrics = application.bot_data["metrics"] = new_metrics()
+    return metrics
+
+
+def labelled(values: Dict[str, float]) -> Dict[Labels, float]:
+    """{"name": v} -> {("name",): v} gauge'ams su vienu label'iu"""
+    return {(k,): v for k, v in values.items()}
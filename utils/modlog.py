@@ -0,0 +1,287 @@
+"""
+Append-only moderation event log for Tvarkdarys bot
+Įvykiai rašomi į segmentų failus (JSONL); atmintyje – tik offset'ai ir indeksai pagal (chatą, taikinį) ir chatą
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+@dataclass(slots=True)
+class ModEvent:
+    """One moderation action"""
+    ts: float
+    chat_id: int
+    actor_id: int
+    target_id: int
+    action: str
+    reason: str = ""
+
+
+class ModLog:
+    """
+    Append-only log. Atmintyje laikom tik kiekvieno įvykio vietą (segmentas, baitų
+    offset'as) ir laiką; indeksai – pozicijų sąrašai, augantys chronologiškai, pagal
+    (chat_id, target_id) ir chat_id. Paskutiniai N įvykių – slice + N skaitymų iš
+    segmentų, `chat_since()` – bisect per laiką. Be directory viskas laikoma atmintyje.
+    """
+
+    def __init__(self, directory: Optional[str] = None, segment_events: int = 5000,
+                 retention_days: int = 180, compact_after: int = 4):
+        self.directory = directory
+        self.segment_events = segment_events
+        self.retention = retention_days * 86400
+        self.compact_after = compact_after
+        self.by_target: Dict[Tuple[int, int], List[int]] = {}
+        self.by_chat: Dict[int, List[int]] = {}
+        self._ts = array("d")
+        self._seg = array("I")
+        self._off = array("Q")
+        self._memory: List[ModEvent] = []  # tik kai directory nėra
+        self._segments: List[int] = []
+        self._active_count = 0
+        self._active_size = 0
+        self._file = None
+        self._merging: Optional[asyncio.Task] = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._segments = sorted(
+                int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+            ) or [1]
+            self._load()
+            self._open_active()
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    # ---------- Segments ----------
+    def _path(self, seg: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{seg:06d}{SEGMENT_SUFFIX}")
+
+    def _load(self, cutoff: float = 0.0):
+        """(Per)indeksuoja visus segmentus; įvykiai senesni nei cutoff praleidžiami"""
+        self._clear()
+        for seg in self._segments:
+            count = offset = 0
+            torn = None
+            path = self._path(seg)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            torn = offset
+                            break
+                        try:
+                            event = ModEvent(**json.loads(line))
+                            count += 1
+                            if event.ts >= cutoff:
+                                self._index(event, seg, offset)
+                        except (ValueError, TypeError):
+                            logger.warning(f"Skipping corrupt modlog line in {os.path.basename(path)}")
+                        offset += len(line)
+            if torn is not None:
+                # nukirsta paskutinė eilutė po crash'o – nukerpam, kitaip kitas append'as prie jos prisiklijuotų
+                logger.warning(f"Truncating torn modlog line in {os.path.basename(path)} at {torn}")
+                os.truncate(path, torn)
+            self._active_count, self._active_size = count, offset
+
+    def _open_active(self):
+        if self._file:
+            self._file.close()
+        self._file = open(self._path(self._segments[-1]), "ab")
+
+    def _roll(self):
+        self._segments.append(self._segments[-1] + 1)
+        self._active_count = 0
+        self._active_size = 0
+        self._open_active()
+
+    # ---------- Write ----------
+    def _clear(self):
+        self.by_target, self.by_chat, self._memory = {}, {}, []
+        self._ts, self._seg, self._off = array("d"), array("I"), array("Q")
+
+    def _index(self, event: ModEvent, seg: int = 0, offset: int = 0):
+        pos = len(self._ts)
+        self._ts.append(event.ts)
+        if self.directory:
+            self._seg.append(seg)
+            self._off.append(offset)
+        else:
+            self._memory.append(event)
+        self.by_target.setdefault((event.chat_id, event.target_id), []).append(pos)
+        self.by_chat.setdefault(event.chat_id, []).append(pos)
+
+    def append(self, chat_id: int, actor_id: int, target_id: int, action: str, reason: str = "") -> ModEvent:
+        event = ModEvent(time.time(), chat_id, actor_id, target_id, action, reason or "")
+        if not self._file:
+            self._index(event)
+            return event
+        line = (json.dumps({
+            "ts": event.ts, "chat_id": chat_id, "actor_id": actor_id,
+            "target_id": target_id, "action": action, "reason": event.reason,
+        }, ensure_ascii=False) + "\n").encode("utf-8")
+        self._index(event, self._segments[-1], self._active_size)
+        self._file.write(line)
+        self._file.flush()
+        self._active_size += len(line)
+        self._active_count += 1
+        if self._active_count >= self.segment_events:
+            self._roll()
+        return event
+
+    # ---------- Read ----------
+    def _events(self, positions: Iterable[int]) -> List[ModEvent]:
+        """Įvykiai pagal pozicijas – iš atminties arba perskaitomi iš segmentų"""
+        if not self.directory:
+            return [self._memory[p] for p in positions]
+        out: List[ModEvent] = []
+        files = {}
+        try:
+            for p in positions:
+                seg = self._seg[p]
+                f = files.get(seg)
+                if f is None:
+                    f = files[seg] = open(self._path(seg), "rb")
+                f.seek(self._off[p])
+                out.append(ModEvent(**json.loads(f.readline())))
+        finally:
+            for f in files.values():
+                f.close()
+        return out
+
+    def history(self, chat_id: int, target_id: int, limit: int = 10) -> List[ModEvent]:
+        """Last `limit` actions against a user in a chat, newest first"""
+        positions = self.by_target.get((chat_id, target_id), [])
+        return self._events(reversed(positions[-limit:]))
+
+    def chat_history(self, chat_id: int, limit: int = 20) -> List[ModEvent]:
+        """Last `limit` actions in a chat, newest first"""
+        positions = self.by_chat.get(chat_id, [])
+        return self._events(reversed(positions[-limit:]))
+
+    def chat_since(self, chat_id: int, ts: float) -> List[ModEvent]:
+        """All actions in a chat since `ts` (bisect, O(log n) + result)"""
+        positions = self.by_chat.get(chat_id, [])
+        lo = bisect.bisect_left(positions, ts, key=self._ts.__getitem__)
+        return self._events(positions[lo:])
+
+    # ---------- Compaction ----------
+    def compact(self, now: Optional[float] = None) -> int:
+        """
+        Išmetam įvykius, senesnius nei retention, ir (fone, gijoje) sujungiam uždarytus
+        segmentus į vieną. Kviečiama periodiškai (housekeeping); grąžina išmestų įvykių skaičių.
+        """
+        now = time.time() if now is None else now
+        cutoff = now - self.retention
+        dropped = self._drop_before(cutoff)
+        sealed = self._segments[:-1]
+        if self.directory and len(sealed) >= self.compact_after and self._merging is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:  # be event loop'o (skriptai) – tiesiog sinchroniškai
+                self._swap(sealed, self._merge(sealed, cutoff), cutoff)
+            else:
+                self._merging = loop.create_task(self._merge_async(sealed, cutoff))
+        return dropped
+
+    def _drop_before(self, cutoff: float) -> int:
+        # įvykiai chronologiški – išmetami seniausieji yra pozicijų prefiksas
+        drop = bisect.bisect_left(self._ts, cutoff)
+        if not drop:
+            return 0
+        del self._ts[:drop]
+        if self.directory:
+            del self._seg[:drop]
+            del self._off[:drop]
+        else:
+            del self._memory[:drop]
+        for index in (self.by_target, self.by_chat):
+            for key in list(index):
+                positions = index[key]
+                kept = [p - drop for p in positions[bisect.bisect_left(positions, drop):]]
+                if kept:
+                    index[key] = kept
+                else:
+                    del index[key]
+        return drop
+
+    async def _merge_async(self, sealed: List[int], cutoff: float):
+        try:
+            moved = await asyncio.to_thread(self._merge, sealed, cutoff)
+            self._swap(sealed, moved, cutoff)
+        except Exception as e:
+            logger.error(f"Modlog compaction failed: {e}")
+        finally:
+            self._merging = None
+
+    def _merge(self, sealed: List[int], cutoff: float) -> Dict[Tuple[int, int], int]:
+        """
+        Gijoje: uždarytus segmentus perrašom į vieną .tmp failą (jų niekas kitas neliečia –
+        append'ai eina į aktyvų segmentą). Grąžina (segmentas, senas offset'as) -> naujas offset'as.
+        """
+        moved: Dict[Tuple[int, int], int] = {}
+        offset = 0
+        with open(self._path(sealed[0]) + ".tmp", "wb") as out:
+            for seg in sealed:
+                old = 0
+                with open(self._path(seg), "rb") as f:
+                    for line in f:
+                        try:
+                            keep = line.endswith(b"\n") and json.loads(line)["ts"] >= cutoff
+                        except (ValueError, KeyError):
+                            keep = False
+                        if keep:
+                            out.write(line)
+                            moved[(seg, old)] = offset
+                            offset += len(line)
+                        old += len(line)
+        return moved
+
+    def _swap(self, sealed: List[int], moved: Dict[Tuple[int, int], int], cutoff: float):
+        """Loop'o gijoje: įdedam sujungtą segmentą ir perrašom offset'us indekse"""
+        target = sealed[0]
+        os.replace(self._path(target) + ".tmp", self._path(target))
+        for seg in sealed[1:]:
+            os.remove(self._path(seg))
+        self._segments = [target] + self._segments[len(sealed):]
+        merged = set(sealed)
+        seg_of, off_of = self._seg, self._off
+        for p in range(len(seg_of)):
+            seg = seg_of[p]
+            if seg not in merged:
+                break  # uždarytų segmentų įvykiai – pozicijų prefiksas
+            new = moved.get((seg, off_of[p]))
+            if new is None:
+                # neturėtų nutikti (retention jau pritaikytas) – perstatom indeksą iš disko
+                logger.warning("Modlog index out of sync after compaction, reloading")
+                self._load(cutoff)
+                return
+            seg_of[p] = target
+            off_of[p] = new
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def get_modlog(application) -> ModLog:
+    """Vienas bendras ModLog (laikomas application.bot_data)"""
+    modlog = application.bot_data.get("modlog")
+    if modlog is None:
+        modlog = application.bot_data["modlog"] = ModLog()
+    return modlog
@@ -0,0 +1,153 @@
+"""
+Streaming near-duplicate detector for Tvarkdarys bot
+MinHash (one-permutation, K bin'ų) per žinutės 4-gramas + LSH bandai;
+per chatą laikomas tik slankus langas, tad atmintis ribota
+"""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+SHINGLE = 4         # simbolių n-gramos
+K = 32              # MinHash bin'ai (signatūros ilgis)
+BANDS = 8           # LSH: BANDS × ROWS = K; kandidatu tampa nuo ~ (1/BANDS)^(1/ROWS) ≈ 0.6 panašumo
+ROWS = K // BANDS
+SIMILARITY = 0.55   # numatytasis: kandidatas laikomas dublikatu nuo tiek sutampančių bin'ų
+MIN_LENGTH = 30     # trumpų ("labas", "su gimtadieniu!") nelyginam
+_EMPTY = (1 << 64) - 1
+_MASK = (1 << 64) - 1
+
+
+def normalize(text: str) -> str:
+    """Mažosios raidės, be skyrybos/emoji ir su suspaustais tarpais – triukšmas nebeskaido n-gramų"""
+    return " ".join("".join(c if c.isalnum() else " " for c in text.lower()).split())
+
+
+def signature(text: str) -> Optional[Tuple[int, ...]]:
+    """
+    One-permutation MinHash: vienas hash'as kiekvienai n-gramai, bin'as = hash % K,
+    bin'e laikom mažiausią. Tušti bin'ai užpildomi iš kaimyno (densification).
+    Grąžina None per trumpiems tekstams.
+    """
+    text = normalize(text)
+    if len(text) < MIN_LENGTH:
+        return None
+    bins = [_EMPTY] * K
+    for i in range(len(text) - SHINGLE + 1):
+        h = hash(text[i:i + SHINGLE]) & _MASK
+        b = h % K
+        v = h // K
+        if v < bins[b]:
+            bins[b] = v
+    for i in range(K):
+        if bins[i] == _EMPTY:
+            j = (i + 1) % K
+            while bins[j] == _EMPTY:
+                j = (j + 1) % K
+            bins[i] = bins[j]
+    return tuple(bins)
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / K
+
+
+class Entry:
+    __slots__ = ("seq", "ts", "user_id", "message_id", "sig", "keys", "flagged")
+
+    def __init__(self, seq: int, ts: float, user_id: int, message_id: int, sig: Tuple[int, ...]):
+        self.seq = seq
+        self.ts = ts
+        self.user_id = user_id
+        self.message_id = message_id
+        self.sig = sig
+        self.keys = [(band, hash(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+        self.flagged = False
+
+
+class ChatWindow:
+    """Vieno chato žinučių langas + LSH bucket'ai (band, band_hash) -> entries"""
+
+    def __init__(self, window: float, max_entries: int, threshold: float = SIMILARITY):
+        self.window = window
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.entries: Deque[Entry] = deque()
+        self.buckets: Dict[Tuple[int, int], List[Entry]] = {}
+        self._seq = 0
+
+    def _evict(self, now: float):
+        cutoff = now - self.window
+        entries = self.entries
+        while entries and (entries[0].ts < cutoff or len(entries) > self.max_entries):
+            old = entries.popleft()
+            for key in old.keys:
+                bucket = self.buckets.get(key)
+                if bucket:
+                    # seniausias visada bucket'o pradžioje
+                    if bucket[0] is old:
+                        bucket.pop(0)
+                    else:
+                        bucket.remove(old)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def add(self, now: float, user_id: int, message_id: int, sig: Tuple[int, ...]) -> List[Entry]:
+        """Įdeda žinutę ir grąžina jos panašius (įskaitant ją pačią)"""
+        self._evict(now)
+        self._seq += 1
+        entry = Entry(self._seq, now, user_id, message_id, sig)
+        seen = set()
+        similar = [entry]
+        for key in entry.keys:
+            for other in self.buckets.get(key, ()):
+                if other.seq not in seen:
+                    seen.add(other.seq)
+                    if similarity(sig, other.sig) >= self.threshold:
+                        similar.append(other)
+            self.buckets.setdefault(key, []).append(entry)
+        self.entries.append(entry)
+        return similar
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class DuplicateDetector:
+    """
+    Flags a cluster when near-identical messages come from `min_users` different users
+    within `window` seconds (panašumas >= `threshold`). Grąžina dar nepažymėtus
+    klasterio įrašus (veiksmui).
+    """
+
+    def __init__(self, window: float = 120, min_users: int = 5, max_entries: int = 500,
+                 threshold: float = SIMILARITY):
+        self.window = window
+        self.min_users = min_users
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.chats: Dict[int, ChatWindow] = {}
+
+    def observe(self, chat_id: int, now: float, user_id: int, message_id: int, text: str) -> List[Entry]:
+        sig = signature(text)
+        if sig is None:
+            return []
+        win = self.chats.get(chat_id)
+        if win is None:
+            win = self.chats[chat_id] = ChatWindow(self.window, self.max_entries, self.threshold)
+        similar = win.add(now, user_id, message_id, sig)
+        if len(similar) < self.min_users or len({e.user_id for e in similar}) < self.min_users:
+            return []
+        fresh = [e for e in similar if not e.flagged]
+        for e in fresh:
+            e.flagged = True
+        return fresh
+
+    def sweep(self, now: float) -> int:
+        """Išmetam chatus, kuriuose lange nieko neliko"""
+        idle = [cid for cid, win in self.chats.items() if not win.entries or win.entries[-1].ts < now - self.window]
+        for cid in idle:
+            del self.chats[cid]
+        return len(idle)
+
+    def size(self) -> int:
+        return sum(len(w) for w in self.chats.values())
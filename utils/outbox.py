@@ -0,0 +1,159 @@
+"""
+Outbound Telegram send queue for Tvarkdarys bot
+Handleriai tik įdeda žinutę į eilę; išsiuntimą riboja token bucket'ai
+(per chatą + globalus), vienodos žinutės sulipinamos, 429 – laukiam retry_after
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+GROUP_RATE = 20 / 60    # Telegram: ~20 msg/min į grupę
+PRIVATE_RATE = 1.0      # ~1 msg/s į privatų chatą
+GLOBAL_RATE = 30.0      # ~30 msg/s visam botui
+MAX_TEXT = 4096
+
+
+class TokenBucket:
+    """Classic token bucket; acquire() sleeps until a token is available"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def block(self, seconds: float):
+        """Telegram atsakė 429 – nieko nesiųsti `seconds`"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class _Pending:
+    __slots__ = ("text", "kwargs", "coalesce_key", "future")
+
+    def __init__(self, text: str, kwargs: Dict[str, Any], coalesce_key: Optional[str], future: asyncio.Future):
+        self.text = text
+        self.kwargs = kwargs
+        self.coalesce_key = coalesce_key
+        self.future = future
+
+
+class Outbox:
+    """Central async scheduler for send_message"""
+
+    def __init__(self, bot, max_retries: int = 3):
+        self.bot = bot
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._queues: Dict[int, Deque[_Pending]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.sent = 0
+        self.coalesced = 0
+
+    def pending(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(GROUP_RATE, 3)
+            else:
+                bucket = TokenBucket(PRIVATE_RATE, 1)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def send(self, chat_id: int, text: str, coalesce_key: Optional[str] = None, **kwargs) -> asyncio.Future:
+        """
+        Enqueue a message and return immediately.
+        Grąžina Future su išsiųsta Message (arba None, jei nepavyko).
+        Jei eilės gale laukia žinutė su tuo pačiu `coalesce_key`, tekstas prilipinamas prie jos.
+        """
+        queue = self._queues.setdefault(chat_id, deque())
+        if coalesce_key and queue:
+            tail = queue[-1]
+            if tail.coalesce_key == coalesce_key and tail.kwargs == kwargs:
+                if text in tail.text.split("\n"):
+                    self.coalesced += 1
+                    return tail.future
+                merged = f"{tail.text}\n{text}"
+                if len(merged) <= MAX_TEXT:
+                    tail.text = merged
+                    self.coalesced += 1
+                    return tail.future
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(_Pending(text, kwargs, coalesce_key, future))
+        worker = self._workers.get(chat_id)
+        if worker is None or worker.done():
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+        return future
+
+    async def _drain(self, chat_id: int):
+        queue = self._queues[chat_id]
+        bucket = self._bucket(chat_id)
+        while queue:
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            item = queue.popleft()
+            result = await self._deliver(chat_id, item, bucket)
+            if not item.future.done():
+                item.future.set_result(result)
+        del self._queues[chat_id]
+
+    async def _deliver(self, chat_id: int, item: _Pending, bucket: TokenBucket):
+        for _ in range(self.max_retries + 1):
+            try:
+                message = await self.bot.send_message(chat_id=chat_id, text=item.text, **item.kwargs)
+                self.sent += 1
+                return message
+            except RetryAfter as e:
+                delay = float(e.retry_after)
+                logger.warning(f"429 for chat {chat_id}, retry after {delay}s")
+                bucket.block(delay)
+                if delay > 5:
+                    self.global_bucket.block(min(delay, 30))
+                await bucket.acquire()
+            except Exception as e:
+                logger.error(f"Outbox send to {chat_id} failed: {e}")
+                return None
+        return None
+
+    async def drain(self, timeout: float = 10.0):
+        """Wait for queued messages (used on shutdown)"""
+        workers = [w for w in self._workers.values() if not w.done()]
+        if workers:
+            await asyncio.wait(workers, timeout=timeout)
+
+
+def get_outbox(application) -> Outbox:
+    """Vienas bendras Outbox (laikomas application.bot_data)"""
+    outbox = application.bot_data.get("outbox")
+    if outbox is None:
+        outbox = application.bot_data["outbox"] = Outbox(application.bot)
+    return outbox
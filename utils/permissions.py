@@ -4,9 +4,15 @@ Permission checking utilities for Tvarkdarys bot
 
 import logging
 from functools import wraps
+from typing import Callable, Iterable, List, Optional
 from telegram import Update
 from telegram.ext import ContextTypes
-from config import BotConfig
+from utils.admin_roster import ensure_admins
+from utils.storage import get_storage
+from utils.outbox import get_outbox
+from utils.cleanup import NOTICE_TTL
+from utils.scheduler import get_scheduler
+from utils.pipeline import Gate, get_gate
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +24,8 @@ async def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id:
     if user_id is None:
         user_id = update.effective_user.id
     try:
-        chat_member = await context.bot.get_chat_member(update.effective_chat.id, user_id)
-        return chat_member.status in ['creator', 'administrator']
+        settings = await ensure_admins(context.bot, get_storage(context.application), update.effective_chat.id)
+        return user_id in settings.admins
     except Exception as e:
         logger.error(f"Error checking admin status: {e}")
         return False
@@ -32,95 +38,117 @@ async def is_creator(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id
     if user_id is None:
         user_id = update.effective_user.id
     try:
-        chat_member = await context.bot.get_chat_member(update.effective_chat.id, user_id)
-        return chat_member.status == 'creator'
+        settings = await ensure_admins(context.bot, get_storage(context.application), update.effective_chat.id)
+        return user_id == settings.creator_id
     except Exception as e:
         logger.error(f"Error checking creator status: {e}")
         return False
 
 
-def admin_required(func):
-    """Decorator to require admin permissions"""
-    @wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not await is_admin(update, context):
-            await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text="❌ Jūs turite būti administratorius, kad galėtumėte naudoti šią komandą."
-            )
-            return
-        return await func(self, update, context)
-    return wrapper
-
-
-def group_only(func):
-    """Decorator to restrict command to groups only"""
-    @wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if update.effective_chat.type == 'private':
-            await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text="❌ Ši komanda gali būti naudojama tik grupėse."
-            )
-            return
-        return await func(self, update, context)
-    return wrapper
-
-
-def group_allowed(func):
-    """Decorator: leisti dirbti tik whitelist'intuose chatuose (config.allowed_chats)."""
-    @wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        cfg = BotConfig()
-        chat = update.effective_chat
-        if not chat or chat.id not in cfg.allowed_chats:
-            await context.bot.send_message(chat_id=chat.id, text="❌ Čia aš nedirbu.")
-            return
-        return await func(self, update, context)
-    return wrapper
-
-
-def rate_limit(cooldown_seconds: int = 3):
-    """Decorator for rate limiting commands (naudoja self.storage.check_command_cooldown)."""
+def _guard(check: Callable[[Update, ContextTypes.DEFAULT_TYPE, Gate], Optional[str]]):
+    """
+    Sukuria dekoratorių iš patikrinimo. Sukrauti dekoratoriai nesudaro atskirų sluoksnių –
+    visi patikrinimai sudedami į vieną wrapper'į ir vykdomi per tą patį (jau suskaičiuotą) Gate.
+    check() grąžina atmetimo tekstą arba None.
+    """
     def decorator(func):
+        checks = getattr(func, "__checks__", None)
+        if checks is not None:
+            checks.insert(0, check)  # išorinis dekoratorius tikrinamas pirmas
+            return func
+        checks = [check]
+
         @wraps(func)
         async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-            storage = getattr(self, "storage", None)
-            if storage:
-                user_id = update.effective_user.id
-                if not storage.check_command_cooldown(user_id, cooldown_seconds):
-                    await context.bot.send_message(
-                        chat_id=update.effective_chat.id,
-                        text=f"⏳ Palauk {cooldown_seconds} s prieš naudodamas šitą komandą dar kartą."
-                    )
+            gate = getattr(context, "gate", None)
+            if gate is None or gate.update_id != update.update_id:
+                gate = await get_gate(update, context)
+            for c in checks:
+                denied = c(update, context, gate)
+                if denied:
+                    sent = get_outbox(context.application).send(chat_id=update.effective_chat.id, text=denied)
+                    get_scheduler(context.application).delete_later(sent, NOTICE_TTL)
                     return
             return await func(self, update, context)
+
+        wrapper.__checks__ = checks
         return wrapper
     return decorator
 
 
+def _check_admin(update: Update, context: ContextTypes.DEFAULT_TYPE, gate: Gate) -> Optional[str]:
+    if not gate.is_admin:
+        return "❌ Jūs turite būti administratorius, kad galėtumėte naudoti šią komandą."
+
+
+def _check_group(update: Update, context: ContextTypes.DEFAULT_TYPE, gate: Gate) -> Optional[str]:
+    if gate.private:
+        return "❌ Ši komanda gali būti naudojama tik grupėse."
+
+
+def _check_allowed(update: Update, context: ContextTypes.DEFAULT_TYPE, gate: Gate) -> Optional[str]:
+    if not gate.allowed:
+        return "❌ Čia aš nedirbu."
+
+
+admin_required = _guard(_check_admin)
+admin_required.__doc__ = """Decorator to require admin permissions"""
+
+group_only = _guard(_check_group)
+group_only.__doc__ = """Decorator to restrict command to groups only"""
+
+group_allowed = _guard(_check_allowed)
+group_allowed.__doc__ = """Decorator: leisti dirbti tik whitelist'intuose chatuose (config.allowed_chats)."""
+
+
+def rate_limit(cooldown_seconds: int = 3):
+    """Decorator for rate limiting commands (cooldown'as iš Gate.command_age)."""
+    def check(update: Update, context: ContextTypes.DEFAULT_TYPE, gate: Gate) -> Optional[str]:
+        if not gate.user_id:
+            return None
+        if gate.command_age < cooldown_seconds:
+            return f"⏳ Palauk {cooldown_seconds} s prieš naudodamas šitą komandą dar kartą."
+        get_storage(context.application).mark_command(gate.user_id, gate.now)
+        return None
+    return _guard(check)
+
+
 async def can_restrict_user(update: Update, context: ContextTypes.DEFAULT_TYPE, target_user_id: int) -> bool:
     """Check if bot and admin can restrict target user"""
     chat_id = update.effective_chat.id
     admin_id = update.effective_user.id
     try:
+        settings = await ensure_admins(context.bot, get_storage(context.application), chat_id)
+
         # Admin permissions
-        admin_member = await context.bot.get_chat_member(chat_id, admin_id)
-        if not (admin_member.status == 'creator' or
-                (admin_member.status == 'administrator' and getattr(admin_member, 'can_restrict_members', True))):
+        if admin_id not in settings.can_restrict:
             return False
 
         # Target must NOT be admin/creator
-        target_member = await context.bot.get_chat_member(chat_id, target_user_id)
-        if target_member.status in ['creator', 'administrator']:
+        if target_user_id in settings.admins:
             return False
 
         # Bot must have restrict
-        bot_member = await context.bot.get_chat_member(chat_id, context.bot.id)
-        if not (bot_member.status == 'administrator'):
+        if context.bot.id not in settings.can_restrict:
             return False
 
         return True
     except Exception as e:
         logger.error(f"Error checking restriction permissions: {e}")
         return False
+
+
+async def restrictable_targets(update: Update, context: ContextTypes.DEFAULT_TYPE, target_ids: Iterable[int]) -> Optional[List[int]]:
+    """
+    Batch variant of can_restrict_user: admin/bot teisės tikrinamos vieną kartą.
+    Grąžina taikinius be adminų, arba None, jei admin ar bot'as negali restrict'inti.
+    """
+    chat_id = update.effective_chat.id
+    try:
+        settings = await ensure_admins(context.bot, get_storage(context.application), chat_id)
+    except Exception as e:
+        logger.error(f"Error checking restriction permissions: {e}")
+        return None
+    if update.effective_user.id not in settings.can_restrict or context.bot.id not in settings.can_restrict:
+        return None
+    return [uid for uid in target_ids if uid not in settings.admins]
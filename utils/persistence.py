@@ -0,0 +1,249 @@
+"""
+Persistence backends for Tvarkdarys bot storage
+SQLite (WAL) su write-behind buferiu: mutacijos sujungiamos ir rašomos partijomis
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    username TEXT NOT NULL DEFAULT '',
+    first_name TEXT NOT NULL DEFAULT '',
+    xp INTEGER NOT NULL DEFAULT 0,
+    last_xp_time REAL NOT NULL DEFAULT 0,
+    warnings INTEGER NOT NULL DEFAULT 0,
+    invites_count INTEGER NOT NULL DEFAULT 0,
+    join_date REAL,
+    role TEXT NOT NULL DEFAULT '',
+    invited_by INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS groups (
+    chat_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bans (
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mutes (
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    unmute_time REAL NOT NULL,
+    PRIMARY KEY (chat_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS timers (
+    kind TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    target INTEGER NOT NULL,
+    due REAL NOT NULL,
+    PRIMARY KEY (kind, chat_id, target)
+) WITHOUT ROWID;
+"""
+
+USER_COLUMNS = ("chat_id", "user_id", "username", "first_name", "xp", "last_xp_time",
+                "warnings", "invites_count", "join_date", "role", "invited_by")
+
+
+class StorageBackend:
+    """Interface BotStorage talks to. Default: nothing is persisted."""
+
+    def load_user(self, chat_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        return None
+
+    def load_users_after(self, after: Optional[Tuple[int, int]], limit: int) -> List[Dict[str, Any]]:
+        return []
+
+    def load_groups(self) -> Dict[int, Dict[str, Any]]:
+        return {}
+
+    def load_bans(self) -> List[Tuple[int, int]]:
+        return []
+
+    def load_mutes(self) -> List[Tuple[int, int, float]]:
+        return []
+
+    def load_timers(self) -> List[Tuple[str, int, int, float]]:
+        return []
+
+    def save_user(self, user: Any):
+        pass
+
+    def save_group(self, settings: Any):
+        pass
+
+    def save_ban(self, chat_id: int, user_id: int, banned: bool):
+        pass
+
+    def save_mute(self, chat_id: int, user_id: int, unmute_time: Optional[float]):
+        pass
+
+    def save_timer(self, kind: str, chat_id: int, target: int, due: Optional[float]):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    SQLite WAL backend su write-behind.
+    save_* tik pažymi įrašą kaip nešvarų (O(1), be I/O); foninis thread'as kas
+    `flush_interval_ms` surašo visus pakeitimus viena transakcija.
+    Pakartotiniai to paties userio pakeitimai sujungiami į vieną eilutę.
+    """
+
+    def __init__(self, path: str, flush_interval_ms: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Any], Any] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name="storage-flush", daemon=True)
+        self._thread.start()
+
+    # ---------- Reads ----------
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def load_user(self, chat_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query(f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE chat_id = ? AND user_id = ?", (chat_id, user_id))
+        return dict(zip(USER_COLUMNS, rows[0])) if rows else None
+
+    def load_users_after(self, after: Optional[Tuple[int, int]], limit: int) -> List[Dict[str, Any]]:
+        cols = ", ".join(USER_COLUMNS)
+        if after is None:
+            rows = self._query(f"SELECT {cols} FROM users ORDER BY chat_id, user_id LIMIT ?", (limit,))
+        else:
+            rows = self._query(f"SELECT {cols} FROM users WHERE (chat_id, user_id) > (?, ?) "
+                               f"ORDER BY chat_id, user_id LIMIT ?", (after[0], after[1], limit))
+        return [dict(zip(USER_COLUMNS, r)) for r in rows]
+
+    def load_groups(self) -> Dict[int, Dict[str, Any]]:
+        return {chat_id: json.loads(data) for chat_id, data in self._query("SELECT chat_id, data FROM groups")}
+
+    def load_bans(self) -> List[Tuple[int, int]]:
+        return self._query("SELECT chat_id, user_id FROM bans")
+
+    def load_mutes(self) -> List[Tuple[int, int, float]]:
+        return self._query("SELECT chat_id, user_id, unmute_time FROM mutes")
+
+    def load_timers(self) -> List[Tuple[str, int, int, float]]:
+        return self._query("SELECT kind, chat_id, target, due FROM timers")
+
+    # ---------- Writes (write-behind) ----------
+    def _stage(self, kind: str, key: Any, value: Any):
+        with self._pending_lock:
+            self._pending[(kind, key)] = value
+
+    # Snapshot'ai daromi čia, event loop'o gijoje: flush() gija gyvų objektų neliečia,
+    # tad nėra "dictionary changed size" klaidų ir pusiau atnaujintų eilučių
+    def save_user(self, user: Any):
+        self._stage("user", (user.chat_id, user.user_id), tuple(getattr(user, c) for c in USER_COLUMNS))
+
+    def save_group(self, settings: Any):
+        self._stage("group", settings.chat_id, json.dumps({
+            "rules": settings.rules,
+            "welcome_message": settings.welcome_message,
+            "admins": list(settings.admins),
+            "invite_links": settings.invite_links,
+            "filters": settings.filters,
+        }))
+
+    def save_ban(self, chat_id: int, user_id: int, banned: bool):
+        self._stage("ban", (chat_id, user_id), banned)
+
+    def save_mute(self, chat_id: int, user_id: int, unmute_time: Optional[float]):
+        self._stage("mute", (chat_id, user_id), unmute_time)
+
+    def save_timer(self, kind: str, chat_id: int, target: int, due: Optional[float]):
+        self._stage("timer", (kind, chat_id, target), due)
+
+    def flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        users, groups = [], []
+        ban_add, ban_del, mute_set, mute_del = [], [], [], []
+        timer_set, timer_del = [], []
+        for (kind, key), value in pending.items():
+            if kind == "user":
+                users.append(value)
+            elif kind == "group":
+                groups.append((key, value))
+            elif kind == "ban":
+                (ban_add if value else ban_del).append(key)
+            elif kind == "mute":
+                if value is None:
+                    mute_del.append(key)
+                else:
+                    mute_set.append((key[0], key[1], value))
+            elif kind == "timer":
+                if value is None:
+                    timer_del.append(key)
+                else:
+                    timer_set.append((*key, value))
+
+        placeholders = ", ".join("?" * len(USER_COLUMNS))
+        with self._db_lock:
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                if users:
+                    conn.executemany(f"INSERT OR REPLACE INTO users ({', '.join(USER_COLUMNS)}) VALUES ({placeholders})", users)
+                if groups:
+                    conn.executemany("INSERT OR REPLACE INTO groups (chat_id, data) VALUES (?, ?)", groups)
+                if ban_add:
+                    conn.executemany("INSERT OR IGNORE INTO bans (chat_id, user_id) VALUES (?, ?)", ban_add)
+                if ban_del:
+                    conn.executemany("DELETE FROM bans WHERE chat_id = ? AND user_id = ?", ban_del)
+                if mute_set:
+                    conn.executemany("INSERT OR REPLACE INTO mutes (chat_id, user_id, unmute_time) VALUES (?, ?, ?)", mute_set)
+                if mute_del:
+                    conn.executemany("DELETE FROM mutes WHERE chat_id = ? AND user_id = ?", mute_del)
+                if timer_set:
+                    conn.executemany("INSERT OR REPLACE INTO timers (kind, chat_id, target, due) VALUES (?, ?, ?, ?)", timer_set)
+                if timer_del:
+                    conn.executemany("DELETE FROM timers WHERE kind = ? AND chat_id = ? AND target = ?", timer_del)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                # grąžinam atgal, kad neprarastume – naujesni pakeitimai turi pirmenybę
+                with self._pending_lock:
+                    for k, v in pending.items():
+                        self._pending.setdefault(k, v)
+                raise
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Storage flush failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
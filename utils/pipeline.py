@@ -0,0 +1,94 @@
+"""
+Per-update gate for Tvarkdarys bot
+Vienas TypeHandler'is (group -1) prieš visus kitus handlerius vieną kartą suskaičiuoja,
+kas apie update'ą reikalinga leidimų patikrinimams, ir padeda į context.gate
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from config import BotConfig, get_config, on_reload
+from utils.admin_roster import ROSTER_MAX_AGE, ensure_admins
+from utils.storage import BotStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_GROUP = -1  # mažiausia grupė – vykdoma pirma
+
+
+@dataclass(slots=True)
+class Gate:
+    """What the permission checks need to know about one update"""
+    update_id: int
+    now: float
+    chat_id: int = 0
+    user_id: int = 0
+    private: bool = False
+    allowed: bool = False
+    is_admin: bool = False
+    command_age: float = float("inf")  # s nuo paskutinės šio userio komandos
+
+
+class Pipeline:
+    def __init__(self, allowed_chats: FrozenSet[int], storage: BotStorage):
+        self.allowed_chats = allowed_chats
+        self.storage = storage
+
+    def reconfigure(self, config: BotConfig):
+        self.allowed_chats = config.allowed_chats
+
+    async def process(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Gate:
+        now = time.time()
+        chat = update.effective_chat
+        user = update.effective_user
+        gate = context.gate = Gate(update.update_id, now)
+        if chat:
+            gate.chat_id = chat.id
+            gate.private = chat.type == "private"
+            gate.allowed = chat.id in self.allowed_chats
+        if not user:
+            return gate
+        gate.user_id = user.id
+        # roster'į (ir galimą API call'ą) liečiam tik leidžiamuose chatuose
+        if gate.allowed and not gate.private:
+            settings = self.storage.groups.get(chat.id)
+            if settings is None or not settings.admins_updated or now - settings.admins_updated > ROSTER_MAX_AGE:
+                try:
+                    settings = await ensure_admins(context.bot, self.storage, chat.id)
+                except Exception as e:
+                    logger.error(f"Error checking admin status: {e}")
+                    settings = None
+            gate.is_admin = settings is not None and user.id in settings.admins
+        msg = update.effective_message
+        if msg and msg.text and msg.text[:1] == "/":
+            gate.command_age = now - self.storage.user_last_command.get(user.id, 0)
+        return gate
+
+
+def get_pipeline(application) -> Pipeline:
+    """Vienas bendras Pipeline (laikomas application.bot_data)"""
+    pipeline = application.bot_data.get("pipeline")
+    if pipeline is None:
+        pipeline = application.bot_data["pipeline"] = Pipeline(
+            get_config().allowed_chats, get_storage(application)
+        )
+        on_reload(pipeline.reconfigure)
+    return pipeline
+
+
+async def get_gate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Gate:
+    """context.gate, o jei pipeline neįdiegtas (ar kitas update'as) – suskaičiuojam vietoje"""
+    gate: Optional[Gate] = getattr(context, "gate", None)
+    if gate is None or gate.update_id != update.update_id:
+        gate = await get_pipeline(context.application).process(update, context)
+    return gate
+
+
+def register_pipeline(application: Application):
+    pipeline = get_pipeline(application)
+    application.add_handler(TypeHandler(Update, pipeline.process), group=PIPELINE_GROUP)
@@ -0,0 +1,98 @@
+"""
+Streaming join-rate raid detector for Tvarkdarys bot
+Per-chat slankus langas iš 1 s bucket'ų – O(1) kiekvienam join'ui
+"""
+
+import re
+from array import array
+from typing import Dict, Optional
+
+# "Default" vardai, kuriuos dažniausiai turi botų sąskaitos: daug skaitmenų, tušti/ne raidės.
+# Trumpų (1–2 raidžių) vardų nežymim – tokius turi ir daug tikrų narių
+DEFAULT_NAME = re.compile(r"\d{3,}|^\W*$")
+
+
+def is_suspicious(username: Optional[str], first_name: Optional[str]) -> bool:
+    """No username + a default-looking name"""
+    return not username and bool(DEFAULT_NAME.search(first_name or ""))
+
+
+class JoinWindow:
+    """Join and suspicious-join counts over the last `window` seconds"""
+    __slots__ = ("window", "counts", "flags", "last", "total", "flagged")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.counts = array("l", bytes(8 * window))
+        self.flags = array("l", bytes(8 * window))
+        self.last = 0
+        self.total = 0
+        self.flagged = 0
+
+    def _advance(self, sec: int):
+        w = self.window
+        if sec - self.last >= w:
+            for i in range(w):
+                self.counts[i] = 0
+                self.flags[i] = 0
+            self.total = self.flagged = 0
+        else:
+            # kiekviena sekundė išvaloma tik vieną kartą – amortizuotai O(1)
+            for s in range(self.last + 1, sec + 1):
+                i = s % w
+                self.total -= self.counts[i]
+                self.flagged -= self.flags[i]
+                self.counts[i] = 0
+                self.flags[i] = 0
+        self.last = max(self.last, sec)
+
+    def add(self, now: float, suspicious: bool):
+        sec = int(now)
+        if sec > self.last:
+            self._advance(sec)
+        i = sec % self.window
+        self.counts[i] += 1
+        self.total += 1
+        if suspicious:
+            self.flags[i] += 1
+            self.flagged += 1
+
+
+class RaidDetector:
+    """Decides when a chat should go into lockdown"""
+
+    def __init__(self, window: int = 60, join_threshold: int = 20, suspicious_threshold: int = 8,
+                 lockdown_seconds: int = 900):
+        self.window = window
+        self.join_threshold = join_threshold
+        self.suspicious_threshold = suspicious_threshold
+        self.lockdown_seconds = lockdown_seconds
+        self._windows: Dict[int, JoinWindow] = {}
+        self.lockdown_until: Dict[int, float] = {}
+
+    def in_lockdown(self, chat_id: int, now: float) -> bool:
+        until = self.lockdown_until.get(chat_id)
+        if until is None:
+            return False
+        if now >= until:
+            del self.lockdown_until[chat_id]
+            return False
+        return True
+
+    def lift(self, chat_id: int):
+        self.lockdown_until.pop(chat_id, None)
+
+    def observe(self, chat_id: int, now: float, suspicious: bool) -> bool:
+        """
+        Record one join. Returns True when this join *starts* a lockdown.
+        Kol raidas tęsiasi, lockdown'as pratęsiamas.
+        """
+        win = self._windows.get(chat_id)
+        if win is None:
+            win = self._windows[chat_id] = JoinWindow(self.window)
+        win.add(now, suspicious)
+        if win.total < self.join_threshold and win.flagged < self.suspicious_threshold:
+            return False
+        started = not self.in_lockdown(chat_id, now)
+        self.lockdown_until[chat_id] = now + self.lockdown_seconds
+        return started
@@ -0,0 +1,115 @@
+"""
+Order-statistic rank index for Tvarkdarys bot
+Fenwick tree over integer scores (XP, invites) + score buckets for top-N
+"""
+
+from typing import Dict, List
+
+
+class RankIndex:
+    """Incremental score index: rank / top-N lookups in O(log n)"""
+
+    def __init__(self, capacity: int = 1024):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._size = size
+        self._tree: List[int] = [0] * (size + 1)
+        # score -> {user_id: None} (dict kaip ordered set – stabili tvarka tarp lygių)
+        self._buckets: Dict[int, Dict[int, None]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    # ---------- Fenwick internals ----------
+    def _grow(self, score: int):
+        size = self._size
+        while size <= score:
+            size <<= 1
+        self._size = size
+        self._tree = [0] * (size + 1)
+        for s, bucket in self._buckets.items():
+            self._tree[s + 1] += len(bucket)
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                self._tree[parent] += self._tree[i]
+
+    def _update(self, score: int, delta: int):
+        i = score + 1
+        tree = self._tree
+        size = self._size
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, score: int) -> int:
+        """Number of entries with score <= given score"""
+        i = min(score + 1, self._size)
+        total = 0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _kth_smallest(self, k: int) -> int:
+        """Score of the k-th smallest entry (1-based)"""
+        pos = 0
+        step = self._size
+        tree = self._tree
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and tree[nxt] < k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return pos  # index pos+1 -> score pos
+
+    # ---------- Public API ----------
+    def insert(self, user_id: int, score: int = 0):
+        if score < 0:
+            score = 0
+        if score >= self._size:
+            self._grow(score)
+        bucket = self._buckets.setdefault(score, {})
+        if user_id in bucket:
+            return
+        bucket[user_id] = None
+        self._update(score, 1)
+        self._count += 1
+
+    def remove(self, user_id: int, score: int):
+        bucket = self._buckets.get(score)
+        if not bucket or user_id not in bucket:
+            return
+        del bucket[user_id]
+        if not bucket:
+            del self._buckets[score]
+        self._update(score, -1)
+        self._count -= 1
+
+    def move(self, user_id: int, old_score: int, new_score: int):
+        if old_score == new_score:
+            return
+        self.remove(user_id, old_score)
+        self.insert(user_id, new_score)
+
+    def rank(self, score: int) -> int:
+        """1-based rank of a score: 1 + number of entries strictly above it"""
+        return 1 + self._count - self._prefix(score)
+
+    def top(self, limit: int) -> List[int]:
+        """User ids of the top `limit` entries, highest score first"""
+        result: List[int] = []
+        k = self._count
+        while k > 0 and len(result) < limit:
+            score = self._kth_smallest(k)
+            bucket = self._buckets[score]
+            for user_id in bucket:
+                result.append(user_id)
+                if len(result) >= limit:
+                    break
+            k -= len(bucket)
+        return result
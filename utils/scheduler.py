@@ -0,0 +1,134 @@
+"""
+Durable timed-action scheduler for Tvarkdarys bot
+Min-heap su laiku (O(log n) įterpimas); terminai saugomi per StorageBackend,
+tad po restarto laukiantys veiksmai (unmute, įspėjimų galiojimas, notice trynimas) neprarandami
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.cleanup import get_cleanup
+from utils.persistence import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+RESOLUTION = 1.0  # s – per tiek susikaupę terminai paleidžiami viena partija
+MAX_IDLE = 60.0   # s – ilgiausias miegas, kai heap'as tuščias
+
+Key = Tuple[str, int, int]  # (kind, chat_id, target)
+Handler = Callable[[List[Tuple[int, int]]], Awaitable[None]]
+
+
+class Scheduler:
+    """
+    Timers keyed by (kind, chat_id, target) – pakartotinis schedule() perkelia terminą.
+    Atšaukti/perkelti įrašai heap'e lieka, bet ignoruojami (lazy deletion),
+    o heap'as perstatomas, kai pasenusių įrašų tampa daugiau nei gyvų.
+    """
+
+    def __init__(self, bot, backend: Optional[StorageBackend] = None, resolution: float = RESOLUTION):
+        self.bot = bot
+        self.backend = backend or StorageBackend()
+        self.resolution = resolution
+        self._heap: List[Tuple[float, int, Key]] = []
+        self._due: Dict[Key, float] = {}
+        self._seq = itertools.count()
+        self._handlers: Dict[str, Handler] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self.fired = 0
+        for kind, chat_id, target, due in self.backend.load_timers():
+            self._push((kind, chat_id, target), due)
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def on(self, kind: str, handler: Handler):
+        """handler(items) gauna visus tuo metu suėjusius (chat_id, target) vienu kvietimu"""
+        self._handlers[kind] = handler
+
+    # ---------- Timers ----------
+    def _push(self, key: Key, due: float):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._seq), key))
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(d, s, k) for d, s, k in self._heap if self._due.get(k) == d]
+            heapq.heapify(self._heap)
+
+    def schedule_at(self, kind: str, chat_id: int, target: int, due: float):
+        key = (kind, chat_id, target)
+        wake = not self._heap or due < self._heap[0][0]
+        self._push(key, due)
+        self.backend.save_timer(kind, chat_id, target, due)
+        if wake and self._wake:
+            self._wake.set()
+
+    def schedule(self, kind: str, chat_id: int, target: int, delay: float):
+        self.schedule_at(kind, chat_id, target, time.time() + delay)
+
+    def cancel(self, kind: str, chat_id: int, target: int):
+        if self._due.pop((kind, chat_id, target), None) is not None:
+            self.backend.save_timer(kind, chat_id, target, None)
+
+    def pop_due(self, now: float) -> Dict[str, List[Tuple[int, int]]]:
+        """Išima visus suėjusius terminus, sugrupuotus pagal kind"""
+        batches: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due, _, key = heapq.heappop(heap)
+            if self._due.get(key) != due:
+                continue  # atšauktas arba perkeltas
+            del self._due[key]
+            self.backend.save_timer(*key, None)
+            batches[key[0]].append((key[1], key[2]))
+        return batches
+
+    # ---------- Loop ----------
+    async def run_once(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        fired = 0
+        for kind, items in self.pop_due(now).items():
+            handler = self._handlers.get(kind)
+            if handler is None:
+                logger.warning(f"No handler for timer kind '{kind}', dropping {len(items)}")
+                continue
+            try:
+                await handler(items)
+            except Exception as e:
+                logger.error(f"Timer handler '{kind}' failed: {e}")
+            fired += len(items)
+        self.fired += fired
+        return fired
+
+    async def run(self):
+        self._wake = asyncio.Event()
+        while True:
+            await self.run_once()
+            delay = self._heap[0][0] - time.time() if self._heap else MAX_IDLE
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(max(delay, self.resolution), MAX_IDLE))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    # ---------- Delete ----------
+    def delete_later(self, sent: "asyncio.Future", seconds: float):
+        """Outbox.send() Future'ui – kai žinutė išsiųsta, ją ištrinsim po `seconds`"""
+        def _done(fut: "asyncio.Future"):
+            message = None if fut.cancelled() else fut.result()
+            if message is not None:
+                self.schedule("delete", message.chat_id, message.message_id, seconds)
+        sent.add_done_callback(_done)
+
+
+def get_scheduler(application) -> Scheduler:
+    """Vienas bendras Scheduler (laikomas application.bot_data)"""
+    scheduler = application.bot_data.get("scheduler")
+    if scheduler is None:
+        scheduler = application.bot_data["scheduler"] = Scheduler(application.bot)
+        scheduler.on("delete", get_cleanup(application).delete_many)
+    return scheduler
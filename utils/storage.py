@@ -3,15 +3,26 @@ In-memory storage system for Tvarkdarys bot
 Handles data persistence for users, groups, and bot settings
 """
 
+import asyncio
 import json
+import logging
+import sys
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Any
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 
-@dataclass
+from utils.persistence import StorageBackend
+from utils.rank_index import RankIndex
+
+logger = logging.getLogger(__name__)
+
+SHARED_BANS = 0  # chat_id, kuriuo saugomas bendras (visų allowed chatų) ban sąrašas
+
+@dataclass(slots=True)
 class UserData:
-    """User data structure"""
+    """User data structure (slots – be per-instance __dict__, nes userių gali būti šimtai tūkstančių)"""
+    chat_id: int
     user_id: int
     username: str
     first_name: str
@@ -21,10 +32,15 @@ class UserData:
     invites_count: int = 0
     join_date: float = None
     role: str = ""   # 👈 PRIDĖTA: vartotojo pasirinkta rolė ("mergina"/"vaikinas" ar "")
+    invited_by: int = 0  # kieno kvietimu įėjo (0 = nežinoma)
 
     def __post_init__(self):
         if self.join_date is None:
             self.join_date = time.time()
+        # vardai ir rolės dažnai kartojasi – internuojam, kad būtų viena kopija
+        self.username = sys.intern(self.username)
+        self.first_name = sys.intern(self.first_name)
+        self.role = sys.intern(self.role)
 
 @dataclass 
 class GroupSettings:
@@ -32,42 +48,142 @@ class GroupSettings:
     chat_id: int
     rules: List[str] = None
     welcome_message: str = ""
-    admins: List[int] = None
+    admins: FrozenSet[int] = frozenset()
     invite_links: Dict[str, Any] = None
+    # Admin roster (iš getChatAdministrators)
+    creator_id: int = 0
+    can_restrict: FrozenSet[int] = frozenset()  # adminai (ir creator), galintys restrict'inti
+    admins_updated: float = 0  # 0 = dar neužkrauta
+    user_links: Dict[int, str] = None  # creator_id -> asmeninis linkas (išvedama iš invite_links)
+    filters: Dict[str, str] = None  # turinio filtras: žodis/domenas -> delete|warn|ban
 
     def __post_init__(self):
         if self.rules is None:
             self.rules = []
-        if self.admins is None:
-            self.admins = []
+        self.admins = frozenset(self.admins or ())
+        self.can_restrict = frozenset(self.can_restrict or ())
         if self.invite_links is None:
             self.invite_links = {}
+        self.user_links = {info['creator_id']: link for link, info in self.invite_links.items()}
+        if self.filters is None:
+            self.filters = {}
 
-class BotStorage:
-    """In-memory storage for bot data"""
+class ChatShard:
+    """Per-chat user stats, XP rank index and lock"""
 
-    def __init__(self):
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
         self.users: Dict[int, UserData] = {}
+        self.xp_index = RankIndex()  # XP reitingas be rūšiavimo
+        self.invite_index = RankIndex()  # kvietimų reitingas
+        self.lock = asyncio.Lock()  # kelių žingsnių operacijoms viename chate
+
+    def add(self, user: UserData) -> UserData:
+        self.users[user.user_id] = user
+        self.xp_index.insert(user.user_id, user.xp)
+        self.invite_index.insert(user.user_id, user.invites_count)
+        return user
+
+    def remove(self, user: UserData):
+        del self.users[user.user_id]
+        self.xp_index.remove(user.user_id, user.xp)
+        self.invite_index.remove(user.user_id, user.invites_count)
+
+
+class BotStorage:
+    """In-memory storage for bot data (optionally backed by a StorageBackend)"""
+
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or StorageBackend()
+        self.shards: Dict[int, ChatShard] = {}  # chat_id -> userių statistika
         self.groups: Dict[int, GroupSettings] = {}
         self.user_last_command: Dict[int, float] = {}
-        self.banned_users: Dict[int, List[int]] = {}  # chat_id -> [user_ids]
+        self.banned_users: Dict[int, Set[int]] = {}  # chat_id -> {user_ids}
+        self.shared_bans: Set[int] = set()  # galioja visuose chatuose
         self.muted_users: Dict[int, Dict[int, float]] = {}  # chat_id -> {user_id: unmute_time}
-
-    def get_user(self, user_id: int, username: str = "", first_name: str = "") -> UserData:
-        """Get or create user data"""
-        if user_id not in self.users:
-            self.users[user_id] = UserData(
+        self._fully_loaded = backend is None
+        # update'ų apdorojimas ir scheduler'is laukia šito – get_user() tada niekada
+        # nebeskaito SQLite event loop'e, o lyderių lentelės/rangai nebūna daliniai
+        self.ready = asyncio.Event()
+        self._warned_early = False
+        if self._fully_loaded:
+            self.ready.set()
+        self._load_small_tables()
+
+    # ---------- Persistence ----------
+    def _load_small_tables(self):
+        """Groups, bans and mutes are small – load eagerly; users load lazily."""
+        for chat_id, data in self.backend.load_groups().items():
+            self.groups[chat_id] = GroupSettings(chat_id=chat_id, **data)
+        for chat_id, user_id in self.backend.load_bans():
+            if chat_id == SHARED_BANS:
+                self.shared_bans.add(user_id)
+            else:
+                self.banned_users.setdefault(chat_id, set()).add(user_id)
+        for chat_id, user_id, unmute_time in self.backend.load_mutes():
+            self.muted_users.setdefault(chat_id, {})[user_id] = unmute_time
+
+    async def warm_up(self, batch_size: int = 5000, retry_delay: float = 5.0):
+        """
+        Background cold-start: stream users from the backend in batches (in a thread),
+        then set `ready`. Webhook'as update'us priima iškart, apdorojami jie tik po to.
+        """
+        last_key = None
+        while not self._fully_loaded:
+            try:
+                rows = await asyncio.to_thread(self.backend.load_users_after, last_key, batch_size)
+            except Exception as e:
+                logger.error(f"User warm-up failed, retrying: {e}")
+                await asyncio.sleep(retry_delay)
+                continue
+            for row in rows:
+                shard = self.shard(row["chat_id"])
+                early = shard.users.get(row["user_id"])
+                if early is not None:
+                    # sukurtas prieš warm-up pabaigą (žr. get_user) – DB eilutė svarbesnė
+                    shard.remove(early)
+                shard.add(UserData(**row))
+            if len(rows) < batch_size:
+                self._fully_loaded = True
+            else:
+                last_key = (rows[-1]["chat_id"], rows[-1]["user_id"])
+        self.ready.set()
+
+    def close(self):
+        self.backend.close()
+
+    def shard(self, chat_id: int) -> ChatShard:
+        """Get or create the per-chat shard"""
+        shard = self.shards.get(chat_id)
+        if shard is None:
+            shard = self.shards[chat_id] = ChatShard(chat_id)
+        return shard
+
+    def get_user(self, chat_id: int, user_id: int, username: str = "", first_name: str = "") -> UserData:
+        """Get or create user data in a chat"""
+        shard = self.shard(chat_id)
+        user = shard.users.get(user_id)
+        if user is None and not self._fully_loaded and not self._warned_early:
+            # visi userių keliai laukia `ready` – čia patekti neturėtų (SQLite čia neskaitom;
+            # warm_up() tokius įrašus pakeis DB eilutėmis)
+            logger.warning(f"get_user({chat_id}, {user_id}) before storage warm-up finished")
+            self._warned_early = True
+        if user is None:
+            user = shard.add(UserData(
+                chat_id=chat_id,
                 user_id=user_id,
                 username=username,
                 first_name=first_name
-            )
-        else:
+            ))
+            self.backend.save_user(user)
+        elif (username and user.username != username) or (first_name and user.first_name != first_name):
             # Update username and first_name if provided
             if username:
-                self.users[user_id].username = username
+                user.username = sys.intern(username)
             if first_name:
-                self.users[user_id].first_name = first_name
-        return self.users[user_id]
+                user.first_name = sys.intern(first_name)
+            self.backend.save_user(user)
+        return user
 
     def get_group_settings(self, chat_id: int) -> GroupSettings:
         """Get or create group settings"""
@@ -75,26 +191,35 @@ class BotStorage:
             self.groups[chat_id] = GroupSettings(chat_id=chat_id)
         return self.groups[chat_id]
 
-    def add_xp(self, user_id: int, amount: int = 1) -> bool:
+    def add_xp(self, chat_id: int, user_id: int, amount: int = 1, cooldown: float = 60) -> bool:
         """Add XP to user if cooldown has passed"""
-        user = self.get_user(user_id)
+        user = self.get_user(chat_id, user_id)
         current_time = time.time()
-        # Check cooldown (60 seconds)
-        if current_time - user.last_xp_time < 60:
+        if current_time - user.last_xp_time < cooldown:
             return False
+        old_xp = user.xp
         user.xp += amount
         user.last_xp_time = current_time
+        self.shards[chat_id].xp_index.move(user_id, old_xp, user.xp)
+        self.backend.save_user(user)
         return True
 
     def get_leaderboard(self, chat_id: int, limit: int = 10) -> List[UserData]:
-        """Get top users by XP (global in-memory)"""
-        all_users = list(self.users.values())
-        all_users.sort(key=lambda x: x.xp, reverse=True)
-        return all_users[:limit]
+        """Get top users by XP in a chat"""
+        shard = self.shard(chat_id)
+        return [shard.users[uid] for uid in shard.xp_index.top(limit)]
+
+    def get_rank(self, chat_id: int, user_id: int) -> int:
+        """1-based XP rank of a user in a chat (O(log n))"""
+        return self.shard(chat_id).xp_index.rank(self.get_user(chat_id, user_id).xp)
+
+    def user_count(self, chat_id: int) -> int:
+        return len(self.shard(chat_id).users)
 
     def set_rules(self, chat_id: int, rules: List[str]):
         group_settings = self.get_group_settings(chat_id)
         group_settings.rules = rules
+        self.backend.save_group(group_settings)
 
     def get_rules(self, chat_id: int) -> List[str]:
         group_settings = self.get_group_settings(chat_id)
@@ -103,46 +228,104 @@ class BotStorage:
     def set_welcome_message(self, chat_id: int, message: str):
         group_settings = self.get_group_settings(chat_id)
         group_settings.welcome_message = message
+        self.backend.save_group(group_settings)
 
     def get_welcome_message(self, chat_id: int) -> str:
         group_settings = self.get_group_settings(chat_id)
         return group_settings.welcome_message
 
+    # ---------- Content filter ----------
+    def get_filters(self, chat_id: int) -> Dict[str, str]:
+        return self.get_group_settings(chat_id).filters
+
+    def set_filters(self, chat_id: int, patterns: Dict[str, str]):
+        group_settings = self.get_group_settings(chat_id)
+        group_settings.filters.update(patterns)
+        self.backend.save_group(group_settings)
+
+    def remove_filters(self, chat_id: int, patterns: Iterable[str]):
+        group_settings = self.get_group_settings(chat_id)
+        for pattern in patterns:
+            group_settings.filters.pop(pattern, None)
+        self.backend.save_group(group_settings)
+
     def add_warning(self, chat_id: int, user_id: int) -> int:
-        user = self.get_user(user_id)
+        user = self.get_user(chat_id, user_id)
         user.warnings += 1
+        self.backend.save_user(user)
         return user.warnings
 
-    def get_warnings(self, user_id: int) -> int:
-        user = self.get_user(user_id)
+    def get_warnings(self, chat_id: int, user_id: int) -> int:
+        user = self.get_user(chat_id, user_id)
         return user.warnings
 
-    def clear_warnings(self, user_id: int):
-        user = self.get_user(user_id)
+    def clear_warnings(self, chat_id: int, user_id: int):
+        user = self.get_user(chat_id, user_id)
         user.warnings = 0
+        self.backend.save_user(user)
 
     def ban_user(self, chat_id: int, user_id: int):
-        if chat_id not in self.banned_users:
-            self.banned_users[chat_id] = []
-        if user_id not in self.banned_users[chat_id]:
-            self.banned_users[chat_id].append(user_id)
+        bans = self.banned_users.get(chat_id)
+        if bans is None:
+            bans = self.banned_users[chat_id] = set()
+        if user_id not in bans:
+            bans.add(user_id)
+            self.backend.save_ban(chat_id, user_id, True)
 
     def unban_user(self, chat_id: int, user_id: int):
-        if chat_id in self.banned_users and user_id in self.banned_users[chat_id]:
-            self.banned_users[chat_id].remove(user_id)
+        bans = self.banned_users.get(chat_id)
+        if bans and user_id in bans:
+            bans.discard(user_id)
+            self.backend.save_ban(chat_id, user_id, False)
 
     def is_banned(self, chat_id: int, user_id: int) -> bool:
-        return chat_id in self.banned_users and user_id in self.banned_users[chat_id]
-
-    def mute_user(self, chat_id: int, user_id: int, duration_minutes: int = 60):
+        """O(1): chat'o ban'ai arba bendras sąrašas"""
+        if user_id in self.shared_bans:
+            return True
+        bans = self.banned_users.get(chat_id)
+        return bans is not None and user_id in bans
+
+    def import_bans(self, chat_id: int, user_ids: Iterable[int]) -> int:
+        """Bulk import; returns how many were new"""
+        if chat_id == SHARED_BANS:
+            bans = self.shared_bans
+        else:
+            bans = self.banned_users.setdefault(chat_id, set())
+        new = set(user_ids) - bans
+        bans |= new
+        for user_id in new:
+            self.backend.save_ban(chat_id, user_id, True)
+        return len(new)
+
+    def export_bans(self, chat_id: int) -> List[int]:
+        if chat_id == SHARED_BANS:
+            return sorted(self.shared_bans)
+        return sorted(self.banned_users.get(chat_id, ()))
+
+    def shared_ban(self, user_id: int):
+        self.import_bans(SHARED_BANS, (user_id,))
+
+    def shared_unban(self, user_id: int):
+        if user_id in self.shared_bans:
+            self.shared_bans.discard(user_id)
+            self.backend.save_ban(SHARED_BANS, user_id, False)
+
+    def ban_count(self) -> int:
+        return len(self.shared_bans) + sum(len(b) for b in self.banned_users.values())
+
+    def mute_user(self, chat_id: int, user_id: int, duration_minutes: int = 60) -> float:
+        """Returns unmute time (scheduler'iui)"""
         if chat_id not in self.muted_users:
             self.muted_users[chat_id] = {}
         unmute_time = time.time() + (duration_minutes * 60)
         self.muted_users[chat_id][user_id] = unmute_time
+        self.backend.save_mute(chat_id, user_id, unmute_time)
+        return unmute_time
 
     def unmute_user(self, chat_id: int, user_id: int):
         if chat_id in self.muted_users and user_id in self.muted_users[chat_id]:
             del self.muted_users[chat_id][user_id]
+            self.backend.save_mute(chat_id, user_id, None)
 
     def is_muted(self, chat_id: int, user_id: int) -> bool:
         if chat_id not in self.muted_users or user_id not in self.muted_users[chat_id]:
@@ -151,54 +334,166 @@ class BotStorage:
         if time.time() >= unmute_time:
             # Mute expired, remove it
             del self.muted_users[chat_id][user_id]
+            self.backend.save_mute(chat_id, user_id, None)
             return False
         return True
 
-    def add_invite_use(self, user_id: int):
-        user = self.get_user(user_id)
+    def add_invite_use(self, chat_id: int, user_id: int):
+        user = self.get_user(chat_id, user_id)
         user.invites_count += 1
+        self.shards[chat_id].invite_index.move(user_id, user.invites_count - 1, user.invites_count)
+        self.backend.save_user(user)
+
+    # ---------- Housekeeping ----------
+    def sweep_cooldowns(self, now: float, max_cooldown: float = 60) -> int:
+        """Drop command timestamps older than the longest cooldown in use"""
+        cutoff = now - max_cooldown
+        stale = [uid for uid, t in self.user_last_command.items() if t < cutoff]
+        for uid in stale:
+            del self.user_last_command[uid]
+        return len(stale)
+
+    def sweep_mutes(self, now: float) -> int:
+        """Drop elapsed mutes (is_muted only does it lazily)"""
+        evicted = 0
+        for chat_id in list(self.muted_users):
+            chat_mutes = self.muted_users[chat_id]
+            expired = [uid for uid, until in chat_mutes.items() if until <= now]
+            for uid in expired:
+                del chat_mutes[uid]
+                self.backend.save_mute(chat_id, uid, None)
+            evicted += len(expired)
+            if not chat_mutes:
+                del self.muted_users[chat_id]
+        return evicted
+
+    def muted_count(self) -> int:
+        return sum(len(m) for m in self.muted_users.values())
+
+    def table_sizes(self) -> Dict[str, int]:
+        """Eilučių skaičius kiekvienoje lentelėje (metrikoms)"""
+        return {
+            "users": sum(len(s.users) for s in self.shards.values()),
+            "groups": len(self.groups),
+            "bans": self.ban_count(),
+            "mutes": self.muted_count(),
+            "command_cooldowns": len(self.user_last_command),
+        }
 
     def check_command_cooldown(self, user_id: int, cooldown_seconds: int = 3) -> bool:
         current_time = time.time()
         last_command_time = self.user_last_command.get(user_id, 0)
         if current_time - last_command_time < cooldown_seconds:
             return False
-        self.user_last_command[user_id] = current_time
+        self.mark_command(user_id, current_time)
         return True
 
+    def mark_command(self, user_id: int, now: float):
+        self.user_last_command[user_id] = now
+
     # ---------- Roles ----------
-    def set_user_role(self, user_id: int, role: str):
-        u = self.get_user(user_id)
-        u.role = role
+    def set_user_role(self, chat_id: int, user_id: int, role: str):
+        u = self.get_user(chat_id, user_id)
+        u.role = sys.intern(role)
+        self.backend.save_user(u)
 
-    def get_user_role(self, user_id: int) -> str:
-        return self.get_user(user_id).role or ""
+    def get_user_role(self, chat_id: int, user_id: int) -> str:
+        return self.get_user(chat_id, user_id).role or ""
 
     # ---- Invites tracking (as is) ----
     def add_admin(self, chat_id: int, user_id: int):
         group_settings = self.get_group_settings(chat_id)
         if user_id not in group_settings.admins:
-            group_settings.admins.append(user_id)
+            group_settings.admins = group_settings.admins | {user_id}
+            self.backend.save_group(group_settings)
 
     def is_admin(self, chat_id: int, user_id: int) -> bool:
         group_settings = self.get_group_settings(chat_id)
         return user_id in group_settings.admins
 
+    def set_admins(self, chat_id: int, admins: Iterable[int], creator_id: int, can_restrict: Iterable[int]):
+        """Replace the whole admin roster of a chat"""
+        group_settings = self.get_group_settings(chat_id)
+        group_settings.admins = frozenset(admins)
+        group_settings.creator_id = creator_id
+        group_settings.can_restrict = frozenset(can_restrict)
+        group_settings.admins_updated = time.time()
+        self.backend.save_group(group_settings)
+
+    def update_admin(self, chat_id: int, user_id: int, status: str, can_restrict: bool = False):
+        """Apply a single chat_member status change to the roster"""
+        group_settings = self.get_group_settings(chat_id)
+        if status in ("administrator", "creator"):
+            group_settings.admins = group_settings.admins | {user_id}
+            if status == "creator":
+                group_settings.creator_id = user_id
+            if status == "creator" or can_restrict:
+                group_settings.can_restrict = group_settings.can_restrict | {user_id}
+            else:
+                group_settings.can_restrict = group_settings.can_restrict - {user_id}
+        elif user_id in group_settings.admins:
+            group_settings.admins = group_settings.admins - {user_id}
+            group_settings.can_restrict = group_settings.can_restrict - {user_id}
+            if group_settings.creator_id == user_id:
+                group_settings.creator_id = 0
+        else:
+            return
+        self.backend.save_group(group_settings)
+
     def track_invite_link(self, chat_id: int, invite_link: str, creator_id: int):
         group_settings = self.get_group_settings(chat_id)
+        group_settings.user_links[creator_id] = invite_link
         group_settings.invite_links[invite_link] = {
             'creator_id': creator_id,
             'uses': 0,
             'created_time': time.time()
         }
+        self.backend.save_group(group_settings)
 
     def use_invite_link(self, chat_id: int, invite_link: str) -> Optional[int]:
         group_settings = self.get_group_settings(chat_id)
         if invite_link in group_settings.invite_links:
             group_settings.invite_links[invite_link]['uses'] += 1
+            self.backend.save_group(group_settings)
             return group_settings.invite_links[invite_link]['creator_id']
         return None
 
     def get_invite_stats(self, chat_id: int) -> Dict[str, Any]:
         group_settings = self.get_group_settings(chat_id)
         return group_settings.invite_links
+
+    def get_user_invite_link(self, chat_id: int, user_id: int) -> Optional[str]:
+        return self.get_group_settings(chat_id).user_links.get(user_id)
+
+    def attribute_join(self, chat_id: int, user_id: int, invite_link: Optional[str], link_creator_id: int = 0) -> Optional[int]:
+        """
+        Credit a join to the inviter (O(1): link -> creator index).
+        Nežinomas linkas priskiriamas jo kūrėjui; tas pats narys įskaitomas tik kartą.
+        """
+        user = self.get_user(chat_id, user_id)
+        if user.invited_by or not invite_link:
+            return None
+        inviter = self.use_invite_link(chat_id, invite_link) or link_creator_id
+        if not inviter or inviter == user_id:
+            return None
+        user.invited_by = inviter
+        self.backend.save_user(user)
+        self.add_invite_use(chat_id, inviter)
+        return inviter
+
+    def get_invite_leaderboard(self, chat_id: int, limit: int = 10) -> List[UserData]:
+        """Top inviters in a chat (rank index, no sorting)"""
+        shard = self.shard(chat_id)
+        return [shard.users[uid] for uid in shard.invite_index.top(limit)
+                if shard.users[uid].invites_count > 0]
+
+    def get_invite_rank(self, chat_id: int, user_id: int) -> int:
+        return self.shard(chat_id).invite_index.rank(self.get_user(chat_id, user_id).invites_count)
+
+
+def get_storage(application) -> BotStorage:
+    """Vienas bendras BotStorage visiems handleriams (laikomas application.bot_data)"""
+    storage = application.bot_data.get("storage")
+    if storage is None:
+        storage = application.bot_data["storage"] = BotStorage()
+    return storage
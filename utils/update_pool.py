@@ -0,0 +1,147 @@
+"""
+Keyed worker pool for incoming updates (Tvarkdarys bot)
+Webhook'as atsako Telegram'ui iškart (update'as tik įdedamas į eilę); čia update'ai
+apdorojami `workers` lygiagrečiai, bet to paties chato – griežtai eilės tvarka.
+Savas dispatch ciklas: worker'iai kviečia viešą Application.process_update(), PTB
+update_queue / update processor'ius nenaudojami (jokių PTB vidaus prielaidų)
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_PENDING = 1000
+
+
+def update_key(update: Any) -> int:
+    """Eiliškumo raktas: chatas, o jei jo nėra – useris"""
+    chat = getattr(update, "effective_chat", None)
+    if chat:
+        return chat.id
+    user = getattr(update, "effective_user", None)
+    return user.id if user else 0
+
+
+class KeyedUpdateProcessor:
+    """
+    Bounded pool: iš viso laukia ne daugiau `max_pending` update'ų. Kai pilna,
+    submit() laukia – webhook'o atsakymas vėluoja (Telegram pats sulėtina siuntimą).
+
+    Užimtas raktas (chatas) turi savo backlog'ą: kitas to chato update'as
+    nukeliauja į jį ir jį paleis tas pats worker'is, kai baigs ankstesnį –
+    kiti worker'iai tuo metu dirba su kitais chatais.
+    """
+
+    def __init__(self, process: Callable[[object], Awaitable[Any]], workers: int = DEFAULT_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING, ready: Optional[asyncio.Event] = None):
+        self.process = process  # application.process_update
+        self.ready = ready  # worker'iai pradeda tik jam įsijungus (storage warm-up); eilė kaupiasi
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue: "asyncio.Queue[Tuple[int, object]]" = asyncio.Queue()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._busy: Dict[int, Deque[object]] = {}
+        self._tasks: List[asyncio.Task] = []
+        # metrikos
+        self.pending = 0
+        self.max_seen = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.dropped = 0
+        self.backpressure_waits = 0
+        self.backpressure_seconds = 0.0
+        # observer(key, sekundės) – po kiekvieno update'o (metrikoms)
+        self.observer: Optional[Callable[[int, float], None]] = None
+
+    async def initialize(self) -> None:
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"update_worker:{i}") for i in range(self.workers)]
+
+    async def submit(self, update: object) -> None:
+        """Į eilę; laukia, kol atsiras vieta (backpressure)"""
+        slots = self._slots
+        if slots is None:
+            raise RuntimeError("KeyedUpdateProcessor.submit() before initialize()")
+        if slots.locked():
+            self.backpressure_waits += 1
+            start = time.monotonic()
+            await slots.acquire()
+            self.backpressure_seconds += time.monotonic() - start
+        else:
+            await slots.acquire()
+        self.pending += 1
+        if self.pending > self.max_seen:
+            self.max_seen = self.pending
+        self._queue.put_nowait((update_key(update), update))
+
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """Laukiam, kol apdorosim visus priimtus update'us (post_stop – kol bot'as dar gyvas)"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return not self.pending
+
+    async def shutdown(self) -> None:
+        """Sustabdom worker'ius; kas nespėjo per drain() – išmetama (su įspėjimu)"""
+        left = sum(len(backlog) for backlog in self._busy.values()) + self._queue.qsize()
+        for backlog in self._busy.values():
+            backlog.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self.pending -= left
+        self.dropped += left
+        if left:
+            logger.warning(f"Update pool shut down with {left} unprocessed updates dropped")
+
+    async def _run(self, key: int, update: object):
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.process(update)
+        except Exception as e:
+            logger.error(f"Update processing failed: {e}")
+        finally:
+            self.in_flight -= 1
+            self.pending -= 1
+            self.processed += 1
+            self._slots.release()
+            if self.observer:
+                self.observer(key, time.perf_counter() - start)
+
+    async def _worker(self):
+        if self.ready:
+            await self.ready.wait()
+        while True:
+            key, update = await self._queue.get()
+            backlog = self._busy.get(key)
+            if backlog is not None:
+                backlog.append(update)  # šitą chatą jau apdoroja kitas worker'is
+                continue
+            backlog = self._busy[key] = deque()
+            try:
+                await self._run(key, update)
+                while backlog:
+                    await self._run(key, backlog.popleft())
+            finally:
+                del self._busy[key]
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "pending": self.pending,
+            "max_pending_seen": self.max_seen,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "busy_keys": len(self._busy),
+            "backpressure_waits": self.backpressure_waits,
+            "backpressure_seconds": round(self.backpressure_seconds, 3),
+        }
@@ -0,0 +1,89 @@
+"""
+XP level curve and hourly XP counter for Tvarkdarys bot
+Lygių slenksčiai suskaičiuojami vieną kartą; lygis randamas bisect'u per lentelę
+"""
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+HOUR = 3600
+
+
+class LevelCurve:
+    """
+    Level n pasiekiamas surinkus round(base * n ** exponent) XP.
+    exponent = 1 – tiesinė kreivė (kiekvienas lygis po `base`), > 1 – vis sunkiau.
+    """
+
+    def __init__(self, base: int = 100, exponent: float = 1.0, max_level: int = 100):
+        self.base = base
+        self.exponent = exponent
+        self.max_level = max_level
+        self.thresholds: List[int] = [round(base * n ** exponent) for n in range(max_level + 1)]
+
+    @classmethod
+    def from_config(cls, config) -> "LevelCurve":
+        return cls(config.xp_level_base, config.xp_level_exponent, config.xp_max_level)
+
+    def level(self, xp: int) -> int:
+        return bisect.bisect_right(self.thresholds, xp) - 1
+
+    def next_at(self, xp: int) -> Optional[int]:
+        """XP, kurį pasiekus bus kitas lygis (None – jau maksimalus)"""
+        i = bisect.bisect_right(self.thresholds, xp)
+        return self.thresholds[i] if i <= self.max_level else None
+
+    def progress(self, xp: int) -> Tuple[int, int, Optional[int]]:
+        """(level, XP šiame lygyje, viso XP iki kito lygio arba None)"""
+        lvl = self.level(xp)
+        start = self.thresholds[lvl]
+        if lvl >= self.max_level:
+            return lvl, xp - start, None
+        return lvl, xp - start, self.thresholds[lvl + 1] - start
+
+
+class HourlyCounter:
+    """
+    Slenkantis valandos skaitiklis be laikų sąrašo: einama ir praėjusi valandos
+    dalis, praėjusios svoris mažėja tiesiškai (sliding window counter) – O(1).
+    """
+    __slots__ = ("_slots",)
+
+    def __init__(self):
+        self._slots: Dict[Tuple[int, int], List[float]] = {}  # key -> [slot, current, previous]
+
+    def count(self, key: Tuple[int, int], now: float) -> float:
+        entry = self._slots.get(key)
+        if entry is None:
+            return 0.0
+        slot = int(now // HOUR)
+        if entry[0] == slot:
+            current, previous = entry[1], entry[2]
+        elif entry[0] == slot - 1:
+            current, previous = 0.0, entry[1]
+        else:
+            return 0.0
+        return current + previous * (1 - (now % HOUR) / HOUR)
+
+    def add(self, key: Tuple[int, int], now: float, amount: float):
+        slot = int(now // HOUR)
+        entry = self._slots.get(key)
+        if entry is None:
+            self._slots[key] = [slot, amount, 0.0]
+        elif entry[0] == slot:
+            entry[1] += amount
+        else:
+            entry[2] = entry[1] if entry[0] == slot - 1 else 0.0
+            entry[0] = slot
+            entry[1] = amount
+
+    def sweep(self, now: float) -> int:
+        """Išmetam userius, neturėjusius XP daugiau nei valandą"""
+        stale = int(now // HOUR) - 1
+        idle = [k for k, e in self._slots.items() if e[0] < stale]
+        for k in idle:
+            del self._slots[k]
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._slots)